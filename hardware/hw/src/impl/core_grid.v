@@ -95,7 +95,7 @@ module core_grid #(
         localparam top_edge = curr_core / GRID_DIMENSION_X == (GRID_DIMENSION_Y - 1);
         localparam bottom_edge = curr_core / GRID_DIMENSION_X == 0;
         
-        if (curr_core != OUTPUT_CORE) begin
+        if (curr_core != OUTPUT_CORE) begin : gen_core
             Core #(
                 .PACKET_WIDTH(PACKET_WIDTH),
                 .NUM_NEURONS(NUM_NEURONS),
@@ -156,7 +156,7 @@ module core_grid #(
                 .csram_valid(csram_valid)
             );
         end
-        else begin
+        else begin : gen_output_bus
             OutputBus #(
                 .PACKET_WIDTH(PACKET_WIDTH),
                 .NUM_OUTPUTS(NUM_OUTPUTS),
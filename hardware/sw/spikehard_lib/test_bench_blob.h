@@ -0,0 +1,58 @@
+#ifndef SPIKEHARD_SW_LIB_TEST_BENCH_BLOB_H_INCLUDED
+#define SPIKEHARD_SW_LIB_TEST_BENCH_BLOB_H_INCLUDED
+
+#include "test_bench.h"
+
+// A model generated by model_util.to_header with blob=True is split into a binary blob, holding the core words, the
+// number of packets of each tick and the packets as little-endian arrays, and a header holding a blob_test_bench_t
+// with their byte offsets and lengths. The blob is either embedded in the executable with SPIKEHARD_INCBIN, or read
+// at runtime with tb_load_blob, after which tb_from_blob turns it into a test bench.
+
+struct blob_core_data {
+  uint32_t x;
+  uint32_t y;
+  uint64_t tc_data_offset;
+  uint64_t csram_data_offset;
+  uint32_t tc_data_length;
+  uint32_t csram_data_length;
+};
+
+typedef struct blob_core_data blob_core_data_t;
+
+struct blob_test_bench {
+  const char* filename;
+  const blob_core_data_t* cores;
+  uint64_t num_inputs_offset;
+  uint64_t num_outputs_offset;
+  uint64_t inputs_offset;
+  uint64_t outputs_offset;
+  uint32_t len_cores;
+  uint32_t len_num_inputs;
+  uint32_t len_num_outputs;
+  uint32_t len_inputs;
+  uint32_t len_outputs;
+  uint32_t num_ticks_to_check;
+  uint32_t tick_latency;
+  uint32_t clock_cycles_per_tick;
+  bool relax_packet_ordering;
+};
+
+typedef struct blob_test_bench blob_test_bench_t;
+
+// Embeds the blob at path, relative to the directory of the assembler, as the 8-byte aligned array symbol.
+#define SPIKEHARD_INCBIN(symbol, path)                                                              \
+  __asm__(".section .rodata\n.balign 8\n.global " #symbol "\n" #symbol ":\n.incbin \"" path "\"\n" \
+          ".previous\n");                                                                           \
+  extern const uint8_t symbol[]
+
+// Points tb at the arrays of blob, which must be 8-byte aligned, cores must hold btb->len_cores entries.
+void tb_from_blob(const blob_test_bench_t* btb, const void* blob, core_data_t* cores, test_bench_t* tb);
+
+#if defined(__unix__)
+// Reads the blob of btb from dir into memory allocated with malloc, returns NULL on failure.
+void* tb_load_blob(const blob_test_bench_t* btb, const char* dir);
+#endif
+
+#include "test_bench_blob_impl.h"
+
+#endif // SPIKEHARD_SW_LIB_TEST_BENCH_BLOB_H_INCLUDED
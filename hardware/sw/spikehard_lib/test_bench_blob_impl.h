@@ -0,0 +1,54 @@
+void tb_from_blob(const blob_test_bench_t* btb, const void* blob, core_data_t* cores, test_bench_t* tb) {
+  const uint8_t* base = (const uint8_t*)blob;
+
+  for (unsigned i = 0; i < btb->len_cores; ++i) {
+    cores[i].x                 = btb->cores[i].x;
+    cores[i].y                 = btb->cores[i].y;
+    cores[i].tc_data           = (const uint64_t*)(base + btb->cores[i].tc_data_offset);
+    cores[i].csram_data        = (const uint64_t*)(base + btb->cores[i].csram_data_offset);
+    cores[i].tc_data_length    = btb->cores[i].tc_data_length;
+    cores[i].csram_data_length = btb->cores[i].csram_data_length;
+  }
+
+  tb->cores                 = cores;
+  tb->num_inputs            = (uint32_t*)(base + btb->num_inputs_offset);
+  tb->num_outputs           = (uint32_t*)(base + btb->num_outputs_offset);
+  tb->inputs                = (packet_t*)(base + btb->inputs_offset);
+  tb->outputs               = (packet_t*)(base + btb->outputs_offset);
+  tb->len_cores             = btb->len_cores;
+  tb->len_num_inputs        = btb->len_num_inputs;
+  tb->len_num_outputs       = btb->len_num_outputs;
+  tb->len_inputs            = btb->len_inputs;
+  tb->len_outputs           = btb->len_outputs;
+  tb->num_ticks_to_check    = btb->num_ticks_to_check;
+  tb->tick_latency          = btb->tick_latency;
+  tb->clock_cycles_per_tick = btb->clock_cycles_per_tick;
+  tb->relax_packet_ordering = btb->relax_packet_ordering;
+}
+
+#if defined(__unix__)
+void* tb_load_blob(const blob_test_bench_t* btb, const char* dir) {
+  char path[4096];
+  snprintf(path, sizeof(path), "%s/%s", dir, btb->filename);
+
+  FILE* file = fopen(path, "rb");
+  if (file == NULL) {
+    printf("[SW][test_bench] failed to open %s\n", path);
+    return NULL;
+  }
+
+  fseek(file, 0, SEEK_END);
+  long size = ftell(file);
+  fseek(file, 0, SEEK_SET);
+
+  // malloc returns memory aligned for any scalar type, so the 64-bit words are aligned
+  void* blob = malloc(size > 0 ? size : 1);
+  if (blob != NULL && fread(blob, 1, size, file) != (size_t)size) {
+    printf("[SW][test_bench] failed to read %s\n", path);
+    free(blob);
+    blob = NULL;
+  }
+  fclose(file);
+  return blob;
+}
+#endif
@@ -2,6 +2,9 @@ import sys
 import os
 import math
 import functools
+import collections
+
+import numpy as np
 
 from spikehard import spikehard
 
@@ -9,7 +12,7 @@ from spikehard import spikehard
 sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(
   os.path.dirname(os.path.dirname(os.path.abspath(__file__))))), "util"))
 from common_util import math_util  # noqa: E402
-from test_util import myhdl_util  # noqa: E402
+from test_util import myhdl_util, basic_test_util  # noqa: E402
 from model_util import model_util  # noqa: E402
 
 
@@ -25,11 +28,23 @@ class dma_frame_manager():
   DMA_FRAME_TYPE_CORE_DATA = 6
   DMA_FRAME_TYPE_RESET = 7
 
-  def __init__(self, testcase, input_ports, output_ports, arch_params, test_params=None) -> None:
+  # encoded core data payloads of the most recently loaded cores, shared by every simulation of this process and keyed
+  # on the memory files, their modification times and the parameters that determine the encoding
+  CORE_DATA_CACHE_SIZE = 512
+  CORE_DATA_PARAM_FIELDS = ('output_core_x_coordinate', 'output_core_y_coordinate', 'num_neurons', 'num_axons',
+                            'num_ticks', 'num_weights', 'num_reset_modes', 'potential_width', 'weight_width',
+                            'leak_width', 'threshold_width', 'max_dimension_x', 'max_dimension_y')
+  core_data_cache = collections.OrderedDict()
+  # number of containers whose cores are kept mapped
+  CONTAINER_CACHE_SIZE = 4
+
+  def __init__(self, testcase, input_ports, output_ports, arch_params, clock_period, test_params=None) -> None:
+    # clock_period is the period of input_ports.clk in simulation time steps
     self.testcase = testcase
     self.input_ports = input_ports
     self.output_ports = output_ports
     self.arch_params = arch_params
+    self.clock_period = clock_period
     self.test_params = test_params
 
     self.logger = testcase.logger
@@ -56,7 +71,7 @@ class dma_frame_manager():
                                                self.read_offset, read_length,
                                                self.dma_bus_width, word_width,
                                                make_read_word,
-                                               timeout=self.timeout)
+                                               timeout=self.timeout, clock_period=self.clock_period)
 
     if update_read_offset:
       self.read_offset += read_length
@@ -115,19 +130,12 @@ class dma_frame_manager():
 
     word_width = self.in_packets_payload_word_width
     read_length = math.ceil(len(packets) * (word_width / self.dma_bus_width))
+    beats = myhdl_util.pack_dma_beats(packets, self.dma_bus_width, word_width, read_length)
 
-    def make_read_word(word_idx):
-      if word_idx < len(packets):
-        return packets[word_idx]
-      else:
-        return 0
-
-    yield from myhdl_util.service_read_request(self.testcase,
-                                               self.input_ports, self.output_ports,
-                                               self.read_offset, read_length,
-                                               self.dma_bus_width, word_width,
-                                               make_read_word,
-                                               timeout=self.timeout)
+    yield from myhdl_util.dma_read(self.testcase,
+                                   self.input_ports, self.output_ports,
+                                   self.read_offset, beats, word_width,
+                                   timeout=self.timeout, clock_period=self.clock_period)
 
     self.read_offset += read_length
 
@@ -155,24 +163,62 @@ class dma_frame_manager():
 
     yield from self.__read_dma_frame_header(self.DMA_FRAME_TYPE_CORE_DATA, make_32bit_word)
 
-  def core_data_payload(self, tc_path, csram_path, cur_x, cur_y):
+  @staticmethod
+  @functools.lru_cache(maxsize=CONTAINER_CACHE_SIZE)
+  def __load_container(filepath, mtime_ns):
+    # maps the cores of a container to their words, which stay mapped from the file
+    mu = model_util.from_container(filepath)
+    return mu.arch_params, {cd.pos: (cd.tc_words, cd.csram_words) for cd in mu.cores}
+
+  def __container_core_data_words(self, cur_x, cur_y, param_key):
+    # returns the words of the core from the container of the test if it has one, written by
+    # to_unit_tests(write_container=True), holding the core encoded for the same parameters, otherwise None
+    filepath = basic_test_util.container_filepath(self.test_params)
+    if not os.path.exists(filepath):
+      return None
+
+    arch_params, cores = dma_frame_manager.__load_container(filepath, os.stat(filepath).st_mtime_ns)
+    if (cur_x, cur_y) not in cores or param_key(arch_params) != param_key(self.arch_params) or \
+       param_key(arch_params) != param_key(self.test_params):
+      return None
+    words = np.concatenate(cores[(cur_x, cur_y)])
+    words.flags.writeable = False
+    return words
+
+  def core_data_words(self, tc_path, csram_path, cur_x, cur_y):
+    def param_key(params):
+      return tuple(getattr(params, field) for field in self.CORE_DATA_PARAM_FIELDS)
+
+    words = self.__container_core_data_words(cur_x, cur_y, param_key)
+    if words is not None:
+      return words
+
+    key = (tc_path, os.stat(tc_path).st_mtime_ns, csram_path, os.stat(csram_path).st_mtime_ns, cur_x, cur_y,
+           param_key(self.arch_params), param_key(self.test_params))
+    cache = dma_frame_manager.core_data_cache
+    words = cache.get(key)
+    if words is not None:
+      cache.move_to_end(key)
+      return words
+
     cd = model_util(self.arch_params, self.test_params).gen_core(tc_path, csram_path, cur_x, cur_y)
-    tc_words = cd.tc_words
-    csram_words = cd.csram_words
+    words = np.concatenate([cd.tc_words, cd.csram_words])
+    words.flags.writeable = False
+    cache[key] = words
+    while len(cache) > self.CORE_DATA_CACHE_SIZE:
+      cache.popitem(last=False)
+    return words
 
-    words = tc_words + csram_words
+  def core_data_payload(self, tc_path, csram_path, cur_x, cur_y):
+    words = self.core_data_words(tc_path, csram_path, cur_x, cur_y)
     word_width = self.core_data_payload_word_width
     read_length = math.ceil(len(words) * (word_width / self.dma_bus_width))
+    beats = myhdl_util.pack_dma_beats(words, self.dma_bus_width, word_width, read_length)
 
-    def make_read_word(word_idx):
-      return words[word_idx]
-
-    yield from myhdl_util.service_read_request(self.testcase,
-                                               self.input_ports, self.output_ports,
-                                               self.read_offset, read_length,
-                                               self.dma_bus_width, word_width,
-                                               make_read_word,
-                                               timeout=self.timeout)
+    yield from myhdl_util.dma_read(self.testcase,
+                                   self.input_ports, self.output_ports,
+                                   self.read_offset, beats, word_width,
+                                   timeout=self.timeout, clock_period=self.clock_period)
 
     self.read_offset += read_length
 
@@ -230,7 +276,7 @@ class dma_frame_manager():
                                                 self.write_offset, write_length,
                                                 self.dma_bus_width, word_width,
                                                 check_write_word,
-                                                timeout=self.timeout)
+                                                timeout=self.timeout, clock_period=self.clock_period)
 
     self.write_offset += write_length
 
@@ -252,7 +298,7 @@ class dma_frame_manager():
                                                 self.write_offset, write_length,
                                                 self.dma_bus_width, word_width,
                                                 check_write_word,
-                                                timeout=self.timeout)
+                                                timeout=self.timeout, clock_period=self.clock_period)
 
     self.write_offset += write_length
 
@@ -286,7 +332,7 @@ class dma_frame_manager():
                                                 self.write_offset, write_length,
                                                 self.dma_bus_width, word_width,
                                                 check_write_word,
-                                                timeout=self.timeout)
+                                                timeout=self.timeout, clock_period=self.clock_period)
 
     self.write_offset += write_length
 
@@ -1,16 +1,19 @@
 from collections import namedtuple
 import sys
 import os
+import random
+import numpy as np
 from bitstring import BitArray
 
-from myhdl import Simulation, always, delay, StopSimulation
+from myhdl import Simulation, always, delay, now, StopSimulation
 
 # add '/hardware/util' to system path for module imports
 sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(
   os.path.dirname(os.path.dirname(os.path.abspath(__file__))))), "util"))
 from test_util import myhdl_util, basic_test_util  # noqa: E402
-from common_util import file_util, spikehard_named_params  # noqa: E402
+from common_util import spikehard_named_params, set_spikehard_param  # noqa: E402
 from model_util import model_util  # noqa: E402
+from sim_util import sim_util  # noqa: E402
 
 
 class spikehard():
@@ -28,23 +31,65 @@ class spikehard():
                            'dma_write_chnl_data, acc_done, debug')
 
   @staticmethod
-  def gen_cosimulation(input_ports, output_ports, params):
-    dut = "test_spikehard"
+  def gen_cosimulation(input_ports, output_ports, params, build_dir=None, tick_trace_filepath=None, backend=None):
+    backend = myhdl_util.SIM_BACKEND if backend is None else backend
     work_dir = os.path.dirname(os.path.abspath(__file__))
-    return myhdl_util.gen_cosimulation(dut, work_dir, params, input_ports, output_ports)
+    # spikehard_verilator.cpp drives spikehard directly, so simulations that trace ticks, which is done by
+    # test_spikehard.v, always use iverilog
+    if backend == "verilator" and tick_trace_filepath is None:
+      return myhdl_util.gen_cosimulation("spikehard", work_dir, params, input_ports, output_ports, build_dir=build_dir,
+                                         backend=backend)
+
+    dut = "test_spikehard"
+    # simulations that trace ticks are not cached, since the trace filepath is compiled into them
+    defines = None if tick_trace_filepath is None else {"TICK_TRACE_FILEPATH": os.path.abspath(tick_trace_filepath)}
+    return myhdl_util.gen_cosimulation(dut, work_dir, params, input_ports, output_ports, build_dir=build_dir,
+                                       defines=defines, use_cache=(tick_trace_filepath is None), backend="iverilog")
+
+  @staticmethod
+  def read_tick_trace(filepath):
+    # reads the CSV written by test_spikehard.v when a tick trace is requested, returning two (num_ticks, num_cores)
+    # arrays with the clock cycles after each tick at which each core finished integrating its neurons and at which its
+    # router last delivered a packet, -1 if it did not
+    with open(filepath, 'r') as file:
+      lines = file.read().split('\n')[1:]
+    trace = np.array([line.split(',') for line in lines if line], dtype=np.int64).reshape(-1, 4)
+    num_ticks = int(trace[:, 0].max(initial=-1)) + 1
+    num_cores = int(trace[:, 1].max(initial=-1)) + 1
+    integrated = np.full((num_ticks, num_cores), -1, dtype=np.int64)
+    delivered = np.full((num_ticks, num_cores), -1, dtype=np.int64)
+    integrated[trace[:, 0], trace[:, 1]] = trace[:, 2]
+    delivered[trace[:, 0], trace[:, 1]] = trace[:, 3]
+    return integrated, delivered
+
+  @staticmethod
+  def slowest_tick(filepath):
+    # returns the tick and core that took the most clock cycles to finish integrating or delivering packets, and the
+    # number of clock cycles they took, or None if nothing was recorded
+    integrated, delivered = spikehard.read_tick_trace(filepath)
+    critical_path = np.maximum(integrated, delivered)
+    if critical_path.size == 0 or critical_path.max() < 0:
+      return None
+    tick_idx, core_idx = np.unravel_index(np.argmax(critical_path), critical_path.shape)
+    return int(tick_idx), int(core_idx), int(critical_path[tick_idx, core_idx])
 
   @staticmethod
-  def run_test(testcase, all_test_params, arch_params=None, delay_ns=10, co_test=None, generate=False):
+  def run_test(testcase, all_test_params, arch_params=None, delay_ns=10, co_test=None, generate=False, build_dir=None,
+               tick_trace_filepath=None, backend=None, num_ticks_to_cross_check=None, num_tests_to_cross_check=None):
     if isinstance(all_test_params, spikehard_named_params):
-      return spikehard.run_test(testcase, [all_test_params], arch_params, delay_ns, co_test, generate)
+      return spikehard.run_test(testcase, [all_test_params], arch_params, delay_ns, co_test, generate, build_dir,
+                                tick_trace_filepath, backend, num_ticks_to_cross_check, num_tests_to_cross_check)
+
+    if generate and co_test is None:
+      # the expected outputs are generated by the functional simulator, see gen_expected_outputs, unless co_test
+      # records them from the RTL, i.e. co_test=spikehard.co_gen()
+      return spikehard.gen_expected_outputs(testcase, all_test_params, arch_params, delay_ns, num_ticks_to_cross_check,
+                                            num_tests_to_cross_check, build_dir=build_dir, backend=backend)
+    if num_ticks_to_cross_check is not None:
+      raise ValueError("only outputs generated by the functional simulator are cross-checked")
 
     if co_test is None:
-      if generate:
-        co_test = spikehard.co_gen()
-      else:
-        co_test = spikehard.co_test()
-    elif generate:
-      raise ValueError("should not be generating")
+      co_test = spikehard.co_test()
 
     eq_params = ('dma_bus_width', 'dma_frame_header_word_width')
     any_params = ('output_core_x_coordinate', 'output_core_y_coordinate')
@@ -125,41 +170,143 @@ class spikehard():
                                          dma_write_ctrl_valid, dma_write_ctrl_data_index, dma_write_ctrl_data_length, dma_write_ctrl_data_size, dma_write_chnl_valid, dma_write_chnl_data, acc_done, debug)
 
     # Obtaining the cosimulation object
-    dut = spikehard.gen_cosimulation(input_ports, output_ports, arch_params)
+    dut = spikehard.gen_cosimulation(input_ports, output_ports, arch_params, build_dir, tick_trace_filepath, backend)
 
     @always(delay(delay_ns))
     def clock_gen():
       clk.next = not clk
+    clock_period = 2 * delay_ns
 
-    @always(clk.posedge)
+    # the error flags of debug are sticky, so it is only checked when it changes
+    @always(output_ports.debug)
     def check_errors():
       testcase.assertEqual(myhdl_util.to_int(output_ports.debug), 0,
                            "debug signal is non-zero, which most likely means the tick delay is too short")
 
-    check = co_test(testcase, input_ports, output_ports, arch_params, all_test_params)
+    check = co_test(testcase, input_ports, output_ports, arch_params, all_test_params, clock_period)
+
+    sim = Simulation(dut, clock_gen, check_errors, myhdl_util.mixed_triggers(check))
+    try:
+      sim.run()
+    finally:
+      if tick_trace_filepath is not None and os.path.exists(tick_trace_filepath):
+        slowest = spikehard.slowest_tick(tick_trace_filepath)
+        if slowest is not None:
+          testcase.logger.info("slowest tick: core {} of tick {} took {} of {} clock cycles".format(
+            slowest[1], slowest[0], slowest[2], arch_params.clock_cycles_per_tick))
 
-    sim = Simulation(dut, clock_gen, check_errors, check)
-    sim.run()
+  @staticmethod
+  def gen_expected_outputs(testcase, all_test_params, arch_params=None, delay_ns=10,
+                           num_ticks_to_cross_check=None, num_tests_to_cross_check=None, seed=0, build_dir=None,
+                           backend=None):
+    # Generates tb_correct.txt and tb_num_outputs.txt with the functional simulator, which is far faster than co_gen,
+    # and also records the last tick with output packets, which co_gen only writes once a later tick has any, so these
+    # are the outputs that co_test checks the RTL against. If num_ticks_to_cross_check is given, the first
+    # num_ticks_to_cross_check ticks of a random sample of num_tests_to_cross_check tests (by default all of them) are
+    # then checked against the RTL.
+    if isinstance(all_test_params, spikehard_named_params):
+      all_test_params = [all_test_params]
+
+    for test_params in all_test_params:
+      mu = model_util(test_params, test_params)
+      mu.init(parse_outputs=False)
+      sim = sim_util(mu)
+      sim.run()
+      sim.write_expected_outputs(basic_test_util.num_outputs_filepath(test_params),
+                                 basic_test_util.correct_filepath(test_params))
+      # the container of the test, if any, is rewritten with the new outputs, as co_test reads them from it instead
+      container_mu = spikehard.load_container(test_params)
+      if container_mu is not None:
+        container_mu.num_output_packets, container_mu.output_packets = sim.expected_outputs()
+        container_mu.to_container(basic_test_util.container_filepath(test_params))
+      testcase.logger.debug("generated expected outputs of {} in {} ticks".format(test_params.memory_filepath, sim.tick))
+
+    if num_ticks_to_cross_check is None:
+      return
+
+    if num_tests_to_cross_check is not None and num_tests_to_cross_check < len(all_test_params):
+      sample_idxs = sorted(random.Random(seed).sample(range(len(all_test_params)), num_tests_to_cross_check))
+      all_test_params = [all_test_params[i] for i in sample_idxs]
+
+    all_test_params = [set_spikehard_param(test_params, "num_ticks_to_check", num_ticks_to_cross_check)
+                       for test_params in all_test_params]
+    spikehard.run_test(testcase, all_test_params, arch_params, delay_ns, build_dir=build_dir, backend=backend)
+
+  @staticmethod
+  def load_container(test_params):
+    # returns the model in the container of the test, written by to_unit_tests(write_container=True), whose arrays
+    # are mapped from the file and so shared by tests running in parallel, or None if it has none
+    filepath = basic_test_util.container_filepath(test_params)
+    if not os.path.exists(filepath):
+      return None
+    return model_util.from_container(filepath)
+
+  @staticmethod
+  def read_lines(filepath, parse):
+    # yields every line of a tb_*.txt file up to the first blank one, parsed by parse
+    with open(filepath, 'r') as file:
+      for line in file:
+        if line.rstrip() == '':
+          break
+        yield parse(line.rstrip())
 
   @staticmethod
   def timeout(params):
     return 2 * params.clock_cycles_per_tick
 
+  @staticmethod
+  def wait_for_termination(testcase, input_ports, output_ports, dfm, check_packet):
+    # Waits for the accelerator to terminate after it has been sent the terminate frame, receiving the output frames it
+    # writes in the meantime, all of which must happen within dfm.timeout clock cycles.
+    deadline = now() + dfm.timeout * dfm.clock_period
+    done = bool(myhdl_util.to_int(output_ports.acc_done))
+    try:
+      while not done or not dfm.accelerator_terminated:
+        timeout = max(deadline - now(), 0) // dfm.clock_period
+        if myhdl_util.to_int(output_ports.dma_write_ctrl_valid):
+          yield from dfm.out_frame(check_packet=check_packet)
+        elif done:
+          yield from myhdl_util.wait_for(input_ports.clk, output_ports.dma_write_ctrl_valid, timeout=timeout,
+                                         clock_period=dfm.clock_period)
+        else:
+          yield from myhdl_util.wait_for_any(input_ports.clk, output_ports.acc_done, output_ports.dma_write_ctrl_valid,
+                                             timeout=timeout, clock_period=dfm.clock_period)
+
+        # acc_done is sampled after each wait, so that the loop ends as soon as both have happened
+        if myhdl_util.to_int(output_ports.acc_done):
+          done = True
+    except TimeoutError:
+      testcase.fail("accelerator did not terminate within {} clock cycles".format(dfm.timeout))
+
   @staticmethod
   def co_test():
     def test(testcase, input_ports, output_ports, arch_params, test_params, dfm, is_last_test):
-      num_inputs_file = open(basic_test_util.num_inputs_filepath(test_params), 'r')
-      num_outputs_file = open(basic_test_util.num_outputs_filepath(test_params), 'r')
-      correct_file = open(basic_test_util.correct_filepath(test_params), 'r')
+      container_mu = spikehard.load_container(test_params)
+      if container_mu is not None and container_mu.output_packets is not None:
+        expected_num_packets = iter(container_mu.num_output_packets)
+        expected_packets = iter(container_mu.output_packets)
+      else:
+        expected_num_packets = spikehard.read_lines(basic_test_util.num_outputs_filepath(test_params), int)
+        expected_packets = spikehard.read_lines(basic_test_util.correct_filepath(test_params),
+                                                lambda line: BitArray(bin=line).uint)
+
+      # the next expected packet is read ahead, to tell whether any remain
+      next_expected_packet = next(expected_packets, None)
+
+      def read_expected_packet():
+        nonlocal next_expected_packet
+        packet = next_expected_packet
+        next_expected_packet = next(expected_packets, None)
+        return packet
 
       ticks_sent = 0
       packet_count = 0
       all_packets_checked = False
       num_outputs_idx = test_params.tick_latency + 1
-      expected_num_packets_received_this_tick = int(num_outputs_file.readline().rstrip())
+      expected_num_packets_received_this_tick = next(expected_num_packets)
       cur_tick_expected_packets = []
       for _ in range(expected_num_packets_received_this_tick):
-        cur_tick_expected_packets.append(BitArray(bin=correct_file.readline().rstrip()).uint)
+        cur_tick_expected_packets.append(read_expected_packet())
 
       def check_packet(tick_idx, actual_packet):
         nonlocal packet_count, all_packets_checked, num_outputs_idx, cur_tick_expected_packets, expected_num_packets_received_this_tick
@@ -173,15 +320,14 @@ class spikehard():
             expected_num_packets_received_this_tick, num_outputs_idx))
           while len(cur_tick_expected_packets) == 0:
             num_outputs_idx += 1
-            expected_num_packets_received_this_tick = num_outputs_file.readline().rstrip()
-            if expected_num_packets_received_this_tick == "":
+            expected_num_packets_received_this_tick = next(expected_num_packets, None)
+            if expected_num_packets_received_this_tick is None:
               all_packets_checked = True
               return
             else:
-              expected_num_packets_received_this_tick = int(expected_num_packets_received_this_tick)
               cur_tick_expected_packets = []
               for _ in range(expected_num_packets_received_this_tick):
-                cur_tick_expected_packets.append(BitArray(bin=correct_file.readline().rstrip()).uint)
+                cur_tick_expected_packets.append(read_expected_packet())
 
         testcase.assertEqual(num_outputs_idx, tick_idx)
         if test_params.relax_packet_ordering:
@@ -210,9 +356,8 @@ class spikehard():
             testcase.assertTrue(False, 'tick {}, packet {}: actual is {}, correct is {}'.format(
               tick_idx, packet_count, bin(actual_packet), bin(correct_packet)))
 
-        # Checking if there are more packets to process
-        next_correct_packet = file_util.peek_line(correct_file)
-        if next_correct_packet == '':
+        # Checking if there are more packets to process, including those of this tick
+        if next_expected_packet is None and len(cur_tick_expected_packets) == 0:
           testcase.logger.debug('test succeeded: all packets correct')
           all_packets_checked = True
 
@@ -229,7 +374,8 @@ class spikehard():
           elif myhdl_util.to_int(output_ports.dma_write_ctrl_valid):
             yield from dfm.out_frame(check_packet=check_packet)
           else:
-            yield input_ports.clk.posedge
+            yield from myhdl_util.wait_for_any(input_ports.clk, output_ports.dma_read_ctrl_valid,
+                                               output_ports.dma_write_ctrl_valid, timeout=None)
 
       def read_dma_frame(header, payload=None, header_args=[], payload_args=[], tick_delay=1):
         nonlocal ticks_sent, all_packets_checked
@@ -272,28 +418,28 @@ class spikehard():
       first_in_packets = True
       has_input_data = True
 
-      all_packets = model_util(arch_params, test_params).parse_input_packets()
-      all_packets_idx = 0
+      # the input packets of each tick are only read once they are sent, those of the container are the packets of the
+      # test, which are rewritten for the architecture as those of the text files are
+      mu = model_util(arch_params, test_params)
+      if container_mu is not None and container_mu.input_packets is not None:
+        input_packets = (mu.rewrite_input_packets(packets) for packets in container_mu.iter_input_packets())
+      else:
+        input_packets = mu.iter_input_packets()
 
       def send_packets_for_current_tick():
-        nonlocal has_input_data, first_in_packets, all_packets_idx
+        nonlocal has_input_data, first_in_packets
 
         if not has_input_data:
           yield from read_dma_frame(header=dfm.noop)
           return
 
-        num_inputs = num_inputs_file.readline().rstrip()
-        if num_inputs == '':
+        packets = next(input_packets, None)
+        if packets is None:
           testcase.logger.debug("done sending inputs")
           has_input_data = False
           yield from read_dma_frame(header=dfm.noop)
           return
 
-        packets = []
-        for _ in range(int(num_inputs)):
-          packets.append(all_packets[all_packets_idx])
-          all_packets_idx += 1
-
         yield from read_dma_frame(header=dfm.in_packets_header,
                                   payload=dfm.in_packets_payload,
                                   header_args=[len(packets)],
@@ -313,21 +459,9 @@ class spikehard():
       # Send terminate signal.
       yield from read_dma_frame(header=dfm.terminate, tick_delay=0)
 
-      # Wait for accelerator to terminate.
-      timer = 0
-      done = False
-      while not done or not dfm.accelerator_terminated:
-        if myhdl_util.to_int(output_ports.acc_done):
-          done = True
-
-        if myhdl_util.to_int(output_ports.dma_write_ctrl_valid):
-          yield from dfm.out_frame(check_packet=check_packet)
-        else:
-          yield input_ports.clk.posedge
+      yield from spikehard.wait_for_termination(testcase, input_ports, output_ports, dfm, check_packet)
 
-        if dfm.timeout is not None:
-          timer += 1
-          testcase.assertTrue(timer < dfm.timeout)
+      input_packets.close()
 
       if is_last_test:
         raise StopSimulation
@@ -336,12 +470,11 @@ class spikehard():
         input_ports.rst.next = 0
         yield input_ports.clk.posedge
         input_ports.rst.next = 1
-        for _ in range(10000):
-          yield input_ports.clk.posedge
+        yield from myhdl_util.wait_cycles(input_ports.clk, 10000, clock_period=dfm.clock_period)
 
-    def tests(testcase, input_ports, output_ports, arch_params, all_test_params):
+    def tests(testcase, input_ports, output_ports, arch_params, all_test_params, clock_period):
       from dma_frame_manager import dma_frame_manager
-      dfm = dma_frame_manager(testcase, input_ports, output_ports, arch_params)
+      dfm = dma_frame_manager(testcase, input_ports, output_ports, arch_params, clock_period)
 
       # Initialise accelerator
       tx_size = 2 ** 31
@@ -372,7 +505,6 @@ class spikehard():
   @staticmethod
   def co_gen():
     def test(testcase, input_ports, output_ports, arch_params, test_params, dfm, is_last_test):
-      num_inputs_file = open(basic_test_util.num_inputs_filepath(test_params), 'r')
       num_outputs_file = open(basic_test_util.num_outputs_filepath(test_params), 'w')
       correct_file = open(basic_test_util.correct_filepath(test_params), 'w')
 
@@ -421,7 +553,8 @@ class spikehard():
           elif myhdl_util.to_int(output_ports.dma_write_ctrl_valid):
             yield from dfm.out_frame(check_packet=check_packet)
           else:
-            yield input_ports.clk.posedge
+            yield from myhdl_util.wait_for_any(input_ports.clk, output_ports.dma_read_ctrl_valid,
+                                               output_ports.dma_write_ctrl_valid, timeout=None)
 
       def read_dma_frame(header, payload=None, header_args=[], payload_args=[], tick_delay=1):
         nonlocal ticks_sent, all_packets_checked
@@ -466,28 +599,23 @@ class spikehard():
       first_in_packets = True
       has_input_data = True
 
-      all_packets = model_util(arch_params, test_params).parse_input_packets()
-      all_packets_idx = 0
+      # the input packets of each tick are only read once they are sent
+      input_packets = model_util(arch_params, test_params).iter_input_packets()
 
       def send_packets_for_current_tick():
-        nonlocal has_input_data, first_in_packets, all_packets_idx
+        nonlocal has_input_data, first_in_packets
 
         if not has_input_data:
           yield from read_dma_frame(header=dfm.noop)
           return
 
-        num_inputs = num_inputs_file.readline().rstrip()
-        if num_inputs == '':
+        packets = next(input_packets, None)
+        if packets is None:
           print("done sending inputs")
           has_input_data = False
           yield from read_dma_frame(header=dfm.noop)
           return
 
-        packets = []
-        for _ in range(int(num_inputs)):
-          packets.append(all_packets[all_packets_idx])
-          all_packets_idx += 1
-
         yield from read_dma_frame(header=dfm.in_packets_header,
                                   payload=dfm.in_packets_payload,
                                   header_args=[len(packets)],
@@ -507,25 +635,11 @@ class spikehard():
       # Send terminate signal.
       yield from read_dma_frame(header=dfm.terminate, tick_delay=0)
 
-      # Wait for accelerator to terminate.
-      timer = 0
-      done = False
-      while not done or not dfm.accelerator_terminated:
-        if myhdl_util.to_int(output_ports.acc_done):
-          done = True
-
-        if myhdl_util.to_int(output_ports.dma_write_ctrl_valid):
-          yield from dfm.out_frame(check_packet=check_packet)
-        else:
-          yield input_ports.clk.posedge
-
-        if dfm.timeout is not None:
-          timer += 1
-          testcase.assertTrue(timer < dfm.timeout)
+      yield from spikehard.wait_for_termination(testcase, input_ports, output_ports, dfm, check_packet)
 
       correct_file.close()
       num_outputs_file.close()
-      num_inputs_file.close()
+      input_packets.close()
 
       if is_last_test:
         raise StopSimulation
@@ -534,12 +648,11 @@ class spikehard():
         input_ports.rst.next = 0
         yield input_ports.clk.posedge
         input_ports.rst.next = 1
-        for _ in range(10000):
-          yield input_ports.clk.posedge
+        yield from myhdl_util.wait_cycles(input_ports.clk, 10000, clock_period=dfm.clock_period)
 
-    def tests(testcase, input_ports, output_ports, arch_params, all_test_params):
+    def tests(testcase, input_ports, output_ports, arch_params, all_test_params, clock_period):
       from dma_frame_manager import dma_frame_manager
-      dfm = dma_frame_manager(testcase, input_ports, output_ports, arch_params)
+      dfm = dma_frame_manager(testcase, input_ports, output_ports, arch_params, clock_period)
 
       # Initialise accelerator
       tx_size = 2 ** 31
@@ -0,0 +1,46 @@
+// Verilator counterpart of test_spikehard.v, exposing the ports of spikehard to MyHDL in the same order.
+
+#include <memory>
+
+#include "Vspikehard.h"
+#include "myhdl_verilator.h"
+
+// the DMA channels are exposed as single words, as wider buses would be split by Verilator into arrays of words
+static_assert(DMA_BUS_WIDTH <= 64, "DMA_BUS_WIDTH must be at most 64 bits");
+
+int main(int argc, char **argv) {
+  Verilated::commandArgs(argc, argv);
+  std::unique_ptr<Vspikehard> top(new Vspikehard);
+  using myhdl_verilator::make_port;
+
+  std::vector<myhdl_verilator::port> from_ports = {
+      make_port("clk", 1, top->clk),
+      make_port("rst", 1, top->rst),
+      make_port("conf_info_tx_size", 32, top->conf_info_tx_size),
+      make_port("conf_info_rx_size", 32, top->conf_info_rx_size),
+      make_port("conf_done", 1, top->conf_done),
+      make_port("dma_read_ctrl_ready", 1, top->dma_read_ctrl_ready),
+      make_port("dma_read_chnl_valid", 1, top->dma_read_chnl_valid),
+      make_port("dma_read_chnl_data", DMA_BUS_WIDTH, top->dma_read_chnl_data),
+      make_port("dma_write_ctrl_ready", 1, top->dma_write_ctrl_ready),
+      make_port("dma_write_chnl_ready", 1, top->dma_write_chnl_ready),
+  };
+
+  std::vector<myhdl_verilator::port> to_ports = {
+      make_port("dma_read_ctrl_valid", 1, top->dma_read_ctrl_valid),
+      make_port("dma_read_ctrl_data_index", 32, top->dma_read_ctrl_data_index),
+      make_port("dma_read_ctrl_data_length", 32, top->dma_read_ctrl_data_length),
+      make_port("dma_read_ctrl_data_size", 3, top->dma_read_ctrl_data_size),
+      make_port("dma_read_chnl_ready", 1, top->dma_read_chnl_ready),
+      make_port("dma_write_ctrl_valid", 1, top->dma_write_ctrl_valid),
+      make_port("dma_write_ctrl_data_index", 32, top->dma_write_ctrl_data_index),
+      make_port("dma_write_ctrl_data_length", 32, top->dma_write_ctrl_data_length),
+      make_port("dma_write_ctrl_data_size", 3, top->dma_write_ctrl_data_size),
+      make_port("dma_write_chnl_valid", 1, top->dma_write_chnl_valid),
+      make_port("dma_write_chnl_data", DMA_BUS_WIDTH, top->dma_write_chnl_data),
+      make_port("acc_done", 1, top->acc_done),
+      make_port("debug", 32, top->debug),
+  };
+
+  return myhdl_verilator::run(*top, from_ports, to_ports);
+}
@@ -0,0 +1,119 @@
+import unittest
+import unittest.mock
+import tempfile
+import shutil
+import logging
+import sys
+import os
+
+import numpy as np
+
+from dma_frame_manager import dma_frame_manager
+
+# add '/hardware/util' to system path for module imports
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(
+  os.path.dirname(os.path.dirname(os.path.abspath(__file__))))), "util"))
+from test_util import basic_test_util, myhdl_util  # noqa: E402
+from model_util import model_util  # noqa: E402
+from sim_util import sim_util  # noqa: E402
+from common_util import set_spikehard_param  # noqa: E402
+
+
+class test_container(unittest.TestCase):
+  logger = logging.getLogger(__name__)
+  logger.setLevel(logging.DEBUG)
+
+  def run_test(self, model, parse_outputs):
+    test_params = basic_test_util.gen_test_params(*model)
+    mu = model_util(test_params, test_params)
+    mu.init(parse_outputs=parse_outputs)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      filepath = os.path.join(tmp_dir, "model.bin")
+      mu.to_container(filepath)
+      loaded_mu = model_util.from_container(filepath)
+
+      self.assertEqual(mu.arch_params, loaded_mu.arch_params)
+      self.assertEqual(mu.test_params, loaded_mu.test_params)
+      self.assertEqual(len(mu.cores), len(loaded_mu.cores))
+      for cd, loaded_cd in zip(mu.cores, loaded_mu.cores):
+        self.assertEqual(cd.pos, loaded_cd.pos)
+        self.assertTrue(np.array_equal(cd.tc_words, loaded_cd.tc_words))
+        self.assertTrue(np.array_equal(cd.csram_words, loaded_cd.csram_words))
+        self.assertTrue(np.array_equal(cd.neurons, loaded_cd.neurons))
+
+      self.assertEqual(mu.input_packets, loaded_mu.input_packets)
+      self.assertEqual(mu.num_input_packets, loaded_mu.num_input_packets)
+      self.assertEqual(mu.output_packets, loaded_mu.output_packets)
+      self.assertEqual(mu.num_output_packets, loaded_mu.num_output_packets)
+      self.assertEqual(sim_util(mu).run(), sim_util(loaded_mu).run())
+
+      # mapped cores are copied on modification, leaving the container untouched
+      if loaded_mu.cores:
+        loaded_mu.cores[0].update_tc([0], [1 - loaded_mu.cores[0].tc[0]])
+        self.assertTrue(np.array_equal(model_util.from_container(filepath).cores[0].tc_words, mu.cores[0].tc_words))
+      del loaded_mu
+
+  def test(self):
+    vmm_unaltered = ("vmm_o", False, 64, 64)
+    vmm_altered_small = ("vmm_o", True, 32, 32)
+
+    model = [vmm_unaltered, vmm_altered_small]
+    basic_test_util.run_subtests(self, model=model, parse_outputs=[True, False])
+
+  def test_compress_cache(self):
+    old_params = basic_test_util.gen_test_params("vmm_o", False, 64, 64)
+    new_params = set_spikehard_param(old_params, "num_axons", 128)
+    new_params = set_spikehard_param(new_params, "num_neurons", 128)
+
+    with tempfile.TemporaryDirectory() as tmp_dir, unittest.mock.patch.object(model_util, "COMPRESS_CACHE_DIR", tmp_dir):
+      mu, results = model_util.compress_model(old_params, new_params)
+      self.assertEqual(len(os.listdir(tmp_dir)), 1)
+      cached_mu, cached_results = model_util.compress_model(old_params, new_params)
+
+      # the cached model must be the one that was packed
+      self.assertEqual(results, cached_results)
+      self.assertEqual(mu.arch_params, cached_mu.arch_params)
+      self.assertEqual([cd.pos for cd in mu.cores], [cd.pos for cd in cached_mu.cores])
+      for cd, cached_cd in zip(mu.cores, cached_mu.cores):
+        self.assertTrue(np.array_equal(cd.tc_words, cached_cd.tc_words))
+        self.assertTrue(np.array_equal(cd.csram_words, cached_cd.csram_words))
+      self.assertEqual(mu.input_packets, cached_mu.input_packets)
+      self.assertEqual(mu.num_input_packets, cached_mu.num_input_packets)
+      self.assertEqual(sim_util(mu).run(), sim_util(cached_mu).run())
+      del cached_mu
+
+      # models compressed by another version of the packing algorithms are not reused
+      with unittest.mock.patch.object(model_util, "COMPRESS_CACHE_VERSION", model_util.COMPRESS_CACHE_VERSION + 1):
+        model_util.compress_model(old_params, new_params)
+      self.assertEqual(len(os.listdir(tmp_dir)), 2)
+
+  def test_core_data_words(self):
+    test_params = basic_test_util.gen_test_params("vmm_o", True, 32, 32)
+    mu = model_util(test_params, test_params)
+    mu.init()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      copied_params = set_spikehard_param(test_params, "memory_filepath", os.path.join(tmp_dir, "memory"))
+      shutil.copytree(test_params.memory_filepath, copied_params.memory_filepath)
+      mu.to_container(basic_test_util.container_filepath(copied_params))
+      dfm = dma_frame_manager(self, None, None, copied_params, myhdl_util.CLOCK_PERIOD, copied_params)
+
+      # the words of every core are taken from the container, rather than encoded from the memory files
+      with unittest.mock.patch.object(model_util, "gen_core", side_effect=AssertionError("memory files parsed")):
+        for cd in mu.cores:
+          self.assertTrue(np.array_equal(dfm.core_data_words(None, None, cd.x, cd.y),
+                                         np.concatenate([cd.tc_words, cd.csram_words])))
+
+      # cores encoded for other parameters are encoded from the memory files
+      dfm.arch_params = set_spikehard_param(copied_params, "num_axons", 2 * copied_params.num_axons)
+      cd = mu.cores[0]
+      idx = str(cd.x + cd.y * test_params.grid_dimension_x).zfill(
+        len(str(test_params.grid_dimension_x * test_params.grid_dimension_y - 1)))
+      words = dfm.core_data_words(os.path.join(copied_params.memory_filepath, "tc_{}.mem".format(idx)),
+                                  os.path.join(copied_params.memory_filepath, "csram_{}.mem".format(idx)), cd.x, cd.y)
+      self.assertGreater(len(words), len(cd.tc_words) + len(cd.csram_words))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -1,8 +1,11 @@
 import unittest
+import unittest.mock
 import pytest
 import logging
 import sys
 import os
+import shutil
+import tempfile
 
 from spikehard import spikehard
 
@@ -10,7 +13,8 @@ from spikehard import spikehard
 sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(
   os.path.dirname(os.path.dirname(os.path.abspath(__file__))))), "util"))
 from test_util import basic_test_util, expose_markers_option_fixture  # noqa: E402
-from common_util import spikehard_named_params  # noqa: E402
+from common_util import spikehard_named_params, set_spikehard_param  # noqa: E402
+from model_util import model_util  # noqa: E402
 
 
 @pytest.mark.myhdl
@@ -62,6 +66,58 @@ class test_vmm(unittest.TestCase):
                                  dma_bus_width=dma_bus_width,
                                  dma_frame_header_word_width=dma_frame_header_word_width)
 
+  def test_cross_check(self):
+    # regenerates the expected outputs of copies of the models, of which only a sample is checked against the RTL
+    num_ticks_to_cross_check = 20
+    models = [("vmm_o", False, 64, 64), ("vmm_o", True, 32, 32)]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      all_test_params = []
+      for model_idx, model in enumerate(models):
+        test_params = basic_test_util.gen_test_params(*model)
+        generated_params = set_spikehard_param(test_params, "memory_filepath", os.path.join(tmp_dir, str(model_idx)))
+        shutil.copytree(test_params.memory_filepath, generated_params.memory_filepath)
+        all_test_params.append(generated_params)
+
+      with unittest.mock.patch.object(spikehard, "run_test", wraps=spikehard.run_test) as run_test:
+        spikehard.run_test(self, all_test_params, generate=True, num_ticks_to_cross_check=num_ticks_to_cross_check,
+                           num_tests_to_cross_check=1)
+
+      # the outer call generates the outputs, the inner one runs the RTL
+      self.assertEqual(run_test.call_count, 2)
+      checked_params = run_test.call_args.args[1]
+      self.assertEqual(len(checked_params), 1)
+      self.assertIn(checked_params[0].memory_filepath, [test_params.memory_filepath for test_params in all_test_params])
+      self.assertEqual(checked_params[0].num_ticks_to_check, num_ticks_to_cross_check)
+
+  def test_container(self):
+    # a test with a container reads its model from it, so it runs without the text files of its packets
+    test_params = basic_test_util.gen_test_params("vmm_o", False, 64, 64, num_ticks_to_check=20)
+    mu = model_util(test_params, test_params)
+    mu.init()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      copied_params = set_spikehard_param(test_params, "memory_filepath", os.path.join(tmp_dir, "memory"))
+      shutil.copytree(test_params.memory_filepath, copied_params.memory_filepath)
+      mu.to_container(basic_test_util.container_filepath(copied_params))
+      for filepath in (basic_test_util.input_filepath, basic_test_util.num_inputs_filepath,
+                       basic_test_util.correct_filepath, basic_test_util.num_outputs_filepath):
+        os.remove(filepath(copied_params))
+
+      spikehard.run_test(self, copied_params)
+
+  def test_tick_delay_bounds(self):
+    # the estimated bounds must enclose the minimum tick delay found by searching with the RTL, without slack
+    num_ticks_to_check = 20
+    test_params = basic_test_util.gen_test_params("vmm_o", True, 32, 32, num_ticks_to_check=num_ticks_to_check)
+    mu = model_util(test_params, test_params)
+    mu.init()
+    lower, upper = mu.estimate_tick_delay(num_ticks_to_check)
+
+    tick_delay, _ = mu.minimise_tick_delay(slack=0)
+    self.assertLessEqual(lower, tick_delay)
+    self.assertLessEqual(tick_delay, upper)
+
 
 if __name__ == '__main__':
   unittest.main()
@@ -0,0 +1,126 @@
+import unittest
+import logging
+import sys
+import os
+
+import numpy as np
+
+# add '/hardware/util' to system path for module imports
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(
+  os.path.dirname(os.path.dirname(os.path.abspath(__file__))))), "util"))
+from test_util import basic_test_util  # noqa: E402
+from model_util import model_util  # noqa: E402
+from sim_util import sim_util  # noqa: E402
+from common_util import set_spikehard_param  # noqa: E402
+
+
+class test_packing(unittest.TestCase):
+  logger = logging.getLogger(__name__)
+  logger.setLevel(logging.DEBUG)
+
+  # indices into the results returned by pack_cores
+  NUM_BINS_USED = 17
+  NUM_BINS_LOWER_BOUND = 28
+  OLD_MEAN_HOPS = 30
+  NEW_MEAN_HOPS = 31
+
+  @staticmethod
+  def gen_params():
+    old_params = basic_test_util.gen_test_params("vmm_o", False, 64, 64)
+    new_params = set_spikehard_param(old_params, "num_axons", 128)
+    new_params = set_spikehard_param(new_params, "num_neurons", 128)
+    return old_params, new_params
+
+  @staticmethod
+  def connectivity(mu):
+    # the number of synapses and used neurons, which do not depend on how the cores are packed
+    return sum(int(cd.connectivity.sum()) for cd in mu.cores), sum(len(cd.used_neurons) for cd in mu.cores)
+
+  @classmethod
+  def setUpClass(cls):
+    # the model packed by the ILP is the reference every other packing is checked against
+    old_params, new_params = cls.gen_params()
+    mu = model_util(old_params, old_params)
+    mu.init()
+    mu.pack_cores(new_params=new_params, packing_strategy="ilp")
+    cls.expected_connectivity = cls.connectivity(mu)
+
+  def pack(self, same_arch=False, **kwargs):
+    # returns the outputs of the unpacked model, the packed model and the results of packing it, if same_arch then the
+    # model is packed into cores of its own size
+    old_params, new_params = self.gen_params()
+    if same_arch:
+      new_params = old_params
+    mu = model_util(old_params, old_params)
+    mu.init()
+    expected = sim_util(mu).run()
+    results = mu.pack_cores(new_params=new_params, **kwargs)
+    return expected, mu, results
+
+  def check_packing(self, expected, mu, results):
+    self.assertEqual(sim_util(mu).run(), expected)
+    self.assertEqual(self.connectivity(mu), self.expected_connectivity)
+    self.assertEqual(len(mu.cores), results[self.NUM_BINS_USED])
+    self.assertGreaterEqual(results[self.NUM_BINS_USED], results[self.NUM_BINS_LOWER_BOUND])
+
+  def run_test(self, packing_strategy):
+    self.check_packing(*self.pack(packing_strategy=packing_strategy))
+
+  def test(self):
+    basic_test_util.run_subtests(self, packing_strategy=list(model_util.PACKING_STRATEGIES))
+
+  def test_ilp_time_limit(self):
+    rng = np.random.default_rng(0)
+    item_num_axons = rng.integers(5, 60, 40).tolist()
+    item_num_neurons = rng.integers(5, 60, 40).tolist()
+    capacity = 128
+    hint = model_util.pack_items_greedy(item_num_axons, item_num_neurons, len(item_num_axons), capacity, capacity)
+
+    # stopped long before optimality, the ILP must still return a solution at least as good as its warm start
+    bin_items, lower_bound = model_util.pack_items_ilp(item_num_axons, item_num_neurons, len(hint), capacity, capacity,
+                                                       time_limit=0.01, hint=hint)
+    self.assertIsNotNone(bin_items)
+    self.assertLessEqual(len(bin_items), len(hint))
+    self.assertEqual(sorted(i for items in bin_items for i in items), list(range(len(item_num_axons))))
+    for items in bin_items:
+      self.assertTrue(items)
+      self.assertLessEqual(sum(item_num_axons[i] for i in items), capacity)
+      self.assertLessEqual(sum(item_num_neurons[i] for i in items), capacity)
+    self.assertGreaterEqual(lower_bound, max(-(-sum(item_num_axons) // capacity), -(-sum(item_num_neurons) // capacity)))
+    self.assertLessEqual(lower_bound, len(bin_items))
+
+    self.check_packing(*self.pack(packing_strategy="first_fit", ilp_time_limit=0.01))
+
+  def test_annealing_placement(self):
+    expected, mu, results = self.pack(same_arch=True, packing_strategy="first_fit", placement_strategy="annealing")
+    self.check_packing(expected, mu, results)
+
+    # annealing starts from the raster placement and keeps the best placement it finds
+    self.assertLessEqual(results[self.NEW_MEAN_HOPS], results[self.OLD_MEAN_HOPS])
+    positions = [cd.pos for cd in mu.cores]
+    self.assertEqual(len(set(positions)), len(positions))
+    self.assertNotIn((mu.arch_params.output_core_x_coordinate, mu.arch_params.output_core_y_coordinate), positions)
+    for x, y in positions:
+      self.assertLess(x, mu.arch_params.grid_dimension_x)
+      self.assertLess(y, mu.arch_params.grid_dimension_y)
+
+  def test_firing_counts(self):
+    old_params, _ = self.gen_params()
+    mu = model_util(old_params, old_params)
+    mu.init()
+    sim = sim_util(mu)
+    counts = np.zeros((len(mu.cores), old_params.num_neurons), dtype=np.int64)
+    for _ in range(len(mu.num_input_packets) + old_params.num_ticks):
+      sim.inject()
+      counts += sim.step()[0]
+    self.assertTrue(np.any(counts))
+    neuron_firing_counts = {cd.pos: counts[c] for c, cd in enumerate(mu.cores)}
+
+    for packing_strategy in ("first_fit", "best_fit"):
+      with self.subTest(packing_strategy=packing_strategy):
+        self.check_packing(*self.pack(packing_strategy=packing_strategy, placement_strategy="annealing",
+                                      neuron_firing_counts=neuron_firing_counts))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,116 @@
+import unittest
+import logging
+import sys
+import os
+import shutil
+import tempfile
+
+from spikehard import spikehard
+
+# add '/hardware/util' to system path for module imports
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(
+  os.path.dirname(os.path.dirname(os.path.abspath(__file__))))), "util"))
+from test_util import basic_test_util  # noqa: E402
+from model_util import model_util  # noqa: E402
+from sim_util import sim_util  # noqa: E402
+from common_util import set_spikehard_param  # noqa: E402
+
+
+class test_sim(unittest.TestCase):
+  logger = logging.getLogger(__name__)
+  logger.setLevel(logging.DEBUG)
+
+  @staticmethod
+  def packets_per_tick(num_packets, packets):
+    result = []
+    for n in num_packets:
+      result.append(sorted(packets[:n]))
+      packets = packets[n:]
+    return result
+
+  def run_test(self, model):
+    test_params = basic_test_util.gen_test_params(*model)
+    mu = model_util(test_params, test_params)
+    mu.init()
+
+    # input packets read a tick at a time must match those read at once
+    chunks = [sorted(packets.tolist()) for packets in model_util(test_params, test_params).iter_input_packets()]
+    self.assertEqual(chunks, self.packets_per_tick(mu.num_input_packets, mu.input_packets))
+
+    expected = self.packets_per_tick(mu.num_output_packets, mu.output_packets)
+    actual = self.packets_per_tick(*sim_util(mu).run()[0])
+    self.assertGreaterEqual(len(actual), len(expected))
+    for tick_idx, (expected_packets, actual_packets) in enumerate(zip(expected, actual)):
+      self.assertEqual(expected_packets, actual_packets, "tick {}".format(tick_idx + test_params.tick_latency + 1))
+
+    simulated_mu = model_util(test_params, test_params)
+    simulated_mu.init(parse_outputs=False)
+    simulated_mu.simulate_output_packets()
+    self.assertEqual(actual, self.packets_per_tick(simulated_mu.num_output_packets, simulated_mu.output_packets))
+
+    # the tuned tick delay must lie above the estimated lower bound
+    lower, upper = mu.estimate_tick_delay(test_params.num_ticks_to_check)
+    self.assertIs(type(lower), int)
+    self.assertIs(type(upper), int)
+    self.assertLessEqual(test_params.num_neurons * (test_params.num_axons + 2), lower)
+    self.assertLessEqual(lower, upper)
+    self.assertLessEqual(lower, test_params.clock_cycles_per_tick)
+
+    # samples of a batch must not interfere with each other
+    num_ticks = len(mu.num_input_packets) // 2
+    truncated_inputs = (mu.input_packets[:sum(mu.num_input_packets[:num_ticks])], mu.num_input_packets[:num_ticks])
+    inputs = [truncated_inputs, (mu.input_packets, mu.num_input_packets), ([], [])]
+    batch_outputs = sim_util(mu, inputs=inputs).run()
+    self.assertEqual(len(batch_outputs), len(inputs))
+    for sample_idx, sample_inputs in enumerate(inputs):
+      self.assertEqual(sim_util(mu, inputs=[sample_inputs]).run()[0], batch_outputs[sample_idx],
+                       "sample {}".format(sample_idx))
+
+  def test(self):
+    mnist_unaltered = ("mnist_o", False, 256, 256)
+    mnist_altered = ("mnist_o", True, 256, 256)
+    vmm_unaltered = ("vmm_o", False, 64, 64)
+    vmm_altered = ("vmm_o", True, 256, 256)
+    vmm_altered_small = ("vmm_o", True, 32, 32)
+
+    model = [mnist_unaltered, mnist_altered, vmm_unaltered, vmm_altered, vmm_altered_small]
+    basic_test_util.run_subtests(self, model=model)
+
+  def run_gen_expected_outputs(self, model):
+    # regenerates the expected outputs in a copy of the memory files, which must match those checked in
+    test_params = basic_test_util.gen_test_params(*model)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+      generated_params = set_spikehard_param(test_params, "memory_filepath", os.path.join(tmp_dir, "memory"))
+      shutil.copytree(test_params.memory_filepath, generated_params.memory_filepath)
+      os.remove(basic_test_util.num_outputs_filepath(generated_params))
+      os.remove(basic_test_util.correct_filepath(generated_params))
+      mu = model_util(generated_params, generated_params)
+      mu.init(parse_outputs=False)
+      mu.to_container(basic_test_util.container_filepath(generated_params))
+
+      spikehard.run_test(self, generated_params, generate=True)
+
+      for filepath in (basic_test_util.num_outputs_filepath, basic_test_util.correct_filepath):
+        with open(filepath(test_params), 'r') as expected_file, open(filepath(generated_params), 'r') as actual_file:
+          self.assertEqual(expected_file.read().splitlines(), actual_file.read().splitlines(), filepath(test_params))
+
+      # the container is rewritten with the generated outputs
+      expected_mu = model_util(test_params, test_params)
+      expected_mu.init()
+      container_mu = model_util.from_container(basic_test_util.container_filepath(generated_params))
+      self.assertEqual(expected_mu.num_output_packets, container_mu.num_output_packets)
+      self.assertEqual(expected_mu.output_packets, container_mu.output_packets)
+      del container_mu
+
+  def test_gen_expected_outputs(self):
+    mnist_unaltered = ("mnist_o", False, 256, 256)
+    mnist_altered = ("mnist_o", True, 256, 256)
+    vmm_unaltered = ("vmm_o", False, 64, 64)
+    vmm_altered_small = ("vmm_o", True, 32, 32)
+
+    model = [mnist_unaltered, mnist_altered, vmm_unaltered, vmm_altered_small]
+    basic_test_util.run_subtests(self, run_test=self.run_gen_expected_outputs, model=model)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -85,4 +85,70 @@ spikehard #(
     .debug(debug)
 );
 
+`ifdef TICK_TRACE_FILEPATH
+// Records, for every tick and core, the clock cycles after the tick at which the core finished integrating its neurons
+// and at which its router last delivered a packet to its scheduler, or to the output for the output core, where -1
+// means that it did not. Each tick is written once the next one starts.
+localparam NUM_CORES = `GRID_DIMENSION_X * `GRID_DIMENSION_Y;
+localparam OUTPUT_CORE = `OUTPUT_CORE_X_COORDINATE + `OUTPUT_CORE_Y_COORDINATE * `GRID_DIMENSION_X;
+
+wire [NUM_CORES-1:0] trace_integrated;
+wire [NUM_CORES-1:0] trace_delivered;
+
+genvar trace_core;
+generate
+    for (trace_core = 0; trace_core < NUM_CORES; trace_core = trace_core + 1) begin : gentrace
+        if (trace_core != OUTPUT_CORE) begin : gen_core
+            assign trace_integrated[trace_core] = spikehard_inst.core_grid_inst.gencore[trace_core].gen_core.Core.scheduler_clr;
+            assign trace_delivered[trace_core] = spikehard_inst.core_grid_inst.gencore[trace_core].gen_core.Core.scheduler_wen;
+        end
+        else begin : gen_output_bus
+            assign trace_integrated[trace_core] = 1'b0;
+            assign trace_delivered[trace_core] = spikehard_inst.packet_out_valid;
+        end
+    end
+endgenerate
+
+integer tick_trace_file;
+integer trace_tick_idx;
+integer trace_cycles_since_tick;
+integer trace_core_idx;
+integer trace_integrated_cycles [0:NUM_CORES-1];
+integer trace_delivered_cycles [0:NUM_CORES-1];
+
+initial begin
+    tick_trace_file = $fopen(`TICK_TRACE_FILEPATH, "w");
+    $fwrite(tick_trace_file, "tick,core,integrated,delivered\n");
+    trace_tick_idx = -1;
+    trace_cycles_since_tick = 0;
+end
+
+always @(posedge clk) begin
+    if (spikehard_inst.tick) begin
+        for (trace_core_idx = 0; trace_core_idx < NUM_CORES; trace_core_idx = trace_core_idx + 1) begin
+            if (trace_tick_idx >= 0) begin
+                $fwrite(tick_trace_file, "%0d,%0d,%0d,%0d\n", trace_tick_idx, trace_core_idx,
+                        trace_integrated_cycles[trace_core_idx], trace_delivered_cycles[trace_core_idx]);
+            end
+            trace_integrated_cycles[trace_core_idx] = -1;
+            trace_delivered_cycles[trace_core_idx] = -1;
+        end
+        $fflush(tick_trace_file);
+        trace_tick_idx = trace_tick_idx + 1;
+        trace_cycles_since_tick = 0;
+    end
+    else if (trace_tick_idx >= 0) begin
+        trace_cycles_since_tick = trace_cycles_since_tick + 1;
+        for (trace_core_idx = 0; trace_core_idx < NUM_CORES; trace_core_idx = trace_core_idx + 1) begin
+            if (trace_integrated[trace_core_idx]) begin
+                trace_integrated_cycles[trace_core_idx] = trace_cycles_since_tick;
+            end
+            if (trace_delivered[trace_core_idx]) begin
+                trace_delivered_cycles[trace_core_idx] = trace_cycles_since_tick;
+            end
+        end
+    end
+end
+`endif
+
 endmodule
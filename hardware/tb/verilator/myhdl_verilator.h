@@ -0,0 +1,150 @@
+// Drives a Verilated model from MyHDL through the same pipe protocol as the $from_myhdl and $to_myhdl tasks of
+// ../iverilog/myhdl.c, so that a myhdl.Cosimulation can run the model in place of vvp. The model has no notion of time
+// of its own, it is evaluated whenever MyHDL changes one of its inputs.
+
+#ifndef MYHDL_VERILATOR_H
+#define MYHDL_VERILATOR_H
+
+#include <cstdio>
+#include <cstdlib>
+#include <cstring>
+#include <string>
+#include <vector>
+#include <unistd.h>
+
+#include "verilated.h"
+
+#define MAXLINE 4096
+
+namespace myhdl_verilator {
+
+// a port of the model of at most 64 bits, as exposed by Verilator (CData, SData, IData or QData)
+struct port {
+  std::string name;
+  int width;
+  void *data;
+  size_t size;
+};
+
+template <typename T>
+port make_port(const char *name, int width, T &data) {
+  return port{name, width, &data, sizeof(T)};
+}
+
+static unsigned long long get_value(const port &p) {
+  switch (p.size) {
+    case 1: return *static_cast<CData *>(p.data);
+    case 2: return *static_cast<SData *>(p.data);
+    case 4: return *static_cast<IData *>(p.data);
+    default: return *static_cast<QData *>(p.data);
+  }
+}
+
+static void set_value(const port &p, unsigned long long value) {
+  switch (p.size) {
+    case 1: *static_cast<CData *>(p.data) = static_cast<CData>(value); break;
+    case 2: *static_cast<SData *>(p.data) = static_cast<SData>(value); break;
+    case 4: *static_cast<IData *>(p.data) = static_cast<IData>(value); break;
+    default: *static_cast<QData *>(p.data) = static_cast<QData>(value); break;
+  }
+}
+
+class pipes {
+ public:
+  pipes() {
+    const char *w = getenv("MYHDL_TO_PIPE");
+    const char *r = getenv("MYHDL_FROM_PIPE");
+    if (w == NULL || r == NULL) {
+      fprintf(stderr, "ERROR: no pipes to myhdl\n");
+      exit(1);
+    }
+    wpipe = atoi(w);
+    rpipe = atoi(r);
+  }
+
+  // sends a message and returns the reply, or NULL if the MyHDL simulator is down
+  char *exchange(const std::string &msg) {
+    if (write(wpipe, msg.c_str(), msg.size()) != static_cast<ssize_t>(msg.size())) {
+      return NULL;
+    }
+    ssize_t n = read(rpipe, buf, MAXLINE - 1);
+    if (n <= 0) {
+      return NULL;
+    }
+    buf[n] = '\0';
+    return buf;
+  }
+
+ private:
+  int rpipe;
+  int wpipe;
+  char buf[MAXLINE];
+};
+
+static std::string declare(const char *kind, const std::vector<port> &ports) {
+  std::string msg = std::string(kind) + " 0 ";
+  for (const port &p : ports) {
+    msg += p.name + " " + std::to_string(p.width) + " ";
+  }
+  return msg;
+}
+
+// runs the model until the MyHDL simulator stops, from_ports are driven by MyHDL and to_ports are sent back to it
+template <typename Model>
+int run(Model &model, const std::vector<port> &from_ports, const std::vector<port> &to_ports) {
+  pipes p;
+  if (p.exchange(declare("FROM", from_ports)) == NULL || p.exchange(declare("TO", to_ports)) == NULL) {
+    return 1;
+  }
+
+  model.eval();
+  if (p.exchange("START") == NULL) {
+    return 0;
+  }
+
+  unsigned long long pli_time = 0;
+  std::vector<unsigned long long> sent(to_ports.size());
+  bool first = true;
+  char hex[32];
+  while (true) {
+    // report the outputs that changed since they were last reported
+    std::string msg = std::to_string(pli_time) + " ";
+    for (size_t i = 0; i < to_ports.size(); i++) {
+      unsigned long long value = get_value(to_ports[i]);
+      if (first || value != sent[i]) {
+        snprintf(hex, sizeof(hex), "%llx", value);
+        msg += to_ports[i].name + " " + hex + " ";
+        sent[i] = value;
+      }
+    }
+    first = false;
+
+    char *reply = p.exchange(msg);
+    if (reply == NULL) {
+      break;
+    }
+
+    // as in myhdl.c, the inputs are only applied by replies for the current time, a reply for a later time advances it
+    unsigned long long myhdl_time = strtoull(strtok(reply, " "), NULL, 10);
+    if (myhdl_time > pli_time) {
+      pli_time = myhdl_time;
+      continue;
+    }
+
+    for (const port &from_port : from_ports) {
+      char *value = strtok(NULL, " ");
+      if (value == NULL) {
+        break;
+      }
+      set_value(from_port, strtoull(value, NULL, 16));
+    }
+    model.eval();
+  }
+
+  model.final();
+  return 0;
+}
+
+}  // namespace myhdl_verilator
+
+#endif  // MYHDL_VERILATOR_H
@@ -0,0 +1,126 @@
+import numpy as np
+
+
+class codec_util():
+  WORD_WIDTH = 64
+
+  @staticmethod
+  def elem_layout(elem_width, num_elems, word_width=WORD_WIDTH):
+    # each element is padded to the next power of two and packed LSB first into little-endian words
+    elem_padded_width = (1 << (elem_width - 1).bit_length()) if elem_width > 0 else 1
+    num_words = ((((elem_padded_width * num_elems) - 1) | (word_width - 1)) + 1) // word_width
+    return elem_padded_width, num_words
+
+  @staticmethod
+  def read_mem_lines(source):
+    if isinstance(source, str):
+      with open(source, 'r') as file:
+        source = file.read().split('\n')
+        if source[-1] == '':
+          source.pop()
+
+    lines = []
+    for line in source:
+      bits = "".join(line.split())
+      if bits.strip("01"):
+        # comment
+        continue
+      lines.append(bits)
+    return lines
+
+  @staticmethod
+  def lines_to_bits(lines, width):
+    # returns a (num_lines, width) matrix of bits, most significant bit first
+    if len(lines) == 0:
+      return np.zeros((0, width), dtype=np.uint8)
+
+    data = "".join([line.zfill(width) for line in lines])
+    if len(data) != width * len(lines):
+      raise ValueError("expected binary strings of at most {} bits".format(width))
+    return (np.frombuffer(data.encode('ascii'), dtype=np.uint8) - ord('0')).reshape(len(lines), width)
+
+  @staticmethod
+  def bits_to_lines(bits):
+    num_lines, width = bits.shape
+    data = (bits.astype(np.uint8) + ord('0')).tobytes().decode('ascii')
+    return [data[i * width:(i + 1) * width] for i in range(num_lines)]
+
+  @staticmethod
+  def read_mem_bits(source, width):
+    return codec_util.lines_to_bits(codec_util.read_mem_lines(source), width)
+
+  @staticmethod
+  def bits_to_words(bits, num_elems=None, word_width=WORD_WIDTH):
+    assert word_width == 64, "only 64-bit words are supported"
+    num_elems = bits.shape[0] if num_elems is None else num_elems
+    elem_width = bits.shape[1]
+    elem_padded_width, num_words = codec_util.elem_layout(elem_width, num_elems, word_width)
+    assert bits.shape[0] <= num_elems, (bits.shape, num_elems)
+
+    lsb_first = np.zeros((num_elems, elem_padded_width), dtype=np.uint8)
+    lsb_first[:bits.shape[0], :elem_width] = bits[:, ::-1]
+    flat = np.zeros(num_words * word_width, dtype=np.uint8)
+    flat[:lsb_first.size] = lsb_first.ravel()
+    return np.packbits(flat, bitorder='little').view('<u8').astype(np.uint64)
+
+  @staticmethod
+  def words_to_bits(words, elem_width, num_elems, word_width=WORD_WIDTH):
+    assert word_width == 64, "only 64-bit words are supported"
+    elem_padded_width, num_words = codec_util.elem_layout(elem_width, num_elems, word_width)
+    words = np.asarray(words, dtype=np.uint64)
+    assert len(words) >= num_words, (len(words), num_words)
+
+    flat = np.unpackbits(words.astype('<u8').view(np.uint8), bitorder='little')
+    lsb_first = flat[:num_elems * elem_padded_width].reshape(num_elems, elem_padded_width)
+    return np.ascontiguousarray(lsb_first[:, :elem_width][:, ::-1])
+
+  @staticmethod
+  def write_elems(words, elem_idxs, bits, word_width=WORD_WIDTH):
+    # overwrites the given elements of a packed word array in-place, leaving all other elements untouched
+    assert word_width == 64, "only 64-bit words are supported"
+    elem_idxs = np.asarray(elem_idxs, dtype=np.int64)
+    elem_width = bits.shape[1]
+    elem_padded_width, _ = codec_util.elem_layout(elem_width, 1, word_width)
+
+    if elem_padded_width >= word_width:
+      # every element occupies whole words
+      words_per_elem = elem_padded_width // word_width
+      elem_words = codec_util.bits_to_words(bits, word_width=word_width).reshape(-1, words_per_elem)
+      words.reshape(-1, words_per_elem)[elem_idxs] = elem_words
+    else:
+      # several elements share each word
+      elems_per_word = word_width // elem_padded_width
+      word_idxs = elem_idxs // elems_per_word
+      offsets = ((elem_idxs % elems_per_word) * elem_padded_width).astype(np.uint64)
+      mask = np.uint64((1 << elem_width) - 1)
+      values = codec_util.bits_to_uint(bits).astype(np.uint64)
+      np.bitwise_and.at(words, word_idxs, ~(mask << offsets))
+      np.bitwise_or.at(words, word_idxs, values << offsets)
+
+  @staticmethod
+  def bits_to_uint(bits):
+    # interprets each row of a (num_rows, width) bit matrix as an unsigned integer, width must not exceed 63 bits
+    width = bits.shape[1]
+    assert width < 64, width
+    shifts = np.arange(width - 1, -1, -1, dtype=np.int64)
+    return (bits.astype(np.int64) << shifts).sum(axis=1, dtype=np.int64)
+
+  @staticmethod
+  def bits_to_int(bits):
+    values = codec_util.bits_to_uint(bits)
+    width = bits.shape[1]
+    if width == 0:
+      return values
+    return np.where(values >= (1 << (width - 1)), values - (1 << width), values)
+
+  @staticmethod
+  def int_to_bits(values, width):
+    # two's complement encoding of (possibly negative) integers, most significant bit first
+    values = np.asarray(values, dtype=np.int64)
+    shifts = np.arange(width - 1, -1, -1, dtype=np.int64)
+    return ((values[..., None] >> shifts) & 1).astype(np.uint8)
+
+  @staticmethod
+  def to_signed(values, width):
+    values = np.asarray(values, dtype=np.int64) & ((1 << width) - 1)
+    return np.where(values >= (1 << (width - 1)), values - (1 << width), values)
@@ -0,0 +1,75 @@
+import os
+import json
+import struct
+
+import numpy as np
+
+
+class container_util():
+  # A model container is a single binary file laid out as:
+  #   - MAGIC, followed by the format version and the length of the JSON header as little-endian uint32 and uint64
+  #   - the JSON header, holding the parameters of the model and, for every section, its dtype, shape and offset
+  #   - the sections, each a C-ordered little-endian array aligned to ALIGNMENT bytes
+  # so that every section can be opened with numpy.memmap without reading or copying the rest of the file, and pages
+  # are shared between processes that open the same model.
+  MAGIC = b"SPKHMDL\0"
+  VERSION = 1
+  ALIGNMENT = 64
+  PREAMBLE = struct.Struct("<8sIQ")
+
+  @staticmethod
+  def __align(offset):
+    return -(-offset // container_util.ALIGNMENT) * container_util.ALIGNMENT
+
+  @staticmethod
+  def write(filepath, metadata, sections):
+    # metadata is a JSON-serialisable dict, sections maps names to arrays
+    arrays = {}
+    layout = {}
+    offset = 0
+    for name, values in sections.items():
+      values = np.ascontiguousarray(values)
+      values = values.astype(values.dtype.newbyteorder('<'), copy=False)
+      arrays[name] = values
+      layout[name] = {"dtype": values.dtype.str, "shape": list(values.shape), "offset": offset}
+      offset = container_util.__align(offset + values.nbytes)
+
+    # section offsets are relative to the end of the header, which is aligned in turn
+    header = json.dumps({"metadata": metadata, "sections": layout}).encode('utf-8')
+    data_offset = container_util.__align(container_util.PREAMBLE.size + len(header))
+    header += b" " * (data_offset - container_util.PREAMBLE.size - len(header))
+
+    tmp_filepath = filepath + ".tmp"
+    with open(tmp_filepath, 'wb') as file:
+      file.write(container_util.PREAMBLE.pack(container_util.MAGIC, container_util.VERSION, len(header)))
+      file.write(header)
+      for name, values in arrays.items():
+        file.seek(data_offset + layout[name]["offset"])
+        file.write(values.tobytes())
+      file.truncate(data_offset + offset)
+    os.replace(tmp_filepath, filepath)
+
+  @staticmethod
+  def read(filepath):
+    # returns the metadata and a dict of read-only arrays mapped from the file
+    with open(filepath, 'rb') as file:
+      magic, version, header_length = container_util.PREAMBLE.unpack(file.read(container_util.PREAMBLE.size))
+      if magic != container_util.MAGIC:
+        raise ValueError("{} is not a model container".format(filepath))
+      if version != container_util.VERSION:
+        raise ValueError("{} has version {}, but only version {} is supported".format(
+          filepath, version, container_util.VERSION))
+      header = json.loads(file.read(header_length).decode('utf-8'))
+
+    data_offset = container_util.PREAMBLE.size + header_length
+    sections = {}
+    for name, layout in header["sections"].items():
+      dtype = np.dtype(layout["dtype"])
+      shape = tuple(layout["shape"])
+      if np.prod(shape, dtype=np.int64) == 0:
+        # empty arrays cannot be mapped
+        sections[name] = np.zeros(shape, dtype=dtype)
+        sections[name].flags.writeable = False
+      else:
+        sections[name] = np.memmap(filepath, dtype=dtype, mode='r', offset=data_offset + layout["offset"], shape=shape)
+    return header["metadata"], sections
@@ -1,40 +1,166 @@
 import sys
 import os
 import math
+import time
 import copy
 import shutil
+import tempfile
 import json
 import unittest
 import logging
 import pathlib
+import itertools
+import hashlib
+import glob
+import contextlib
+import concurrent.futures
 
 import numpy as np
+import scipy.sparse
+from scipy.sparse.csgraph import breadth_first_order, connected_components
 from bitstring import BitArray
 from ortools.linear_solver import pywraplp
 
-from common_util import math_util, HARDWARE_DIR, TB_DIR, set_spikehard_param
+from common_util import math_util, HARDWARE_DIR, TB_DIR, set_spikehard_param, spikehard_named_params
+from codec_util import codec_util
+from container_util import container_util
+from sim_util import sim_util
 from test_util import basic_test_util
 
 
 class model_util():
   class core_data():
-    def __init__(self, x, y, tc_words, csram_words):
+    def __init__(self, x, y, tc_words, csram_words, params):
       self.x = x
       self.y = y
+      self.params = params
       self.tc_words = tc_words
       self.csram_words = csram_words
-      self.used_axons = None
-      self.used_neurons = None
-      self.unused_axons = None
-      self.unused_neurons = None
-      self.used_axon_to_neurons = None
-      self.used_neuron_to_axons = None
-      self.minimal_connected_components = None
 
     @property
     def pos(self):
       return (self.x, self.y)
 
+    # usage metadata is derived from the axon bitmap on first use and cached until the csram changes
+
+    @property
+    def used_axons(self):
+      return self.__usage_metadata()["used_axons"]
+
+    @property
+    def used_neurons(self):
+      return self.__usage_metadata()["used_neurons"]
+
+    @property
+    def unused_axons(self):
+      return self.__usage_metadata()["unused_axons"]
+
+    @property
+    def unused_neurons(self):
+      return self.__usage_metadata()["unused_neurons"]
+
+    @property
+    def used_axon_to_neurons(self):
+      return self.__usage_metadata()["used_axon_to_neurons"]
+
+    @property
+    def used_neuron_to_axons(self):
+      return self.__usage_metadata()["used_neuron_to_axons"]
+
+    @property
+    def minimal_connected_components(self):
+      return self.__usage_metadata()["minimal_connected_components"]
+
+    @property
+    def csram_words(self):
+      if self._modified_neurons is not None:
+        neuron_idxs = np.flatnonzero(self._modified_neurons)
+        bits = self.__layout.encode_csram_bits(self._neurons[neuron_idxs], self._axon_bitmap[neuron_idxs])
+        if len(neuron_idxs) == self.params.num_neurons:
+          self._csram_words = codec_util.bits_to_words(bits)
+        else:
+          # only re-encode the entries that have been modified
+          self._csram_words = self.__writeable(self._csram_words)
+          codec_util.write_elems(self._csram_words, neuron_idxs, bits)
+        self._modified_neurons = None
+      return self._csram_words
+
+    @csram_words.setter
+    def csram_words(self, words):
+      self._csram_words = words
+      self._neurons = None
+      self._axon_bitmap = None
+      self._modified_neurons = None
+      self._usage_metadata = None
+
+    @property
+    def tc(self):
+      # weight index of each axon
+      tc_elem_width = math_util.clog2(self.params.num_weights)
+      return codec_util.bits_to_uint(codec_util.words_to_bits(self.tc_words, tc_elem_width, self.params.num_axons))
+
+    def update_tc(self, axon_idxs, values):
+      tc_elem_width = math_util.clog2(self.params.num_weights)
+      self.tc_words = self.__writeable(self.tc_words)
+      codec_util.write_elems(self.tc_words, axon_idxs, codec_util.int_to_bits(values, tc_elem_width))
+
+    @property
+    def neurons(self):
+      # decoded csram entries, one record per neuron
+      self.__decode_neurons()
+      return self._neurons
+
+    @property
+    def axon_bitmap(self):
+      # bit (a % 8) of byte (a // 8) of row n is set if neuron n is connected to axon a
+      self.__decode_neurons()
+      return self._axon_bitmap
+
+    @property
+    def connectivity(self):
+      return np.unpackbits(self.axon_bitmap, axis=1, count=self.params.num_axons, bitorder='little').astype(bool)
+
+    @property
+    def dst_cores(self):
+      return (self.x + self.neurons["dx"], self.y + self.neurons["dy"])
+
+    @property
+    def used_neuron_mask(self):
+      return np.any(self.axon_bitmap != 0, axis=1)
+
+    def update_neurons(self, neuron_idxs, neurons, axon_bitmap):
+      self.__decode_neurons()
+      for name in self._neurons.dtype.names:
+        self._neurons[name][neuron_idxs] = neurons[name]
+      self._axon_bitmap[neuron_idxs] = axon_bitmap
+      self.mark_neurons_modified(neuron_idxs)
+
+    def mark_neurons_modified(self, neuron_idxs=None):
+      # must be called after editing neurons or axon_bitmap in-place, the modified csram entries are re-encoded on next use
+      self.__decode_neurons()
+      if self._modified_neurons is None:
+        self._modified_neurons = np.zeros(self.params.num_neurons, dtype=bool)
+      self._modified_neurons[slice(None) if neuron_idxs is None else neuron_idxs] = True
+      self._usage_metadata = None
+
+    @staticmethod
+    def __writeable(words):
+      return words if words.flags.writeable else words.copy()
+
+    def __usage_metadata(self):
+      if self._usage_metadata is None:
+        self._usage_metadata = self.__layout.core_usage_metadata(self)
+      return self._usage_metadata
+
+    def __decode_neurons(self):
+      if self._neurons is None:
+        bits = codec_util.words_to_bits(self._csram_words, self.__layout.csram_read_width(), self.params.num_neurons)
+        self._neurons, self._axon_bitmap = self.__layout.decode_csram_bits(bits)
+
+    @property
+    def __layout(self):
+      return model_util(self.params, self.params)
+
   def __init__(self, arch_params, test_params, cores=None, input_packets=None, output_packets=None, num_input_packets=None, num_output_packets=None) -> None:
     self.arch_params = arch_params
     self.test_params = test_params
@@ -44,8 +170,49 @@ class model_util():
     self.num_input_packets = num_input_packets
     self.num_output_packets = num_output_packets
 
+  # compressed models are cached by the hash of the source memory files and the packing arguments, keeping the most
+  # recently used ones
+  COMPRESS_CACHE_DIR = os.environ.get("SPIKEHARD_COMPRESS_CACHE_DIR",
+                                      os.path.join(os.path.expanduser("~"), ".cache", "spikehard", "compress"))
+  COMPRESS_CACHE_SIZE = int(os.environ.get("SPIKEHARD_COMPRESS_CACHE_SIZE", 32))
+  # version of the packing and placement algorithms, which must be bumped whenever they change the compressed models
+  # or their results, so that models compressed by older versions are no longer reused
+  COMPRESS_CACHE_VERSION = 1
+
+  @staticmethod
+  def compress_cache_key(original_params, new_params, **kwargs):
+    # the memory files are hashed by content, so the key does not depend on where they are stored
+    sha = hashlib.sha256()
+    for path in sorted(glob.glob(os.path.join(original_params.memory_filepath, "*"))):
+      if os.path.isfile(path):
+        sha.update(os.path.basename(path).encode())
+        with open(path, 'rb') as file:
+          sha.update(hashlib.sha256(file.read()).digest())
+    args = {"version": model_util.COMPRESS_CACHE_VERSION,
+            "original_params": set_spikehard_param(original_params, "memory_filepath", None)._asdict(),
+            "new_params": new_params._asdict(), **kwargs}
+    sha.update(json.dumps(args, sort_keys=True, default=str).encode())
+    return sha.hexdigest()
+
+  @staticmethod
+  def evict_compress_cache(cache_dir=None, cache_size=None):
+    # removes the least recently used compressed models beyond the cache size
+    cache_dir = model_util.COMPRESS_CACHE_DIR if cache_dir is None else cache_dir
+    cache_size = model_util.COMPRESS_CACHE_SIZE if cache_size is None else cache_size
+    entries = glob.glob(os.path.join(cache_dir, "*.bin"))
+    entries.sort(key=os.path.getmtime, reverse=True)
+    for path in entries[cache_size:]:
+      try:
+        os.remove(path)
+      except FileNotFoundError:
+        pass
+
   @staticmethod
-  def compress_model(original_params, new_params=None, minimise_arch_dims: bool = True, minimise_num_outputs: bool = True) -> 'model_util':
+  def compress_model(original_params, new_params=None, minimise_arch_dims: bool = True, minimise_num_outputs: bool = True,
+                     packing_strategy: str = "ilp", ilp_time_limit=None, ilp_num_threads=None,
+                     placement_strategy: str = "raster", neuron_firing_counts=None, use_cache=True) -> 'model_util':
+    # if use_cache, the packed model and its results are reused from, or added to, COMPRESS_CACHE_DIR. Models packed
+    # by neuron firing counts are never cached
     new_params = (original_params if new_params is None else new_params)
     new_params = set_spikehard_param(new_params, "memory_filepath", None)
 
@@ -53,10 +220,29 @@ class model_util():
     print("changing number of neurons per core from {} to {}".format(
       original_params.num_neurons, new_params.num_neurons))
 
+    cache_path = None
+    if use_cache and neuron_firing_counts is None:
+      key = model_util.compress_cache_key(original_params, new_params, minimise_arch_dims=minimise_arch_dims,
+                                          minimise_num_outputs=minimise_num_outputs, packing_strategy=packing_strategy,
+                                          ilp_time_limit=ilp_time_limit, placement_strategy=placement_strategy)
+      cache_path = os.path.join(model_util.COMPRESS_CACHE_DIR, "{}.bin".format(key))
+      if os.path.exists(cache_path):
+        print("using cached compressed model {}".format(cache_path))
+        os.utime(cache_path)
+        metadata, _ = container_util.read(cache_path)
+        return model_util.from_container(cache_path), metadata["results"]
+
     mu = model_util(original_params, original_params)
     mu.init()
     results = mu.pack_cores(new_params=new_params, minimise_arch_dims=minimise_arch_dims,
-                            minimise_num_outputs=minimise_num_outputs)
+                            minimise_num_outputs=minimise_num_outputs, packing_strategy=packing_strategy,
+                            ilp_time_limit=ilp_time_limit, ilp_num_threads=ilp_num_threads,
+                            placement_strategy=placement_strategy, neuron_firing_counts=neuron_firing_counts)
+
+    if cache_path is not None:
+      os.makedirs(model_util.COMPRESS_CACHE_DIR, exist_ok=True)
+      mu.to_container(cache_path, {"results": [v.item() if isinstance(v, np.generic) else v for v in results]})
+      model_util.evict_compress_cache()
 
     return mu, results
 
@@ -90,13 +276,14 @@ class model_util():
     return BitArray(uint=(1 << (self.csram_read_width(p) - (p.num_axons + 2 * p.potential_width + p.weight_width * p.num_weights + p.leak_width + p.threshold_width))),
                     length=self.csram_read_width(p)).bin
 
-  def unused_axon_bit_str(self, params=None) -> str:
+  def unused_neuron_record(self, params=None):
     p = (self.arch_params if params is None else params)
-    return "".zfill(math_util.clog2(p.num_weights))
+    neurons, axon_bitmap = self.decode_csram_bits(codec_util.lines_to_bits([self.unused_neuron_bit_str(p)], self.csram_read_width(p)), p)
+    return neurons[0], axon_bitmap[0]
 
-  def no_input_axons_bit_str_prefix(self, params=None) -> str:
+  def unused_axon_bit_str(self, params=None) -> str:
     p = (self.arch_params if params is None else params)
-    return "".zfill(p.num_axons)
+    return "".zfill(math_util.clog2(p.num_weights))
 
   @property
   def core_data_payload_word_width(self) -> int:
@@ -119,341 +306,245 @@ class model_util():
   def in_packets_payload_word_width(self) -> int:
     return self.ceil_word_width(self.packet_width())
 
-  def gen_core(self, tc_file, csram_file, cur_x, cur_y):
-    def get_params(elem_width, num_elems):
-      elem_padded_width = (1 << math_util.clog2(elem_width))
-      num_words = ((((elem_padded_width * num_elems) - 1) | (self.core_data_payload_word_width - 1)) +
-                   1) // self.core_data_payload_word_width
-      return (elem_padded_width - elem_width, num_words)
+  def csram_fields(self, params=None):
+    # (name, width, count, signed) of every field following the axon mask, most significant first.
+    # fields with a count of None are scalars.
+    clog2 = math_util.clog2
+    p = (self.arch_params if params is None else params)
+    return [("current_potential", p.potential_width, None, True),
+            ("reset_potential", p.potential_width, None, True),
+            ("weights", p.weight_width, p.num_weights, True),
+            ("leak", p.leak_width, None, True),
+            ("positive_threshold", p.threshold_width, None, True),
+            ("negative_threshold", p.threshold_width, None, True),
+            ("reset_mode", clog2(p.num_reset_modes), None, False),
+            ("dx", self.dx_width(p), None, True),
+            ("dy", self.dy_width(p), None, True),
+            ("dst_axon", self.dst_axon_width(p), None, False),
+            ("tick", self.tick_width(p), None, False)]
+
+  def csram_dtype(self, params=None):
+    return np.dtype([(name, np.int64) if count is None else (name, np.int64, (count,))
+                     for name, width, count, signed in self.csram_fields(params)])
+
+  def decode_csram_bits(self, bits, params=None):
+    # returns a record per neuron and a packed bitmap of the axons each neuron is connected to
+    p = (self.arch_params if params is None else params)
+    assert bits.shape[1] == self.csram_read_width(p), (bits.shape, self.csram_read_width(p))
+
+    neurons = np.zeros(len(bits), dtype=self.csram_dtype(p))
+    axon_bitmap = np.packbits(bits[:, :p.num_axons][:, ::-1], axis=1, bitorder='little')
+    start_idx = p.num_axons
+    for name, width, count, signed in self.csram_fields(p):
+      values = []
+      for _ in range(1 if count is None else count):
+        field_bits = bits[:, start_idx:start_idx + width]
+        values.append(codec_util.bits_to_int(field_bits) if signed else codec_util.bits_to_uint(field_bits))
+        start_idx += width
+      neurons[name] = values[0] if count is None else np.stack(values, axis=1)
+    return neurons, axon_bitmap
+
+  def encode_csram_bits(self, neurons, axon_bitmap, params=None):
+    p = (self.arch_params if params is None else params)
+    num_neurons = len(neurons)
+    axons = np.unpackbits(axon_bitmap, axis=1, bitorder='little')[:, :p.num_axons]
+
+    bits = np.zeros((num_neurons, self.csram_read_width(p)), dtype=np.uint8)
+    bits[:, p.num_axons - axons.shape[1]:p.num_axons] = axons[:, ::-1]
+    start_idx = p.num_axons
+    for name, width, count, signed in self.csram_fields(p):
+      values = neurons[name]
+      if count is not None:
+        # missing trailing entries are zero
+        values = np.zeros((num_neurons, count), dtype=np.int64)
+        values[:, :neurons[name].shape[1]] = neurons[name]
+        values = values.reshape(-1)
+      field_width = width * (1 if count is None else count)
+      bits[:, start_idx:start_idx + field_width] = codec_util.int_to_bits(values, width).reshape(num_neurons, -1)
+      start_idx += field_width
+    return bits
 
+  def gen_core(self, tc_file, csram_file, cur_x, cur_y):
     tc_elem_width = math_util.clog2(self.arch_params.num_weights)
     csram_elem_width = self.csram_read_width()
 
-    tc_elem_padding, tc_num_words = get_params(tc_elem_width, self.arch_params.num_axons)
-    csram_elem_padding, csram_num_words = get_params(csram_elem_width, self.arch_params.num_neurons)
-
-    def reshape_csram_entry(bit_str):
-      value = 0
-      for idx, bit in enumerate(bit_str[self.test_params.num_axons:][::-1]):
-        value |= int(bit) << idx
-
-      start_idx = 0
-
-      def read_field(length):
-        nonlocal start_idx
-        field_value = (value >> start_idx) & ((2 ** length) - 1)
-        start_idx += length
-
-        if field_value < 0:
-          return BitArray(int=field_value, length=length).uint
-        else:
-          return field_value
-
-      def adjust_core_offset(dx, dy):
-        if dx == 0 and dy == 0:
-          return (dx, dy)
-
-        old_dx = BitArray(uint=dx, length=self.dx_width(self.test_params)).int
-        old_dy = BitArray(uint=dy, length=self.dy_width(self.test_params)).int
-        dst_x = old_dx + cur_x
-        dst_y = old_dy + cur_y
-
-        if cur_x == self.arch_params.output_core_x_coordinate and cur_y == self.arch_params.output_core_y_coordinate:
-          # this core has been moved
-          if dst_x == self.test_params.output_core_x_coordinate and dst_y == self.test_params.output_core_y_coordinate:
-            # trying to send to output core
-            new_dx = self.arch_params.output_core_x_coordinate - self.test_params.output_core_x_coordinate
-            new_dy = self.arch_params.output_core_y_coordinate - self.test_params.output_core_y_coordinate
-          else:
-            # trying to send to an unmoved core
-            new_dx = dst_x - self.test_params.output_core_x_coordinate
-            new_dy = dst_y - self.test_params.output_core_y_coordinate
-        elif dst_x == self.test_params.output_core_x_coordinate and dst_y == self.test_params.output_core_y_coordinate:
-          # trying to send to output core from an unmoved core
-          new_dx = self.arch_params.output_core_x_coordinate - cur_x
-          new_dy = self.arch_params.output_core_y_coordinate - cur_y
-        elif dst_x == self.arch_params.output_core_x_coordinate and dst_y == self.arch_params.output_core_y_coordinate:
-          # trying to send to moved core from an unmoved core
-          new_dx = self.test_params.output_core_x_coordinate - cur_x
-          new_dy = self.test_params.output_core_y_coordinate - cur_y
-        else:
-          # trying to send to an unmoved core from an unmoved core
-          new_dx = old_dx
-          new_dy = old_dy
-
-        assert cur_x != self.test_params.output_core_x_coordinate or cur_y != self.test_params.output_core_y_coordinate, (
-          cur_x, cur_y, self.test_params, self.arch_params)
-
-        return (new_dx, new_dy)
-
-      destination_tick = read_field(self.tick_width(self.test_params))
-      destination_axon = read_field(self.dst_axon_width(self.test_params))
-      destination_core_offset_y = read_field(self.dy_width(self.test_params))
-      destination_core_offset_x = read_field(self.dx_width(self.test_params))
-      destination_core_offset = adjust_core_offset(destination_core_offset_x, destination_core_offset_y)
-      reset_mode = read_field(self.test_params.num_reset_modes.bit_length() - 1)
-      negative_threshold = read_field(self.test_params.threshold_width)
-      positive_threshold = read_field(self.test_params.threshold_width)
-      leak = read_field(self.test_params.leak_width)
-      weights = [0 for _ in range(self.test_params.num_weights)]
-      for i in range(self.test_params.num_weights):
-        weights[self.test_params.num_weights - 1 - i] = read_field(self.test_params.weight_width)
-      reset_potential = read_field(self.test_params.potential_width)
-      current_potential = read_field(self.test_params.potential_width)
-      assert start_idx == (len(bit_str) - self.test_params.num_axons)
-
-      #######################
-      # RECREATE BIT STRING #
-      #######################
-
-      weights = weights + [0] * (self.arch_params.num_weights - self.test_params.num_weights)
-
-      def val_to_string(value, key, signed=False):
-        if key.endswith("width"):
-          old_length = getattr(self.test_params, key)
-          new_length = getattr(self.arch_params, key)
-        else:
-          old_length = math_util.clog2(getattr(self.test_params, key))
-          new_length = math_util.clog2(getattr(self.arch_params, key))
-
-        if signed and (value & (1 << (old_length - 1))):
-          if value < 0:
-            return BitArray(int=value, length=new_length).bin
-
-          for i in range(old_length, new_length):
-            value |= (1 << i)
-
-        return BitArray(uint=value, length=new_length).bin
-
-      new_bit_str = bit_str[:self.test_params.num_axons].zfill(self.arch_params.num_axons) + "".join([
-          val_to_string(current_potential, 'potential_width', signed=True),
-          val_to_string(reset_potential, 'potential_width', signed=True),
-          "".join([val_to_string(weight, 'weight_width', signed=True) for weight in weights]),
-          val_to_string(leak, 'leak_width', signed=True),
-          val_to_string(positive_threshold, 'threshold_width', signed=True),
-          val_to_string(negative_threshold, 'threshold_width', signed=True),
-          val_to_string(reset_mode, 'num_reset_modes'),
-          val_to_string(destination_core_offset[0], 'max_dimension_x', signed=True),
-          val_to_string(destination_core_offset[1], 'max_dimension_y', signed=True),
-          val_to_string(destination_axon, 'num_axons'),
-          val_to_string(destination_tick, 'num_ticks')
-      ])
-
-      same = True
-      for key in self.arch_params._fields:
-        if getattr(self.test_params, key) != getattr(self.arch_params, key):
-          same = False
-          break
-      if same:
-        assert bit_str == new_bit_str
-
-      return new_bit_str
-
-    def read_csram_mem_file():
-      elem_idx = 0
-
-      def csram_process_line(line):
-        nonlocal elem_idx
-
-        is_comment = False
-        for char in line:
-          if char not in ('0', '1') and not char.isspace():
-            is_comment = True
-            break
-        if is_comment:
-          return
-
-        bit_str = ""
-        for char in line:
-          if char in ('0', '1'):
-            bit_str += char
-
-        elem_idx += 1
-        bit_str = reshape_csram_entry(bit_str)
-        yield bit_str
-
-      if isinstance(csram_file, str):
-        with open(csram_file, 'r') as file:
-          for line in file:
-            yield from csram_process_line(line)
-      else:
-        for line in csram_file:
-          yield from csram_process_line(line)
+    tc_bits = codec_util.read_mem_bits(tc_file, tc_elem_width)
+    assert len(tc_bits) == self.test_params.num_axons, (len(tc_bits), self.test_params.num_axons)
 
-      assert elem_idx == self.test_params.num_neurons
+    csram_bits = codec_util.read_mem_bits(csram_file, self.csram_read_width(self.test_params))
+    assert len(csram_bits) == self.test_params.num_neurons, (len(csram_bits), self.test_params.num_neurons)
+    csram_bits = self.reshape_csram_bits(csram_bits, cur_x, cur_y)
 
-      # all zeros apart from positive_threshold
-      bit_str = self.unused_neuron_bit_str()
-      for _ in range(self.arch_params.num_neurons - self.test_params.num_neurons):
-        yield bit_str
+    # all zeros apart from positive_threshold
+    unused_neuron_bits = codec_util.lines_to_bits([self.unused_neuron_bit_str()], csram_elem_width)
+    csram_bits = np.concatenate([csram_bits, np.repeat(unused_neuron_bits, self.arch_params.num_neurons - len(csram_bits), axis=0)])
 
-    def read_tc_mem_file():
-      elem_idx = 0
-
-      def tc_process_line(line):
-        nonlocal elem_idx
-
-        is_comment = False
-        for char in line:
-          if char not in ('0', '1') and not char.isspace():
-            is_comment = True
-            break
-        if is_comment:
-          return
-
-        bit_str = ""
-        for char in line:
-          if char in ('0', '1'):
-            bit_str += char
-
-        elem_idx += 1
-        bit_str = bit_str.zfill(tc_elem_width)
-        yield bit_str
-
-      if isinstance(tc_file, str):
-        with open(tc_file, 'r') as file:
-          for line in file:
-            yield from tc_process_line(line)
-      else:
-        for line in tc_file:
-          yield from tc_process_line(line)
-
-      assert elem_idx == self.test_params.num_axons
-
-      bit_str = self.unused_axon_bit_str()
-      for _ in range(self.arch_params.num_neurons - self.test_params.num_neurons):
-        yield bit_str
-
-    def read_mem_file(reader, num_words, elem_width, elem_padding):
-      bit_idx = 0
-      words = [0 for _ in range(num_words)]
-      for elem in reader():
-        assert len(elem) == elem_width
-        for char in elem[::-1]:
-          assert char in ('0', '1')
-          words[bit_idx //
-                self.core_data_payload_word_width] |= int(char) << (bit_idx % self.core_data_payload_word_width)
-          bit_idx += 1
-        bit_idx += elem_padding
-      return words
-
-    tc_words = read_mem_file(read_tc_mem_file, tc_num_words, tc_elem_width, tc_elem_padding)
-    csram_words = read_mem_file(read_csram_mem_file, csram_num_words, csram_elem_width, csram_elem_padding)
+    tc_words = codec_util.bits_to_words(tc_bits, self.arch_params.num_axons)
+    csram_words = codec_util.bits_to_words(csram_bits)
 
     if cur_x == self.arch_params.output_core_x_coordinate and cur_y == self.arch_params.output_core_y_coordinate:
       cur_x = self.test_params.output_core_x_coordinate
       cur_y = self.test_params.output_core_y_coordinate
 
-    cd = model_util.core_data(cur_x, cur_y, tc_words, csram_words)
-    self.update_core_usage_metadata(cd)
-    return cd
-
-  def parse_input_packets(self, old_packets=None):
-    def adjust_core_offset(dx, dy):
-      if self.test_params.output_core_x_coordinate == self.arch_params.output_core_x_coordinate and self.test_params.output_core_y_coordinate == self.arch_params.output_core_y_coordinate:
-        return (dx, dy)
-
-      if dx == self.test_params.output_core_x_coordinate and dy == self.test_params.output_core_y_coordinate:
-        return (self.arch_params.output_core_x_coordinate, self.arch_params.output_core_y_coordinate)
-      elif dx == self.arch_params.output_core_x_coordinate and dy == self.arch_params.output_core_y_coordinate:
-        return (self.test_params.output_core_x_coordinate, self.test_params.output_core_y_coordinate)
-      else:
-        return (dx, dy)
-
-    def update_packet(packet):
-      start_idx = 0
+    return model_util.core_data(cur_x, cur_y, tc_words, csram_words, self.arch_params)
 
-      def read_field(length):
-        nonlocal start_idx
-        field_value = (packet >> start_idx) & ((2 ** length) - 1)
-        start_idx += length
+  def reshape_csram_bits(self, bits, cur_x, cur_y):
+    # converts csram entries from the test architecture to the target architecture
+    same = True
+    for key in self.arch_params._fields:
+      if getattr(self.test_params, key) != getattr(self.arch_params, key):
+        same = False
+        break
+    if same:
+      return bits
+
+    neurons, axon_bitmap = self.decode_csram_bits(bits, self.test_params)
+    old_dx = neurons["dx"]
+    old_dy = neurons["dy"]
+    dst_x = old_dx + cur_x
+    dst_y = old_dy + cur_y
+
+    tp = self.test_params
+    ap = self.arch_params
+    to_test_out = (dst_x == tp.output_core_x_coordinate) & (dst_y == tp.output_core_y_coordinate)
+    to_arch_out = (dst_x == ap.output_core_x_coordinate) & (dst_y == ap.output_core_y_coordinate)
+
+    if cur_x == ap.output_core_x_coordinate and cur_y == ap.output_core_y_coordinate:
+      # this core has been moved, so it either sends to the output core or an unmoved core
+      new_dx = np.where(to_test_out, ap.output_core_x_coordinate - tp.output_core_x_coordinate,
+                        dst_x - tp.output_core_x_coordinate)
+      new_dy = np.where(to_test_out, ap.output_core_y_coordinate - tp.output_core_y_coordinate,
+                        dst_y - tp.output_core_y_coordinate)
+    else:
+      # this core sends to the output core, the moved core or an unmoved core
+      new_dx = np.where(to_test_out, ap.output_core_x_coordinate - cur_x,
+                        np.where(to_arch_out, tp.output_core_x_coordinate - cur_x, old_dx))
+      new_dy = np.where(to_test_out, ap.output_core_y_coordinate - cur_y,
+                        np.where(to_arch_out, tp.output_core_y_coordinate - cur_y, old_dy))
+
+    assert cur_x != tp.output_core_x_coordinate or cur_y != tp.output_core_y_coordinate or not np.any((old_dx != 0) | (old_dy != 0)), (
+      cur_x, cur_y, tp, ap)
+
+    unchanged = (old_dx == 0) & (old_dy == 0)
+    neurons["dx"] = np.where(unchanged, 0, new_dx)
+    neurons["dy"] = np.where(unchanged, 0, new_dy)
+    return self.encode_csram_bits(neurons, axon_bitmap)
+
+  def rewrite_input_packets(self, packets):
+    # converts input packets from the test architecture to the target architecture, swapping the coordinates of the
+    # output core of each, as reshape_csram_bits does for the cores
+    tp = self.test_params
+    ap = self.arch_params
+    packets = np.asarray(packets, dtype=np.int64)
+    dx, dy, dst_axon, tick = self.decode_packets(packets, tp)
+    if (tp.output_core_x_coordinate, tp.output_core_y_coordinate) != (ap.output_core_x_coordinate, ap.output_core_y_coordinate):
+      to_test_out = (dx == tp.output_core_x_coordinate) & (dy == tp.output_core_y_coordinate)
+      to_arch_out = (dx == ap.output_core_x_coordinate) & (dy == ap.output_core_y_coordinate)
+      dx = np.where(to_test_out, ap.output_core_x_coordinate, np.where(to_arch_out, tp.output_core_x_coordinate, dx))
+      dy = np.where(to_test_out, ap.output_core_y_coordinate, np.where(to_arch_out, tp.output_core_y_coordinate, dy))
+
+    # any bits above the packet are kept as they are
+    width = self.packet_width()
+    return self.encode_packets(dx, dy, dst_axon, tick) | ((packets >> width) << width)
 
-        if field_value < 0:
-          return BitArray(int=field_value, length=length).uint
-        else:
-          return field_value
-
-      destination_tick = read_field(self.tick_width(self.test_params))
-      destination_axon = read_field(self.dst_axon_width(self.test_params))
-      destination_core_offset_y = read_field(self.dy_width(self.test_params))
-      destination_core_offset_x = read_field(self.dx_width(self.test_params))
-      destination_core_offset = adjust_core_offset(destination_core_offset_x, destination_core_offset_y)
-      destination_core_offset_x = BitArray(int=destination_core_offset[0], length=self.dx_width()).uint
-      destination_core_offset_y = BitArray(int=destination_core_offset[1], length=self.dy_width()).uint
-
-      width = 0
-      new_packet = 0
-
-      def add_field(v, l):
-        nonlocal width, new_packet
-        new_packet |= (v << width)
-        width += l
-
-      add_field(destination_tick, self.tick_width())
-      add_field(destination_axon, self.dst_axon_width())
-      add_field(destination_core_offset_y, self.dy_width())
-      add_field(destination_core_offset_x, self.dx_width())
-      new_packet |= ((packet >> width) << width)
-      return new_packet
-
-    packets = []
+  def parse_input_packets(self, old_packets=None):
     if old_packets is None:
       with open(basic_test_util.input_filepath(self.test_params), 'r') as file:
-        for line in file:
-          if line.rstrip() == '':
+        old_packets = [int(line.rstrip(), 2) for line in itertools.takewhile(lambda line: line.rstrip() != '', file)]
+    return self.rewrite_input_packets(old_packets).tolist()
+
+  def iter_input_packets(self, packets_source=None, num_packets_source=None, binary=False):
+    # yields the input packets sent after each tick as an array, uint32 unless packets are wider, holding no more than
+    # a tick of packets in memory. If neither source is given and the model is initialised, its packets are yielded,
+    # otherwise packets_source, by default tb_input.txt, is read as far as the current tick, and rewritten as
+    # rewrite_input_packets does. packets_source is a path or a file object, holding a binary string per line, or raw
+    # little-endian uint32 packets if binary. num_packets_source is a path, by default tb_num_inputs.txt, holding the
+    # number of packets of each tick per line, or an iterable of these numbers.
+    dtype = np.uint32 if self.packet_width() <= 32 else np.uint64
+    if packets_source is None and num_packets_source is None and self.input_packets is not None:
+      packets = np.asarray(self.input_packets, dtype=dtype)
+      offsets = np.concatenate(([0], np.cumsum(self.num_input_packets, dtype=np.int64)))
+      for tick_idx in range(len(self.num_input_packets)):
+        yield packets[offsets[tick_idx]:offsets[tick_idx + 1]]
+      return
+
+    if packets_source is None:
+      packets_source = basic_test_util.input_filepath(self.test_params)
+    if num_packets_source is None:
+      num_packets_source = basic_test_util.num_inputs_filepath(self.test_params)
+
+    with contextlib.ExitStack() as stack:
+      if isinstance(packets_source, (str, os.PathLike)):
+        packets_source = stack.enter_context(open(packets_source, 'rb' if binary else 'r'))
+      if isinstance(num_packets_source, (str, os.PathLike)):
+        num_packets_source = stack.enter_context(open(num_packets_source, 'r'))
+
+      for num_packets in num_packets_source:
+        if isinstance(num_packets, str):
+          if num_packets.rstrip() == '':
             break
-          packet = BitArray(bin=line.rstrip()).uint
-          packets.append(update_packet(packet))
-    else:
-      for packet in old_packets:
-        packets.append(update_packet(packet))
-    return packets
-
-  def update_input_packets(self, src_cd, src_axons, dst_cd, dst_axons, dst_model):
-    def update_packet(packet):
-      start_idx = 0
+          num_packets = int(num_packets)
 
-      def read_field(length):
-        nonlocal start_idx
-        field_value = (packet >> start_idx) & ((2 ** length) - 1)
-        start_idx += length
-
-        if field_value < 0:
-          return BitArray(int=field_value, length=length).uint
+        if binary:
+          data = packets_source.read(4 * num_packets)
+          packets = np.frombuffer(data[:len(data) - len(data) % 4], dtype='<u4')
+          exhausted = len(packets) < num_packets
         else:
-          return field_value
-
-      tick = read_field(self.tick_width())
-      axon = read_field(self.dst_axon_width())
-      dy = read_field(self.dy_width())
-      dx = read_field(self.dx_width())
+          lines = []
+          exhausted = False
+          for line in itertools.islice(packets_source, num_packets):
+            if line.rstrip() == '':
+              exhausted = True
+              break
+            lines.append(int(line.rstrip(), 2))
+          exhausted |= len(lines) < num_packets
+          packets = np.array(lines, dtype=np.int64)
+
+        if len(packets) or not exhausted:
+          yield self.rewrite_input_packets(packets).astype(dtype)
+        if exhausted:
+          break
 
-      if dx != src_cd.x or dy != src_cd.y or axon not in src_axons:
-        return None
+  def decode_packets(self, packets, params=None):
+    # returns the (dx, dy, dst_axon, tick) fields of each packet
+    p = (self.arch_params if params is None else params)
+    packets = np.asarray(packets, dtype=np.int64)
+    fields = []
+    for width in (self.tick_width(p), self.dst_axon_width(p), self.dy_width(p), self.dx_width(p)):
+      fields.append(packets & ((1 << width) - 1))
+      packets = packets >> width
+    return tuple(fields[::-1])
+
+  def encode_packets(self, dx, dy, dst_axon, tick, params=None):
+    p = (self.arch_params if params is None else params)
+    packets = np.zeros(np.shape(tick), dtype=np.int64)
+    for value, width in ((dx, self.dx_width(p)), (dy, self.dy_width(p)), (dst_axon, self.dst_axon_width(p)), (tick, self.tick_width(p))):
+      packets = (packets << width) | (np.asarray(value, dtype=np.int64) & ((1 << width) - 1))
+    return packets
 
-      axon = dst_axons[src_axons.index(axon)]
-      dx = BitArray(int=dst_cd.x, length=dst_model.dx_width()).uint
-      dy = BitArray(int=dst_cd.y, length=dst_model.dy_width()).uint
+  def remap_input_packets(self, src_to_dst, dst_model):
+    # rewrites the destination of every input packet using a (x, y, axon) -> (x', y', axon') lookup
+    dx, dy, dst_axon, tick = self.decode_packets(self.input_packets)
 
-      width = 0
-      new_packet = 0
+    def key(x, y, a):
+      return (np.asarray(x, dtype=np.int64) << 40) | (np.asarray(y, dtype=np.int64) << 20) | np.asarray(a, dtype=np.int64)
 
-      def add_field(v, l):
-        nonlocal width, new_packet
-        new_packet |= (v << width)
-        width += l
+    src_keys = key(*np.array(list(src_to_dst.keys()), dtype=np.int64).reshape(-1, 3).T)
+    dst_values = np.array(list(src_to_dst.values()), dtype=np.int64).reshape(-1, 3)
+    order = np.argsort(src_keys)
+    src_keys = src_keys[order]
+    dst_values = dst_values[order]
 
-      add_field(tick, dst_model.tick_width())
-      add_field(axon, dst_model.dst_axon_width())
-      add_field(dy, dst_model.dy_width())
-      add_field(dx, dst_model.dx_width())
-      assert width == dst_model.packet_width()
-      return new_packet
+    packet_keys = key(dx, dy, dst_axon)
+    idxs = np.minimum(np.searchsorted(src_keys, packet_keys), len(src_keys) - 1)
+    unmapped = src_keys[idxs] != packet_keys
+    if np.any(unmapped):
+      packet_idx = int(np.flatnonzero(unmapped)[0])
+      raise Exception("input packet {} is sent to unmapped axon {} of core {}".format(
+        packet_idx, int(dst_axon[packet_idx]), (int(dx[packet_idx]), int(dy[packet_idx]))))
 
-    for i, packet in enumerate(self.input_packets):
-      new_packet = update_packet(packet)
-      if new_packet is not None:
-        dst_model.input_packets[i] = new_packet
+    new_x, new_y, new_axon = dst_values[idxs].T
+    return dst_model.encode_packets(new_x, new_y, new_axon, tick).tolist()
 
   def parse_output_packets(self, old_packets=None):
     if old_packets is None:
@@ -498,7 +589,8 @@ class model_util():
 
     return values
 
-  def init(self):
+  def init(self, parse_outputs=True):
+    # if parse_outputs is False, the expected output packets are not read, e.g. because they are yet to be generated
     output_core = self.test_params.output_core_x_coordinate + \
       self.test_params.output_core_y_coordinate * self.test_params.grid_dimension_x
 
@@ -524,9 +616,67 @@ class model_util():
         self.cores.append(self.gen_core(tc_path, csram_path, x, y))
 
     self.input_packets = self.parse_input_packets()
-    self.output_packets = self.parse_output_packets()
     self.num_input_packets = self.parse_num_input_packets()
-    self.num_output_packets = self.parse_num_output_packets()
+    if parse_outputs:
+      self.output_packets = self.parse_output_packets()
+      self.num_output_packets = self.parse_num_output_packets()
+    else:
+      self.output_packets = self.num_output_packets = None
+
+  @staticmethod
+  def from_container(filepath):
+    # constructs an initialised model from a container written by to_container, whose core words are mapped from the
+    # file rather than read, and are only copied once a core is modified
+    metadata, sections = container_util.read(filepath)
+    arch_params = spikehard_named_params(**metadata["arch_params"])
+    test_params = spikehard_named_params(**metadata["test_params"])
+
+    cores = []
+    for (x, y), tc_words, csram_words in zip(sections["core_positions"].tolist(), sections["tc_words"],
+                                             sections["csram_words"]):
+      cores.append(model_util.core_data(x, y, tc_words, csram_words, arch_params))
+
+    def packets(name):
+      if name + "_packets" not in sections:
+        return None, None
+      return sections[name + "_packets"].tolist(), np.diff(sections[name + "_offsets"]).tolist()
+
+    input_packets, num_input_packets = packets("input")
+    output_packets, num_output_packets = packets("output")
+    return model_util(arch_params, test_params, cores, input_packets, output_packets, num_input_packets,
+                      num_output_packets)
+
+  def to_container(self, filepath, metadata=None):
+    # writes the model to a single binary file, see container_util, holding the encoded words of every core, and the
+    # packets of the model with the offset of the first packet of every tick. metadata holds further JSON-serialisable
+    # entries to store alongside the parameters
+    assert self.cores is not None, "model must be initialised"
+    p = self.arch_params
+    _, num_tc_words = codec_util.elem_layout(math_util.clog2(p.num_weights), p.num_axons)
+    _, num_csram_words = codec_util.elem_layout(self.csram_read_width(), p.num_neurons)
+
+    sections = {
+      "core_positions": np.array([cd.pos for cd in self.cores], dtype=np.int64).reshape(-1, 2),
+      "tc_words": np.array([cd.tc_words for cd in self.cores], dtype=np.uint64).reshape(-1, num_tc_words),
+      "csram_words": np.array([cd.csram_words for cd in self.cores], dtype=np.uint64).reshape(-1, num_csram_words),
+    }
+
+    for name, packets, num_packets in (("input", self.input_packets, self.num_input_packets),
+                                       ("output", self.output_packets, self.num_output_packets)):
+      if packets is None:
+        continue
+      sections[name + "_packets"] = np.asarray(packets, dtype=np.uint64)
+      sections[name + "_offsets"] = np.concatenate(([0], np.cumsum(num_packets, dtype=np.uint64))).astype(np.uint64)
+
+    metadata = {**({} if metadata is None else metadata),
+                "arch_params": self.arch_params._asdict(), "test_params": self.test_params._asdict()}
+    container_util.write(filepath, metadata, sections)
+
+  def simulate_output_packets(self):
+    # derives the expected output packets from the input packets with the functional simulator, rather than recording
+    # the packets written back by an RTL simulation
+    assert self.cores is not None, "model must be initialised"
+    self.num_output_packets, self.output_packets = sim_util(self).run()[0]
 
   def update(self):
     for i in range(len(self.cores)):
@@ -539,213 +689,121 @@ class model_util():
     self.num_output_packets = self.parse_num_output_packets(self.num_output_packets)
 
   def empty_core(self, x, y):
-    def get_params(elem_width, num_elems):
-      elem_padded_width = (1 << math_util.clog2(elem_width))
-      num_words = ((((elem_padded_width * num_elems) - 1) | (self.core_data_payload_word_width - 1)) +
-                   1) // self.core_data_payload_word_width
-      return (elem_padded_width - elem_width, num_words)
+    tc_bits = np.zeros((self.arch_params.num_axons, math_util.clog2(self.arch_params.num_weights)), dtype=np.uint8)
 
-    tc_elem_width = math_util.clog2(self.arch_params.num_weights)
-    csram_elem_width = self.csram_read_width()
+    # all zeros apart from positive_threshold
+    unused_neuron_bits = codec_util.lines_to_bits([self.unused_neuron_bit_str()], self.csram_read_width())
+    csram_bits = np.repeat(unused_neuron_bits, self.arch_params.num_neurons, axis=0)
 
-    tc_elem_padding, tc_num_words = get_params(tc_elem_width, self.arch_params.num_axons)
-    csram_elem_padding, csram_num_words = get_params(csram_elem_width, self.arch_params.num_neurons)
-
-    def read_csram_mem_file():
-      # all zeros apart from positive_threshold
-      bit_str = self.unused_neuron_bit_str()
-      for _ in range(self.arch_params.num_neurons):
-        yield bit_str
-
-    def read_tc_mem_file():
-      bit_str = self.unused_axon_bit_str()
-      for _ in range(self.arch_params.num_axons):
-        yield bit_str
-
-    def read_mem_file(reader, num_words, elem_width, elem_padding):
-      bit_idx = 0
-      words = [0 for _ in range(num_words)]
-      for elem in reader():
-        assert len(elem) == elem_width
-        for char in elem[::-1]:
-          assert char in ('0', '1')
-          words[bit_idx //
-                self.core_data_payload_word_width] |= int(char) << (bit_idx % self.core_data_payload_word_width)
-          bit_idx += 1
-        bit_idx += elem_padding
-      return words
-
-    tc_words = read_mem_file(read_tc_mem_file, tc_num_words, tc_elem_width, tc_elem_padding)
-    csram_words = read_mem_file(read_csram_mem_file, csram_num_words, csram_elem_width, csram_elem_padding)
-
-    cd = model_util.core_data(x, y, tc_words, csram_words)
-    self.update_core_usage_metadata(cd)
-    return cd
+    return model_util.core_data(x, y, codec_util.bits_to_words(tc_bits), codec_util.bits_to_words(csram_bits), self.arch_params)
+
+  def core_data_words_to_bits(self, cd, params=None):
+    p = (self.arch_params if params is None else params)
+    tc_bits = codec_util.words_to_bits(cd.tc_words, math_util.clog2(p.num_weights), p.num_axons)
+    csram_bits = codec_util.words_to_bits(cd.csram_words, self.csram_read_width(p), p.num_neurons)
+    return tc_bits, csram_bits
 
   def core_data_words_to_mem(self, cd, params=None, verify_correctness=True):
     p = (self.arch_params if params is None else params)
 
-    tc_lines = []
-    csram_lines = []
-
-    def get_params(elem_width, num_elems):
-      elem_padded_width = (1 << math_util.clog2(elem_width))
-      return elem_padded_width - elem_width
-
-    tc_elem_width = math_util.clog2(p.num_weights)
-    csram_elem_width = self.csram_read_width(p)
-
-    tc_elem_padding = get_params(tc_elem_width, p.num_axons)
-    csram_elem_padding = get_params(csram_elem_width, p.num_neurons)
-
-    tc_elem_value = 0
-    for i in range((tc_elem_width + tc_elem_padding) * p.num_axons):
-      tc_elem_value |= ((cd.tc_words[i // self.core_data_payload_word_width] >> (i %
-                        self.core_data_payload_word_width)) & 1) << (i % (tc_elem_width + tc_elem_padding))
-      if (i % (tc_elem_width + tc_elem_padding)) == (tc_elem_width + tc_elem_padding - 1):
-        tc_lines.append(BitArray(uint=tc_elem_value,
-                                 length=tc_elem_width).bin)
-        tc_elem_value = 0
-    assert len(tc_lines) == p.num_axons
-
-    csram_elem_value = 0
-    for i in range((csram_elem_width + csram_elem_padding) * p.num_neurons):
-      csram_elem_value |= ((cd.csram_words[i // self.core_data_payload_word_width] >> (i %
-                           self.core_data_payload_word_width)) & 1) << (i % (csram_elem_width + csram_elem_padding))
-      if (i % (csram_elem_width + csram_elem_padding)) == (csram_elem_width + csram_elem_padding - 1):
-        csram_lines.append(BitArray(uint=csram_elem_value,
-                                    length=csram_elem_width).bin)
-        csram_elem_value = 0
-    assert len(csram_lines) == p.num_neurons
+    tc_bits, csram_bits = self.core_data_words_to_bits(cd, p)
+    tc_lines = codec_util.bits_to_lines(tc_bits)
+    csram_lines = codec_util.bits_to_lines(csram_bits)
 
     if verify_correctness:
       new_cd = model_util(p, p).gen_core(tc_lines, csram_lines, cd.x, cd.y)
-      assert new_cd.tc_words == cd.tc_words
-      assert new_cd.csram_words == cd.csram_words
+      assert np.array_equal(new_cd.tc_words, cd.tc_words)
+      assert np.array_equal(new_cd.csram_words, cd.csram_words)
 
     return tc_lines, csram_lines
 
-  def update_core_usage_metadata(self, cd):
-    tc_lines, csram_lines = self.core_data_words_to_mem(cd, verify_correctness=False)
+  def axon_incidence_matrix(self, cd):
+    # sparse (num_neurons x num_axons) matrix with a non-zero entry for every synapse
+    rows, byte_cols = np.nonzero(cd.axon_bitmap)
+    bits = np.unpackbits(cd.axon_bitmap[rows, byte_cols][:, None], axis=1, bitorder='little')
+    synapse_idxs, bit_idxs = np.nonzero(bits)
+    neurons = rows[synapse_idxs]
+    axons = byte_cols[synapse_idxs] * 8 + bit_idxs
+    return scipy.sparse.csr_matrix((np.ones(len(neurons), dtype=np.int8), (neurons, axons)),
+                                   shape=(self.arch_params.num_neurons, self.arch_params.num_axons))
+
+  def core_usage_metadata(self, cd):
+    num_axons = self.arch_params.num_axons
+    num_neurons = self.arch_params.num_neurons
+    neuron_to_axons = self.axon_incidence_matrix(cd)
+    axon_to_neurons = neuron_to_axons.tocsc()
+
+    axon_degree = np.diff(axon_to_neurons.indptr)
+    neuron_degree = np.diff(neuron_to_axons.indptr)
+    used_axons = np.flatnonzero(axon_degree)
+    used_neurons = np.flatnonzero(neuron_degree)
+
+    # axons in the order they are first connected to when visiting neurons in ascending order
+    first_neuron = axon_to_neurons.indices[axon_to_neurons.indptr[used_axons]]
+    axons_by_first_use = used_axons[np.lexsort((used_axons, first_neuron))]
 
-    used_axons = []
-    used_neurons = [n for n in range(self.arch_params.num_neurons)]
-    unused_axons = [a for a in range(self.arch_params.num_axons)]
-    unused_neurons = []
     used_axon_to_neurons = {}
-    used_neuron_to_axons = {}
-    minimal_connected_components = []
-
-    no_input_axons = self.no_input_axons_bit_str_prefix()
-    for n in range(self.arch_params.num_neurons):
-      if csram_lines[n].startswith(no_input_axons):
-        used_neurons.remove(n)
-        unused_neurons.append(n)
-      else:
-        for a in range(self.arch_params.num_axons):
-          bit = csram_lines[n][self.arch_params.num_axons - a - 1]
-          if bit == '1':
-            if a in unused_axons:
-              unused_axons.remove(a)
-              used_axons.append(a)
-
-            if a in used_axon_to_neurons:
-              used_axon_to_neurons[a].append(n)
-            else:
-              used_axon_to_neurons[a] = [n]
-
-            if n in used_neuron_to_axons:
-              used_neuron_to_axons[n].append(a)
-            else:
-              used_neuron_to_axons[n] = [a]
-          elif bit != '0':
-            raise ValueError("expected binary string")
-
-    axons_to_process = list(used_axons)
-    while len(axons_to_process) > 0:
-      a1 = axons_to_process[-1]
-      axons_to_add = [a1]
-      connected_axons = []
-      connected_neurons = []
-      while len(axons_to_add) > 0:
-        a2 = axons_to_add.pop()
-        connected_axons.append(a2)
-        axons_to_process.remove(a2)
-        for n in used_axon_to_neurons[a2]:
-          if n not in connected_neurons:
-            connected_neurons.append(n)
-            for a3 in used_neuron_to_axons[n]:
-              if a3 not in axons_to_add and a3 not in connected_axons:
-                axons_to_add.append(a3)
-      connected_axons.sort()
-      connected_neurons.sort()
-      minimal_connected_components.append((connected_axons, connected_neurons))
-
-    used_axons.sort()
-    used_neurons.sort()
-    unused_axons.sort()
-    unused_neurons.sort()
-
-    cd.used_axons = used_axons
-    cd.used_neurons = used_neurons
-    cd.unused_axons = unused_axons
-    cd.unused_neurons = unused_neurons
-    cd.used_axon_to_neurons = used_axon_to_neurons
-    cd.used_neuron_to_axons = used_neuron_to_axons
-    cd.minimal_connected_components = minimal_connected_components
-
-  def from_csram_line_get_dst_axon(self, line, params=None):
-    p = (self.arch_params if params is None else params)
-    rev_line = line.rstrip()[::-1]
-    base_offset = self.tick_width(p)
-    return BitArray(bin=rev_line[base_offset:base_offset + self.dst_axon_width(p)][::-1]).uint
+    for a in axons_by_first_use.tolist():
+      used_axon_to_neurons[a] = axon_to_neurons.indices[axon_to_neurons.indptr[a]:axon_to_neurons.indptr[a + 1]].tolist()
 
-  def from_csram_line_get_dst_core(self, line, cd, params=None):
-    p = (self.arch_params if params is None else params)
-    rev_line = line.rstrip()[::-1]
-    base_offset = self.tick_width(p) + self.dst_axon_width(p)
-    dy = BitArray(bin=rev_line[base_offset:base_offset + self.dy_width(p)][::-1]).int
-    base_offset += self.dy_width(p)
-    dx = BitArray(bin=rev_line[base_offset:base_offset + self.dx_width(p)][::-1]).int
-    return (cd.x + dx, cd.y + dy)
+    used_neuron_to_axons = {}
+    for n in used_neurons.tolist():
+      used_neuron_to_axons[n] = neuron_to_axons.indices[neuron_to_axons.indptr[n]:neuron_to_axons.indptr[n + 1]].tolist()
+
+    # connected components of the bipartite axon-neuron graph, where nodes [0, num_axons) are axons
+    synapses = neuron_to_axons.tocoo()
+    graph = scipy.sparse.csr_matrix((synapses.data, (synapses.row + num_axons, synapses.col)),
+                                    shape=(num_axons + num_neurons, num_axons + num_neurons))
+    _, labels = connected_components(graph, directed=False)
+    axon_labels = labels[:num_axons]
+    neuron_labels = labels[num_axons:]
+
+    # components are ordered by the last axon first connected to, most recent first
+    component_order = []
+    visited_labels = set()
+    for a in axons_by_first_use[::-1].tolist():
+      if axon_labels[a] not in visited_labels:
+        visited_labels.add(axon_labels[a])
+        component_order.append(axon_labels[a])
+
+    def group_by_label(idxs, idx_labels):
+      idxs = idxs[np.argsort(idx_labels[idxs], kind='stable')]
+      labels, starts = np.unique(idx_labels[idxs], return_index=True)
+      return dict(zip(labels.tolist(), [group.tolist() for group in np.split(idxs, starts[1:])]))
+
+    component_axons = group_by_label(used_axons, axon_labels)
+    component_neurons = group_by_label(used_neurons, neuron_labels)
+    minimal_connected_components = [(component_axons[label], component_neurons[label]) for label in component_order]
+
+    return {"used_axons": used_axons.tolist(),
+            "used_neurons": used_neurons.tolist(),
+            "unused_axons": np.flatnonzero(axon_degree == 0).tolist(),
+            "unused_neurons": np.flatnonzero(neuron_degree == 0).tolist(),
+            "used_axon_to_neurons": used_axon_to_neurons,
+            "used_neuron_to_axons": used_neuron_to_axons,
+            "minimal_connected_components": minimal_connected_components}
 
   def assert_no_packets_sent_to_axons(self, dst_cd, axons=None):
     if axons is None:
       axons = [i for i in range(self.arch_params.num_axons)]
 
     # check input packets
-    for packet in self.input_packets:
-      start_idx = 0
-
-      def read_field(length):
-        nonlocal start_idx
-        field_value = (packet >> start_idx) & ((2 ** length) - 1)
-        start_idx += length
-
-        if field_value < 0:
-          return BitArray(int=field_value, length=length).uint
-        else:
-          return field_value
-
-      destination_tick = read_field(self.tick_width())
-      destination_axon = read_field(self.dst_axon_width())
-      destination_core_offset_y = read_field(self.dy_width())
-      destination_core_offset_x = read_field(self.dx_width())
-      if ((destination_core_offset_x, destination_core_offset_y) == dst_cd.pos) and (destination_axon in axons):
-        raise Exception("packet being sent to axon {} of core {}".format(destination_axon, dst_cd.pos))
+    dst_x, dst_y, dst_axons, _ = self.decode_packets(self.input_packets)
+    connected = (dst_x == dst_cd.x) & (dst_y == dst_cd.y) & np.isin(dst_axons, axons)
+    for packet_idx in np.flatnonzero(connected):
+      raise Exception("packet being sent to axon {} of core {}".format(dst_axons[packet_idx], dst_cd.pos))
 
     # check all non-dummy neurons
-    no_input_axons = self.no_input_axons_bit_str_prefix()
     for cd in self.cores:
-      tc_lines, csram_lines = self.core_data_words_to_mem(cd)
-      for line_idx, line in enumerate(csram_lines):
-        if (not line.startswith(no_input_axons)) and \
-           (self.from_csram_line_get_dst_core(line, cd) == dst_cd.pos) and \
-           (self.from_csram_line_get_dst_axon(line) in axons):
-          raise Exception("neuron {} of core {} connects to axon {} of core {}".format(
-            line_idx, cd.pos, destination_axon, dst_cd.pos))
+      dst_x, dst_y = cd.dst_cores
+      dst_axons = cd.neurons["dst_axon"]
+      connected = cd.used_neuron_mask & (dst_x == dst_cd.x) & (dst_y == dst_cd.y) & np.isin(dst_axons, axons)
+      for n in np.flatnonzero(connected):
+        raise Exception("neuron {} of core {} connects to axon {} of core {}".format(
+          n, cd.pos, dst_axons[n], dst_cd.pos))
 
   def move_connected_component(self, mcc, dst_pos, dst_base_axon_idx, dst_model, src_to_dst):
+    # input packets are not updated, see remap_input_packets
     assert self != dst_model
     src_cd, src_axons, src_neurons = mcc
     dst_axons = [dst_base_axon_idx + i for i in range(len(src_axons))]
@@ -763,128 +821,116 @@ class model_util():
 
     assert dst_cd.x != dst_model.arch_params.output_core_x_coordinate or dst_cd.y != dst_model.arch_params.output_core_y_coordinate, "cannot move neurons to output core"
 
-    for a in dst_axons:
-      if a not in dst_cd.unused_axons:
-        raise Exception("trying to move axon to an occupied location")
-
-    for a in src_axons:
-      if a in src_cd.unused_axons:
-        raise Exception("trying to move an unused axon")
+    if not np.all(np.isin(dst_axons, dst_cd.unused_axons)):
+      raise Exception("trying to move axon to an occupied location")
 
-    src_tc_lines, src_csram_lines = self.core_data_words_to_mem(src_cd)
-    dst_tc_lines, dst_csram_lines = dst_model.core_data_words_to_mem(dst_cd)
-
-    # update input packets - check destination core and axon, if match adjust core and axon
-    self.update_input_packets(src_cd, src_axons, dst_cd, dst_axons, dst_model)
+    if np.any(np.isin(src_axons, src_cd.unused_axons)):
+      raise Exception("trying to move an unused axon")
 
     # copy over axons to new core
     assert self.arch_params.num_weights == dst_model.arch_params.num_weights
-    for i, src_axon in enumerate(src_axons):
-      dst_tc_lines[dst_axons[i]] = src_tc_lines[src_axon]
+    dst_cd.update_tc(dst_axons, src_cd.tc[src_axons])
 
     # copy over neurons to new core and adjust axon mapping
     assert self.arch_params.num_ticks == dst_model.arch_params.num_ticks
     dst_neurons = dst_cd.unused_neurons[:len(src_neurons)]
-    for i, src_neuron in enumerate(src_neurons):
-      axons_bit_str = "".join(['1' if a in dst_axons and src_axons[dst_axons.index(
-        a)] in src_cd.used_neuron_to_axons[src_neuron] else '0' for a in range(dst_model.arch_params.num_axons)][::-1])
-      dst_x, dst_y = self.from_csram_line_get_dst_core(src_csram_lines[src_neuron], src_cd)
-      dst_axon = self.from_csram_line_get_dst_axon(src_csram_lines[src_neuron])
-
-      dst_x, dst_y, dst_axon = src_to_dst[dst_x, dst_y, dst_axon]
-
-      dx = dst_x - dst_cd.x
-      dy = dst_y - dst_cd.y
-      core_offset_x_bit_str = BitArray(int=dx, length=dst_model.dx_width()).bin
-      core_offset_y_bit_str = BitArray(int=dy, length=dst_model.dy_width()).bin
-      dst_axon_bit_str = BitArray(uint=dst_axon, length=dst_model.dst_axon_width()).bin
-      bit_str = axons_bit_str + src_csram_lines[src_neuron][self.arch_params.num_axons:-self.packet_width(
-      )] + core_offset_x_bit_str + core_offset_y_bit_str + dst_axon_bit_str + src_csram_lines[src_neuron][-self.tick_width():]
-      dst_csram_lines[dst_neurons[i]] = bit_str
-      assert len(bit_str) == dst_model.csram_read_width()
-
-    # regenerate modified core (including usage metadata)
-    dst_model.cores[dst_model.cores.index(dst_cd)] = model_util(
-      dst_model.arch_params, dst_model.arch_params).gen_core(dst_tc_lines, dst_csram_lines, dst_cd.x, dst_cd.y)
+    src_records = src_cd.neurons[src_neurons]
+    records = np.zeros(len(src_neurons), dtype=dst_cd.neurons.dtype)
+    for name in records.dtype.names:
+      records[name] = src_records[name]
+
+    for i in range(len(src_neurons)):
+      dst_x, dst_y, dst_axon = src_to_dst[src_cd.x + int(src_records["dx"][i]),
+                                          src_cd.y + int(src_records["dy"][i]),
+                                          int(src_records["dst_axon"][i])]
+      records["dx"][i] = dst_x - dst_cd.x
+      records["dy"][i] = dst_y - dst_cd.y
+      records["dst_axon"][i] = dst_axon
+
+    connectivity = np.zeros((len(src_neurons), dst_model.arch_params.num_axons), dtype=np.uint8)
+    connectivity[:, dst_axons] = src_cd.connectivity[np.ix_(src_neurons, src_axons)]
+    dst_cd.update_neurons(dst_neurons, records, np.packbits(connectivity, axis=1, bitorder='little'))
 
     print("done")
 
+  def axon_index(self, params=None):
+    # returns a function mapping absolute (x, y, axon) destinations to global axon indices, or -1 if there is no such
+    # axon, where axons of the output core follow those of self.cores
+    p = self.arch_params if params is None else params
+    grid_x = max([p.output_core_x_coordinate] + [cd.x for cd in self.cores]) + 1
+    grid_y = max([p.output_core_y_coordinate] + [cd.y for cd in self.cores]) + 1
+    grid = np.full((grid_x, grid_y), -1, dtype=np.int64)
+    for i, cd in enumerate(self.cores):
+      grid[cd.x, cd.y] = i
+    grid[p.output_core_x_coordinate, p.output_core_y_coordinate] = len(self.cores)
+
+    def lookup(x, y, axon):
+      x = np.asarray(x, dtype=np.int64)
+      y = np.asarray(y, dtype=np.int64)
+      axon = np.asarray(axon, dtype=np.int64)
+      valid = (x >= 0) & (x < grid_x) & (y >= 0) & (y < grid_y) & (axon < p.num_axons)
+      core_idx = np.where(valid, grid[np.where(valid, x, 0), np.where(valid, y, 0)], -1)
+      return np.where(core_idx >= 0, core_idx * p.num_axons + axon, -1)
+
+    return lookup
+
   def remove_dud_neurons_and_input_packets(self, params=None):
+    # a neuron or input packet is live if the output core is reachable from it, which is found with a single traversal
+    # of the reversed network starting from the output core's axons
     p = self.arch_params if params is None else params
     print("removing dud neurons and input packets...")
+    num_axon_nodes = (len(self.cores) + 1) * p.num_axons
+    neuron_offsets = num_axon_nodes + p.num_neurons * np.arange(len(self.cores), dtype=np.int64)
+    root = num_axon_nodes + p.num_neurons * len(self.cores)
+    axon_index = self.axon_index(p)
+
+    # reversed edges: root -> output core axons, axons -> neurons sending to them, neurons -> axons connected to them
+    src_nodes = [np.full(p.num_axons, root, dtype=np.int64)]
+    dst_nodes = [len(self.cores) * p.num_axons + np.arange(p.num_axons, dtype=np.int64)]
+    for i, cd in enumerate(self.cores):
+      used_neurons = np.flatnonzero(cd.used_neuron_mask)
+      dst_x, dst_y = cd.dst_cores
+      dst_axons = axon_index(dst_x[used_neurons], dst_y[used_neurons], cd.neurons["dst_axon"][used_neurons])
+      routed = dst_axons >= 0
+      src_nodes.append(dst_axons[routed])
+      dst_nodes.append(neuron_offsets[i] + used_neurons[routed])
+
+      synapses = self.axon_incidence_matrix(cd).tocoo()
+      src_nodes.append(neuron_offsets[i] + synapses.row)
+      dst_nodes.append(i * p.num_axons + synapses.col)
+
+    src_nodes = np.concatenate(src_nodes)
+    dst_nodes = np.concatenate(dst_nodes)
+    graph = scipy.sparse.csr_matrix((np.ones(len(src_nodes), dtype=np.int8), (src_nodes, dst_nodes)),
+                                    shape=(root + 1, root + 1))
+    live = np.zeros(root + 1, dtype=bool)
+    live[breadth_first_order(graph, root, directed=True, return_predecessors=False)] = True
+
     num_neurons_removed = 0
-    num_packets_removed = 0
-
-    empty_neuron_prefix = self.no_input_axons_bit_str_prefix(p)
-    removed_dud_neuron = True
-    while removed_dud_neuron:
-      removed_dud_neuron = False
-
-      valid_axons = []
-      for cd in self.cores:
-        for connected_axons, connected_neurons in cd.minimal_connected_components:
-          for i, a in enumerate(connected_axons):
-            valid_axons.append((cd.x, cd.y, a))
-
-      for a in range(p.num_axons):
-        valid_axons.append((p.output_core_x_coordinate, p.output_core_y_coordinate, a))
-
-      for cd_idx, cd in enumerate(self.cores):
-        removed_dud_neuron_in_this_core = False
-        tc_lines, csram_lines = self.core_data_words_to_mem(cd, p)
-        for line_idx, line in enumerate(csram_lines):
-          if line.startswith(empty_neuron_prefix):
-            continue
-
-          dst_x, dst_y = self.from_csram_line_get_dst_core(line, cd)
-          dst_axon = self.from_csram_line_get_dst_axon(line)
-          if (dst_x, dst_y, dst_axon) in valid_axons:
-            continue
-
-          csram_lines[line_idx] = self.unused_neuron_bit_str(p)
-
-          num_neurons_removed += 1
-          removed_dud_neuron_in_this_core = True
-          print("removed dud neuron {} of core {}".format(line_idx, cd.pos))
-
-        if removed_dud_neuron_in_this_core:
-          self.cores[cd_idx] = model_util(p, p).gen_core(tc_lines, csram_lines, cd.x, cd.y)
-          removed_dud_neuron = True
-
-      packet_idx = 0
-      num_packets_idx = 0
-      rem_packets_this_tick = int(self.num_input_packets[num_packets_idx])
-      while packet_idx < len(self.input_packets):
-        packet = self.input_packets[packet_idx]
-        while rem_packets_this_tick == 0:
-          num_packets_idx += 1
-          rem_packets_this_tick = int(self.num_input_packets[num_packets_idx])
-        rem_packets_this_tick -= 1
-
-        start_idx = 0
-
-        def read_field(length):
-          nonlocal start_idx
-          field_value = (packet >> start_idx) & ((2 ** length) - 1)
-          start_idx += length
-
-          if field_value < 0:
-            return BitArray(int=field_value, length=length).uint
-          else:
-            return field_value
-
-        dst_tick = read_field(self.tick_width(p))
-        dst_axon = read_field(self.dst_axon_width(p))
-        dst_y = read_field(self.dy_width(p))
-        dst_x = read_field(self.dx_width(p))
-        if (dst_x, dst_y, dst_axon) in valid_axons:
-          packet_idx += 1
-          continue
+    unused_neuron, unused_neuron_axons = self.unused_neuron_record(p)
+    for i, cd in enumerate(self.cores):
+      dud_neurons = np.flatnonzero(cd.used_neuron_mask & ~live[neuron_offsets[i]:neuron_offsets[i] + p.num_neurons])
+      if len(dud_neurons) == 0:
+        continue
 
-        self.input_packets.pop(packet_idx)
-        self.num_input_packets[num_packets_idx] -= 1
-        num_packets_removed += 1
-        print("removed dud input packet sent at tick {}".format(num_packets_idx))
+      cd.neurons[dud_neurons] = unused_neuron
+      cd.axon_bitmap[dud_neurons] = unused_neuron_axons
+      cd.mark_neurons_modified(dud_neurons)
+      num_neurons_removed += len(dud_neurons)
+      for n in dud_neurons.tolist():
+        print("removed dud neuron {} of core {}".format(n, cd.pos))
+
+    # input packets are kept if they are sent to a live axon
+    packet_ticks = np.repeat(np.arange(len(self.num_input_packets)), self.num_input_packets)
+    dst_x, dst_y, dst_axons, _ = self.decode_packets(self.input_packets, p)
+    dst_axons = axon_index(dst_x, dst_y, dst_axons)
+    live_packets = (dst_axons >= 0) & live[np.maximum(dst_axons, 0)]
+    num_packets_removed = int(np.count_nonzero(~live_packets))
+    for tick in packet_ticks[~live_packets].tolist():
+      print("removed dud input packet sent at tick {}".format(tick))
+
+    self.input_packets = [packet for packet, is_live in zip(self.input_packets, live_packets.tolist()) if is_live]
+    self.num_input_packets = np.bincount(packet_ticks[live_packets], minlength=len(self.num_input_packets)).tolist()
 
     print("removed {} dud neurons and {} dud input packets".format(num_neurons_removed, num_packets_removed))
     return num_neurons_removed, num_packets_removed
@@ -910,18 +956,15 @@ class model_util():
     print("packing output axons...")
     p = self.arch_params if params is None else params
 
-    # find all used axons
-    used_axons = []
-    for cd in self.cores:
-      tc_lines, csram_lines = self.core_data_words_to_mem(cd, p)
-      for n in cd.used_neurons:
-        dst_x, dst_y = self.from_csram_line_get_dst_core(csram_lines[n], cd, p)
-        dst_axon = self.from_csram_line_get_dst_axon(csram_lines[n], p)
-        if dst_x == p.output_core_x_coordinate and dst_y == p.output_core_y_coordinate:
-          used_axons.append(dst_axon)
+    def sends_to_output_core(cd):
+      dst_x, dst_y = cd.dst_cores
+      return cd.used_neuron_mask & (dst_x == p.output_core_x_coordinate) & (dst_y == p.output_core_y_coordinate)
 
-    used_axons = list(set(used_axons))
-    used_axons.sort()
+    # find all used axons
+    used_axons = np.unique(np.concatenate([np.zeros(0, dtype=np.int64)] +
+                                          [cd.neurons["dst_axon"][sends_to_output_core(cd)] for cd in self.cores]))
+    used_axons = [int(a) for a in used_axons]
+    new_axon_idxs = {old_a: new_a for new_a, old_a in enumerate(used_axons)}
 
     for new_a, old_a in enumerate(used_axons):
       if new_a != old_a:
@@ -929,51 +972,266 @@ class model_util():
 
     # ensure that all unused axons are not expected in output, if they are then there is a bug in our implementation.
     for packet in self.output_packets:
-      if packet not in used_axons:
+      if packet not in new_axon_idxs:
         raise Exception("expecting dud output axon {} to fire".format(packet))
 
     # update output data
     for i, old_axon in enumerate(self.output_packets):
-      self.output_packets[i] = used_axons.index(old_axon)
+      self.output_packets[i] = new_axon_idxs[old_axon]
 
     # update core data
-    empty_neuron_prefix = self.no_input_axons_bit_str_prefix(p)
-    for cd_idx, cd in enumerate(self.cores):
-      modified_core = False
-      tc_lines, csram_lines = self.core_data_words_to_mem(cd, p)
-      for line_idx, line in enumerate(csram_lines):
-        if line.startswith(empty_neuron_prefix):
-          continue
-
-        dst_x, dst_y = self.from_csram_line_get_dst_core(line, cd, p)
-        if dst_x != p.output_core_x_coordinate or dst_y != p.output_core_y_coordinate:
-          continue
-
-        old_dst_axon = self.from_csram_line_get_dst_axon(line, p)
-        new_dst_axon = used_axons.index(old_dst_axon)
-        if old_dst_axon == new_dst_axon:
-          continue
-
-        dx = dst_x - cd.x
-        dy = dst_y - cd.y
-        core_offset_x_bit_str = BitArray(int=dx, length=self.dx_width(p)).bin
-        core_offset_y_bit_str = BitArray(int=dy, length=self.dy_width(p)).bin
-        dst_axon_bit_str = BitArray(uint=new_dst_axon, length=self.dst_axon_width(p)).bin
-        bit_str = line[:-self.packet_width(p)] + core_offset_x_bit_str + \
-            core_offset_y_bit_str + dst_axon_bit_str + line[-self.tick_width(p):]
-        csram_lines[line_idx] = bit_str
-        assert len(bit_str) == self.csram_read_width(p)
-        modified_core = True
-
-      if modified_core:
-        self.cores[cd_idx] = model_util(p, p).gen_core(tc_lines, csram_lines, cd.x, cd.y)
+    axon_map = np.arange(p.num_axons, dtype=np.int64)
+    axon_map[used_axons] = np.arange(len(used_axons), dtype=np.int64)
+    for cd in self.cores:
+      dst_axons = cd.neurons["dst_axon"]
+      to_move = sends_to_output_core(cd) & (axon_map[dst_axons] != dst_axons)
+      if np.any(to_move):
+        dst_axons[to_move] = axon_map[dst_axons[to_move]]
+        cd.mark_neurons_modified()
 
     old_num_outputs = round(2 ** math.ceil(math.log(p.num_outputs, 2)))
     new_num_outputs = round(2 ** math.ceil(math.log(len(used_axons), 2)))
     print("packed output axons thereby changing the number of outputs from {} to {}".format(old_num_outputs, new_num_outputs))
     return new_num_outputs
 
-  def pack_cores(self, old_params=None, new_params=None, minimise_arch_dims=True, minimise_num_outputs=True):
+  PACKING_STRATEGIES = ("ilp", "first_fit", "best_fit")
+  PLACEMENT_STRATEGIES = ("raster", "annealing")
+
+  @staticmethod
+  def pack_items_greedy(item_num_axons, item_num_neurons, num_bins, bin_axon_capacity, bin_neuron_capacity, best_fit=False,
+                        item_affinity=None):
+    # first-fit decreasing / best-fit decreasing 2D vector bin packing, returns the items of each used bin, if the
+    # sparse item_affinity matrix is given then items are only placed in the bins with the highest affinity to them
+    item_num_axons = np.asarray(item_num_axons, dtype=np.int64)
+    item_num_neurons = np.asarray(item_num_neurons, dtype=np.int64)
+    axon_load = item_num_axons / bin_axon_capacity
+    neuron_load = item_num_neurons / bin_neuron_capacity
+    # largest items first, ordered by their dominant resource and then by their total resource usage
+    order = np.lexsort((np.arange(len(item_num_axons)), -(axon_load + neuron_load), -np.maximum(axon_load, neuron_load)))
+
+    rem_axons = np.full(num_bins, bin_axon_capacity, dtype=np.int64)
+    rem_neurons = np.full(num_bins, bin_neuron_capacity, dtype=np.int64)
+    bin_items = []
+    item_bins = np.full(len(item_num_axons), -1, dtype=np.int64)
+    for i in order.tolist():
+      fits = (rem_axons[:len(bin_items)] >= item_num_axons[i]) & (rem_neurons[:len(bin_items)] >= item_num_neurons[i])
+      if item_affinity is not None and np.any(fits):
+        neighbours = item_affinity.indices[item_affinity.indptr[i]:item_affinity.indptr[i + 1]]
+        affinities = item_affinity.data[item_affinity.indptr[i]:item_affinity.indptr[i + 1]]
+        placed = item_bins[neighbours] >= 0
+        bin_affinity = np.bincount(item_bins[neighbours[placed]], weights=affinities[placed], minlength=len(bin_items))
+        fits &= bin_affinity == bin_affinity[fits].max()
+
+      if not np.any(fits):
+        if len(bin_items) == num_bins or item_num_axons[i] > bin_axon_capacity or item_num_neurons[i] > bin_neuron_capacity:
+          return None
+        j = len(bin_items)
+        bin_items.append([])
+      elif best_fit:
+        slack = (rem_axons[:len(bin_items)] - item_num_axons[i]) / bin_axon_capacity + \
+          (rem_neurons[:len(bin_items)] - item_num_neurons[i]) / bin_neuron_capacity
+        j = int(np.argmin(np.where(fits, slack, np.inf)))
+      else:
+        j = int(np.argmax(fits))
+
+      bin_items[j].append(i)
+      item_bins[i] = j
+      rem_axons[j] -= item_num_axons[i]
+      rem_neurons[j] -= item_num_neurons[i]
+
+    return [sorted(items) for items in bin_items]
+
+  @staticmethod
+  def pack_items_ilp(item_num_axons, item_num_neurons, num_bins, bin_axon_capacity, bin_neuron_capacity, time_limit=None,
+                     num_threads=None, hint=None):
+    # exact 2D vector bin packing, returns the items of each used bin (or None if no solution was found) and a lower
+    # bound on the number of bins required, the best solution found so far is returned if the time limit is reached
+    # This implementation is inspired by: https://developers.google.com/optimization/bin/bin_packing
+    items = list(range(len(item_num_axons)))
+    bins = list(range(num_bins))
+
+    solver = pywraplp.Solver.CreateSolver('SCIP')
+    if time_limit is not None:
+      solver.SetTimeLimit(int(time_limit * 1000))
+    if num_threads is not None and not solver.SetNumThreads(num_threads):
+      logging.warning("could not set the number of threads used by the ILP solver to {}".format(num_threads))
+
+    # variable: x[i, j] = 1 if item i is packed in bin j.
+    x = {}
+    for i in items:
+      for j in bins:
+        x[(i, j)] = solver.IntVar(0, 1, 'x_%i_%i' % (i, j))
+
+    # variable: y[j] = 1 if bin j is used.
+    y = {}
+    for j in bins:
+      y[j] = solver.IntVar(0, 1, 'y[%i]' % j)
+
+    # constraint: each item must be in exactly one bin.
+    for i in items:
+      solver.Add(sum(x[i, j] for j in bins) == 1)
+
+    # constraint: the amount packed in each bin cannot exceed its 2D capacity.
+    for j in bins:
+      solver.Add(sum(x[(i, j)] * item_num_axons[i] for i in items) <= y[j] * bin_axon_capacity)
+      solver.Add(sum(x[(i, j)] * item_num_neurons[i] for i in items) <= y[j] * bin_neuron_capacity)
+
+    # constraint: bins are used in order, which removes symmetric solutions that only permute the bins.
+    for j in bins[:-1]:
+      solver.Add(y[j] >= y[j + 1])
+
+    # start from the given solution, whose bins must be in order
+    if hint is not None:
+      hint_bins = {i: j for j, bin_item_idxs in enumerate(hint) for i in bin_item_idxs}
+      solver.SetHint([x[i, j] for i in items for j in bins] + [y[j] for j in bins],
+                     [float(hint_bins[i] == j) for i in items for j in bins] + [float(j < len(hint)) for j in bins])
+
+    solver.Minimize(solver.Sum([y[j] for j in bins]))
+    status = solver.Solve()
+    print("allocated resources in {} seconds".format(solver.WallTime() / 1000))
+
+    # trivial lower bound from the total resource usage, which the ILP bound is clamped to as SCIP reports a bound of
+    # -1e20 if it is stopped before solving the root relaxation
+    lower_bound = max(math.ceil(sum(item_num_axons) / bin_axon_capacity),
+                      math.ceil(sum(item_num_neurons) / bin_neuron_capacity))
+    if status == pywraplp.Solver.OPTIMAL:
+      lower_bound = round(solver.Objective().Value())
+    elif status == pywraplp.Solver.FEASIBLE:
+      lower_bound = max(lower_bound, math.ceil(solver.Objective().BestBound() - 1e-6))
+    else:
+      return None, lower_bound
+
+    bin_items = []
+    for j in bins:
+      if round(y[j].solution_value()) != 1:
+        continue
+      bin_items.append([i for i in items if round(x[i, j].solution_value()) > 0])
+
+    return bin_items, lower_bound
+
+  def item_traffic(self, mccs, params=None, neuron_firing_counts=None):
+    # sparse (num_items + 1) x (num_items + 1) matrix of the traffic sent by the neurons of each MCC to the axons of
+    # each MCC, where the last item is the output core, every neuron sending one packet unless neuron_firing_counts
+    # maps core positions to the number of times each of their neurons fired
+    p = self.arch_params if params is None else params
+    num_items = len(mccs)
+    axon_index = self.axon_index(p)
+    axon_to_item = np.full((len(self.cores) + 1) * p.num_axons, -1, dtype=np.int64)
+    axon_to_item[len(self.cores) * p.num_axons:] = num_items
+    for i, (cd, connected_axons, _) in enumerate(mccs):
+      axon_to_item[axon_index(cd.x, cd.y, connected_axons)] = i
+
+    src_items = [np.zeros(0, dtype=np.int64)]
+    dst_items = [np.zeros(0, dtype=np.int64)]
+    packets = [np.zeros(0, dtype=np.float64)]
+    for i, (cd, _, connected_neurons) in enumerate(mccs):
+      dst_x, dst_y = cd.dst_cores
+      dst_axons = axon_index(dst_x[connected_neurons], dst_y[connected_neurons], cd.neurons["dst_axon"][connected_neurons])
+      if neuron_firing_counts is None:
+        num_packets = np.ones(len(connected_neurons), dtype=np.float64)
+      else:
+        num_packets = np.asarray(neuron_firing_counts[cd.pos], dtype=np.float64)[connected_neurons]
+      routed = dst_axons >= 0
+      src_items.append(np.full(np.count_nonzero(routed), i, dtype=np.int64))
+      dst_items.append(axon_to_item[dst_axons[routed]])
+      packets.append(num_packets[routed])
+
+    src_items = np.concatenate(src_items)
+    dst_items = np.concatenate(dst_items)
+    packets = np.concatenate(packets)
+    routed = dst_items >= 0
+    return scipy.sparse.csr_matrix((packets[routed], (src_items[routed], dst_items[routed])),
+                                   shape=(num_items + 1, num_items + 1))
+
+  @staticmethod
+  def bin_traffic(item_traffic, bin_items):
+    # dense (num_bins + 1) x (num_bins + 1) traffic matrix of the packed items, where the last bin is the output core
+    num_items = item_traffic.shape[0] - 1
+    item_bins = np.full(num_items + 1, len(bin_items), dtype=np.int64)
+    for j, bin_item_idxs in enumerate(bin_items):
+      item_bins[bin_item_idxs] = j
+    membership = scipy.sparse.csr_matrix((np.ones(num_items + 1), (np.arange(num_items + 1), item_bins)),
+                                         shape=(num_items + 1, len(bin_items) + 1))
+    return (membership.T @ item_traffic @ membership).toarray()
+
+  @staticmethod
+  def hop_stats(traffic, positions):
+    # traffic-weighted mean and maximum Manhattan distance travelled by packets between the given core positions
+    positions = np.asarray(positions, dtype=np.int64)
+    hops = np.abs(positions[:, None, :] - positions[None, :, :]).sum(axis=2)
+    total_traffic = traffic.sum()
+    if total_traffic == 0:
+      return 0.0, 0
+    return float((traffic * hops).sum() / total_traffic), int(hops[traffic > 0].max())
+
+  @staticmethod
+  def anneal_placement(traffic, slots, fixed_pos, num_iterations=20000, seed=0):
+    # assigns the first len(traffic) - 1 bins to distinct slots, while the last bin stays at fixed_pos, minimising the
+    # traffic-weighted Manhattan distance with simulated annealing over pairwise swaps of slots
+    num_bins = len(traffic) - 1
+    num_slots = len(slots)
+    assert num_slots >= num_bins, (num_slots, num_bins)
+
+    # nodes [0, num_bins) are bins, [num_bins, num_slots) are empty slots and the last node is fixed
+    weights = np.zeros((num_slots + 1, num_slots + 1), dtype=np.float64)
+    sym_traffic = traffic + traffic.T
+    nodes = np.r_[np.arange(num_bins), num_slots]
+    weights[np.ix_(nodes, nodes)] = sym_traffic
+    np.fill_diagonal(weights, 0)
+
+    positions = np.array(list(slots) + [fixed_pos], dtype=np.int64)
+
+    def node_dists(node):
+      return np.abs(positions - positions[node]).sum(axis=1)
+
+    def swap_delta(u, v):
+      delta = (weights[u] - weights[v]) * (node_dists(v) - node_dists(u))
+      return delta.sum() - delta[u] - delta[v]
+
+    def cost():
+      hops = np.abs(positions[:, None, :] - positions[None, :, :]).sum(axis=2)
+      return (weights * hops).sum() / 2
+
+    if num_bins == 0 or num_slots < 2 or not np.any(weights):
+      return [tuple(pos) for pos in positions[:num_bins].tolist()]
+
+    rng = np.random.default_rng(seed)
+    us = rng.integers(0, num_bins, num_iterations)
+    vs = rng.integers(0, num_slots - 1, num_iterations)
+    vs += vs >= us
+    thresholds = rng.random(num_iterations)
+
+    # the initial temperature accepts a typical uphill move with probability 1/2, and cools geometrically
+    sample = [abs(swap_delta(u, v)) for u, v in zip(us[:100].tolist(), vs[:100].tolist())]
+    temperature = max(np.mean(sample), 1e-9) / math.log(2)
+    cooling = (1e-3) ** (1 / num_iterations)
+
+    cur_cost = best_cost = cost()
+    best_positions = positions.copy()
+    for u, v, threshold in zip(us.tolist(), vs.tolist(), thresholds.tolist()):
+      delta = swap_delta(u, v)
+      if delta <= 0 or threshold < math.exp(-delta / temperature):
+        positions[[u, v]] = positions[[v, u]]
+        cur_cost += delta
+        if cur_cost < best_cost - 1e-9:
+          best_cost = cur_cost
+          best_positions = positions.copy()
+      temperature *= cooling
+
+    return [tuple(pos) for pos in best_positions[:num_bins].tolist()]
+
+  def pack_cores(self, old_params=None, new_params=None, minimise_arch_dims=True, minimise_num_outputs=True,
+                 packing_strategy="ilp", ilp_time_limit=None, ilp_num_threads=None, placement_strategy="raster",
+                 neuron_firing_counts=None):
+    # packing_strategy selects between an exact ILP and a first-fit or best-fit decreasing heuristic, where the
+    # heuristic solution is refined by the ILP if ilp_time_limit (in seconds) is given, the ILP is warm started by
+    # the first-fit decreasing heuristic and returns its best solution once ilp_time_limit is reached
+    # placement_strategy selects between placing cores in raster order and placing them by simulated annealing to
+    # minimise the traffic-weighted number of hops between them, where traffic is measured in neurons or, if
+    # neuron_firing_counts maps core positions to the number of times each neuron fired, in spikes, which the
+    # heuristic packing strategies also use to keep heavily communicating MCCs on the same core
+    assert packing_strategy in self.PACKING_STRATEGIES, packing_strategy
+    assert placement_strategy in self.PLACEMENT_STRATEGIES, placement_strategy
     print("packing cores...")
     old_params = self.arch_params if old_params is None else old_params
     new_params = self.arch_params if new_params is None else new_params
@@ -1012,8 +1270,7 @@ class model_util():
 
     item_num_axons = [len(mcc[1]) for mcc in mccs]
     item_num_neurons = [len(mcc[2]) for mcc in mccs]
-    items = list(range(len(mccs)))
-    bins = list(range(new_params.grid_dimension_x * new_params.grid_dimension_y - 1))
+    num_bins = new_params.grid_dimension_x * new_params.grid_dimension_y - 1
     bin_axon_capacity = new_params.num_axons
     bin_neuron_capacity = new_params.num_neurons
 
@@ -1025,41 +1282,39 @@ class model_util():
                max(item_num_neurons), min(mcc_size), max(mcc_size)]
     print(results)
 
-    # This implementation is inspired by: https://developers.google.com/optimization/bin/bin_packing
-
-    solver = pywraplp.Solver.CreateSolver('SCIP')
-
-    # variable: x[i, j] = 1 if item i is packed in bin j.
-    x = {}
-    for i in items:
-      for j in bins:
-        x[(i, j)] = solver.IntVar(0, 1, 'x_%i_%i' % (i, j))
-
-    # variable: y[j] = 1 if bin j is used.
-    y = {}
-    for j in bins:
-      y[j] = solver.IntVar(0, 1, 'y[%i]' % j)
-
-    # constraint: each item must be in exactly one bin.
-    for i in items:
-      solver.Add(sum(x[i, j] for j in bins) == 1)
-
-    # constraint: the amount packed in each bin cannot exceed its 2D capacity.
-    for j in bins:
-      solver.Add(sum(x[(i, j)] * item_num_axons[i] for i in items) <= y[j] * bin_axon_capacity)
-      solver.Add(sum(x[(i, j)] * item_num_neurons[i] for i in items) <= y[j] * bin_neuron_capacity)
+    item_traffic = self.item_traffic(mccs, old_params, neuron_firing_counts)
+    item_affinity = None
+    if neuron_firing_counts is not None:
+      item_affinity = item_traffic[:-1, :-1]
+      item_affinity = (item_affinity + item_affinity.T).tocsr()
 
     print("performing resource allocation...")
-    solver.Minimize(solver.Sum([y[j] for j in bins]))
-    print("allocated resources in {} seconds".format(solver.WallTime() / 1000))
-
-    if solver.Solve() != pywraplp.Solver.OPTIMAL:
+    start_time = time.time()
+    bin_items = self.pack_items_greedy(item_num_axons, item_num_neurons, num_bins, bin_axon_capacity, bin_neuron_capacity,
+                                       best_fit=(packing_strategy == "best_fit"), item_affinity=item_affinity)
+    print("allocated resources in {} seconds".format(time.time() - start_time))
+    # trivial lower bound from the total resource usage
+    num_bins_lower_bound = max(math.ceil(sum(item_num_axons) / bin_axon_capacity),
+                               math.ceil(sum(item_num_neurons) / bin_neuron_capacity))
+
+    if (packing_strategy == "ilp" or ilp_time_limit is not None) and \
+        (bin_items is None or len(bin_items) > num_bins_lower_bound):
+      # the greedy solution warm starts the ILP and bounds the number of bins it needs to consider
+      print("refining resource allocation...")
+      ilp_bin_items, ilp_lower_bound = self.pack_items_ilp(
+        item_num_axons, item_num_neurons, num_bins if bin_items is None else len(bin_items), bin_axon_capacity,
+        bin_neuron_capacity, ilp_time_limit, ilp_num_threads, bin_items)
+      num_bins_lower_bound = max(num_bins_lower_bound, ilp_lower_bound)
+      if ilp_bin_items is not None and (bin_items is None or len(ilp_bin_items) < len(bin_items)):
+        bin_items = ilp_bin_items
+
+    if bin_items is None:
       raise Exception("no valid solution found for core packing")
 
-    num_bins_used = 0
-    for bin_idx in bins:
-      if y[bin_idx].solution_value() == 1:
-        num_bins_used += 1
+    num_bins_used = len(bin_items)
+    optimality_gap = (num_bins_used - num_bins_lower_bound) / num_bins_used * 100.0
+    print("packed into {} cores, at least {} cores are required (optimality gap of {:.4f}%)".format(
+      num_bins_used, num_bins_lower_bound, optimality_gap))
 
     assert (num_bins_used + 1) < (new_params.grid_dimension_x * new_params.grid_dimension_y), "too many cores"
 
@@ -1073,27 +1328,31 @@ class model_util():
       else:
         new_y_dim = possible_y_dim.pop()
 
-    out_core_idx = new_params.output_core_x_coordinate + new_x_dim * new_params.output_core_y_coordinate
+    out_core_pos = (new_params.output_core_x_coordinate, new_params.output_core_y_coordinate)
+    slots = [(x, y) for y in range(new_y_dim) for x in range(new_x_dim) if (x, y) != out_core_pos]
+    bin_positions = slots[:num_bins_used]
+
+    traffic = self.bin_traffic(item_traffic, bin_items)
+    old_mean_hops, old_max_hops = self.hop_stats(traffic, bin_positions + [out_core_pos])
+    if placement_strategy == "annealing":
+      print("performing placement...")
+      start_time = time.time()
+      bin_positions = self.anneal_placement(traffic, slots, out_core_pos)
+      print("placed cores in {} seconds".format(time.time() - start_time))
+    new_mean_hops, new_max_hops = self.hop_stats(traffic, bin_positions + [out_core_pos])
+    print("mean number of hops per packet will change from {:.4f} to {:.4f}".format(old_mean_hops, new_mean_hops))
+    print("maximum number of hops per packet will change from {} to {}".format(old_max_hops, new_max_hops))
 
     actions = []
     all_num_utilised_axons = []
     all_num_utilised_neurons = []
-    for bin_idx in bins:
-      if y[bin_idx].solution_value() != 1:
-        continue
-
-      core_x = (len(actions) + int(out_core_idx <= len(actions))) % new_x_dim
-      core_y = (len(actions) + int(out_core_idx <= len(actions))) // new_x_dim
-      dst_pos = (core_x, core_y)
+    for dst_pos, bin_item_idxs in zip(bin_positions, bin_items):
 
       num_utilised_axons = 0
       num_utilised_neurons = 0
       move_ops = []
 
-      for item_idx in items:
-        if x[item_idx, bin_idx].solution_value() <= 0:
-          continue
-
+      for item_idx in bin_item_idxs:
         mcc = mccs[item_idx]
         dst_base_axon_idx = int(num_utilised_axons)
         dst_base_neuron_idx = int(num_utilised_neurons)
@@ -1152,7 +1411,9 @@ class model_util():
                 old_neuron_utilisation_unpadded, new_neuron_utilisation_unpadded,
                 old_axon_utilisation_padded, new_axon_utilisation_padded,
                 old_neuron_utilisation_padded, new_neuron_utilisation_padded,
-                num_neurons_removed, num_packets_removed]
+                num_neurons_removed, num_packets_removed,
+                num_bins_lower_bound, optimality_gap,
+                old_mean_hops, new_mean_hops, old_max_hops, new_max_hops]
 
     print("results:", results)
 
@@ -1168,14 +1429,14 @@ class model_util():
       src_to_dst[old_params.output_core_x_coordinate, old_params.output_core_y_coordinate, a] = (
         new_params.output_core_x_coordinate, new_params.output_core_y_coordinate, a)
 
-    dst_model = model_util(new_params, new_params, cores=[], input_packets=[-1 for _ in range(len(self.input_packets))],
+    dst_model = model_util(new_params, new_params, cores=[], input_packets=None,
                            output_packets=self.output_packets, num_input_packets=self.num_input_packets, num_output_packets=self.num_output_packets)
     for dst_pos, move_ops in actions:
       for dst_base_axon_idx, dst_base_neuron_idx, mcc in move_ops:
         self.move_connected_component(mcc, dst_pos, dst_base_axon_idx, dst_model, src_to_dst)
 
     self.cores = dst_model.cores
-    self.input_packets = dst_model.input_packets
+    self.input_packets = self.remap_input_packets(src_to_dst, dst_model)
 
     if minimise_arch_dims:
       new_params = set_spikehard_param(new_params, "grid_dimension_x", new_x_dim)
@@ -1187,7 +1448,147 @@ class model_util():
     print("packed cores")
     return results
 
-  def minimise_tick_delay(self, max_tick_delay=None, slack=None, num_ticks_to_check=None, initial_step_size=None, max_step_size=None, step_size_factor=None):
+  # cycles taken by a packet to pass through one stage (merge and buffer) of a router, and between two packets
+  # forwarded by the same merge, see Router.v and Merge2.v
+  ROUTER_STAGE_CYCLES = 3
+  MERGE_CYCLES = 2
+  # cycles between two ticks beyond clock_cycles_per_tick, the controller counts clock_cycles_per_tick cycles from the
+  # cycle after a tick and raises the next tick once it has read the header of the following frame, see
+  # spikehard_controller.v
+  TICK_OVERHEAD_CYCLES = 3
+
+  @staticmethod
+  def packet_routes(src_x, src_y, dst_x, dst_y, params):
+    # packets are routed along x, then along y, and then delivered to the scheduler, each step passing through the
+    # merge of one router stage, returns the packet and the index along its route of every stage, and the stage itself
+    # as an index into (kind, y, x), where kind is one of east, west, north, south and local
+    src_x, src_y, dst_x, dst_y = [np.asarray(v, dtype=np.int64) for v in (src_x, src_y, dst_x, dst_y)]
+    num_x_stages = np.abs(dst_x - src_x) + 1
+    num_y_stages = np.abs(dst_y - src_y) + 1
+    num_stages = num_x_stages + num_y_stages + 1
+
+    packet_idxs = np.repeat(np.arange(len(src_x)), num_stages)
+    stage_idxs = np.arange(num_stages.sum()) - np.repeat(np.cumsum(num_stages) - num_stages, num_stages)
+    num_x_stages = num_x_stages[packet_idxs]
+    num_y_stages = num_y_stages[packet_idxs]
+    src_x, src_y, dst_x, dst_y = src_x[packet_idxs], src_y[packet_idxs], dst_x[packet_idxs], dst_y[packet_idxs]
+    x_dir = np.where(dst_x >= src_x, 1, -1)
+    y_dir = np.where(dst_y >= src_y, 1, -1)
+
+    along_x = stage_idxs < num_x_stages
+    along_y = ~along_x & (stage_idxs < num_x_stages + num_y_stages)
+    x = np.where(along_x, src_x + x_dir * stage_idxs, dst_x)
+    y = np.where(along_x, src_y, np.where(along_y, src_y + y_dir * (stage_idxs - num_x_stages), dst_y))
+    kind = np.where(along_x, np.where(x_dir > 0, 0, 1), np.where(along_y, np.where(y_dir > 0, 2, 3), 4))
+    stages = (kind * params.grid_dimension_y + y) * params.grid_dimension_x + x
+    return packet_idxs, stage_idxs, stages
+
+  def estimate_tick_delay(self, num_ticks=None, params=None):
+    # Estimates bounds on the clock cycles per tick needed by the model from the packets sent in a functional
+    # simulation of num_ticks ticks. Each core integrates all of its neurons in num_neurons * (num_axons + 2) + 3
+    # cycles, the n-th of which sends its spike after 2 + n * (num_axons + 2) + num_axons cycles (TokenController.v),
+    # and every packet must reach its scheduler before the next tick. The lower bound only accounts for packets sharing
+    # a merge being forwarded one at a time, whereas the upper bound lets every packet wait for all others at each
+    # merge on its route, and cores wait for every packet beyond router_buffer_depth queued at a merge. The bounds are
+    # on clock_cycles_per_tick, which is TICK_OVERHEAD_CYCLES short of the cycles between two ticks.
+    p = self.arch_params if params is None else params
+    assert self.cores is not None, "model must be initialised"
+    num_ticks = (len(self.num_input_packets) + p.num_ticks) if num_ticks is None else num_ticks
+
+    compute_cycles = p.num_neurons * (p.num_axons + 2) + 3
+    neuron_send_cycles = 2 + np.arange(p.num_neurons) * (p.num_axons + 2) + p.num_axons
+
+    core_x = np.array([cd.x for cd in self.cores], dtype=np.int64)
+    core_y = np.array([cd.y for cd in self.cores], dtype=np.int64)
+    neuron_dx = np.stack([cd.neurons["dx"] for cd in self.cores]) if self.cores else np.zeros((0, p.num_neurons), dtype=np.int64)
+    neuron_dy = np.stack([cd.neurons["dy"] for cd in self.cores]) if self.cores else np.zeros((0, p.num_neurons), dtype=np.int64)
+
+    # input packets enter the router of core (0, 0) from the west one at a time, with absolute destinations
+    input_x, input_y, _, _ = self.decode_packets(self.input_packets, p)
+    input_offsets = np.concatenate(([0], np.cumsum(self.num_input_packets, dtype=np.int64)))
+
+    sim = sim_util(self, p)
+    lower = upper = compute_cycles
+    for tick_idx in range(num_ticks):
+      sim.inject()
+      cores, neurons = np.nonzero(sim.step()[0])
+
+      src_x, src_y = core_x[cores], core_y[cores]
+      dst_x, dst_y = src_x + neuron_dx[cores, neurons], src_y + neuron_dy[cores, neurons]
+      send_cycles = neuron_send_cycles[neurons]
+      if tick_idx < len(self.num_input_packets):
+        packet_idxs = np.arange(input_offsets[tick_idx], input_offsets[tick_idx + 1])
+        src_x = np.concatenate((src_x, np.zeros(len(packet_idxs), dtype=np.int64)))
+        src_y = np.concatenate((src_y, np.zeros(len(packet_idxs), dtype=np.int64)))
+        dst_x = np.concatenate((dst_x, input_x[packet_idxs]))
+        dst_y = np.concatenate((dst_y, input_y[packet_idxs]))
+        send_cycles = np.concatenate((send_cycles, self.MERGE_CYCLES * np.arange(len(packet_idxs))))
+      if len(send_cycles) == 0:
+        continue
+
+      dst_x = np.clip(dst_x, 0, p.grid_dimension_x - 1)
+      dst_y = np.clip(dst_y, 0, p.grid_dimension_y - 1)
+      packet_idxs, stage_idxs, stages = self.packet_routes(src_x, src_y, dst_x, dst_y, p)
+      num_stages = np.bincount(packet_idxs, minlength=len(send_cycles))
+      arrival_cycles = send_cycles[packet_idxs] + 1 + self.ROUTER_STAGE_CYCLES * stage_idxs
+      delivery_cycles = send_cycles + 1 + self.ROUTER_STAGE_CYCLES * num_stages
+
+      stages, stage_packet_idxs = np.unique(stages, return_inverse=True)
+      stage_load = np.bincount(stage_packet_idxs)
+      first_arrival_cycles = np.full(len(stages), np.iinfo(np.int64).max)
+      np.minimum.at(first_arrival_cycles, stage_packet_idxs, arrival_cycles)
+
+      # at least the time to forward each packet at a busy merge, at most the time to wait for all others at every merge
+      contention_cycles = first_arrival_cycles + self.MERGE_CYCLES * stage_load + self.ROUTER_STAGE_CYCLES
+      wait_cycles = np.bincount(packet_idxs, weights=self.MERGE_CYCLES * (stage_load[stage_packet_idxs] - 1),
+                                minlength=len(send_cycles)).astype(np.int64)
+      stall_cycles = self.MERGE_CYCLES * int(np.maximum(stage_load - p.router_buffer_depth, 0).max())
+
+      lower = max(lower, int(delivery_cycles.max()), int(contention_cycles.max()))
+      upper = max(upper, int((delivery_cycles + wait_cycles).max()) + stall_cycles, compute_cycles + stall_cycles)
+
+    return lower - self.TICK_OVERHEAD_CYCLES, upper - self.TICK_OVERHEAD_CYCLES
+
+  @staticmethod
+  def run_tick_delay_test(params, isolated=False, tick_trace_filepath=None, **kwargs):
+    # runs the RTL unit test of params and returns whether it passed, if isolated then the simulation is compiled into
+    # a temporary directory of its own so that several tests can run concurrently, params may also be given as a dict
+    # since they cannot be pickled to be sent to another process, kwargs are passed on to spikehard.run_test
+    if isinstance(params, dict):
+      params = spikehard_named_params(**params)
+
+    class test(unittest.TestCase):
+      logger = logging.getLogger(__name__)
+      logger.setLevel(logging.DEBUG)
+
+      def test(test_self):
+        # add '/hardware/tb/tests/networks' to system path for module imports
+        sys.path.insert(0, os.path.join(TB_DIR, "tests", "networks"))
+        from spikehard import spikehard  # noqa: E402
+
+        if isolated:
+          with tempfile.TemporaryDirectory(prefix="spikehard_") as build_dir:
+            spikehard.run_test(test_self, params, build_dir=build_dir, tick_trace_filepath=tick_trace_filepath, **kwargs)
+        else:
+          spikehard.run_test(test_self, params, tick_trace_filepath=tick_trace_filepath, **kwargs)
+
+    runner = unittest.TextTestRunner()
+    result = runner.run(unittest.makeSuite(test))
+    return not (result.errors or result.failures)
+
+  @staticmethod
+  def __slowest_tick(tick_trace_filepath):
+    if not os.path.exists(tick_trace_filepath):
+      return None
+    # add '/hardware/tb/tests/networks' to system path for module imports
+    sys.path.insert(0, os.path.join(TB_DIR, "tests", "networks"))
+    from spikehard import spikehard  # noqa: E402
+    return spikehard.slowest_tick(tick_trace_filepath)
+
+  def minimise_tick_delay(self, max_tick_delay=None, slack=None, num_ticks_to_check=None, initial_step_size=None, max_step_size=None, step_size_factor=None, use_estimate=None, num_workers=None, use_trace=None):
+    # if num_workers > 1, each round tests num_workers tick delays at once in a process pool, narrowing the search
+    # interval num_workers-ways, rather than testing one tick delay at a time, if use_trace then the search starts from
+    # the clock cycles per tick measured in a single run with a generous tick delay
     print("tuning tick delay...")
     assert self.cores is not None, "model must be initialised"
 
@@ -1197,8 +1598,11 @@ class model_util():
     initial_step_size = (20 if initial_step_size is None else initial_step_size)
     max_step_size = (50000 if max_step_size is None else max_step_size)
     step_size_factor = (10 if step_size_factor is None else step_size_factor)
+    use_estimate = (True if use_estimate is None else use_estimate)
+    num_workers = (1 if num_workers is None else num_workers)
+    use_trace = (False if use_trace is None else use_trace)
 
-    print(f"max_tick_delay: {max_tick_delay}, slack: {slack}, num_ticks_to_check: {num_ticks_to_check}, initial_step_size: {initial_step_size}, max_step_size: {max_step_size}, step_size_factor: {step_size_factor}")
+    print(f"max_tick_delay: {max_tick_delay}, slack: {slack}, num_ticks_to_check: {num_ticks_to_check}, initial_step_size: {initial_step_size}, max_step_size: {max_step_size}, step_size_factor: {step_size_factor}, use_estimate: {use_estimate}, num_workers: {num_workers}, use_trace: {use_trace}")
 
     old_test_params = self.test_params
     old_arch_params = self.arch_params
@@ -1216,62 +1620,132 @@ class model_util():
       self.test_params = old_test_params
       self.arch_params = old_arch_params
 
-    def run_test(params):
-      class test(unittest.TestCase):
-        logger = logging.getLogger(__name__)
-        logger.setLevel(logging.DEBUG)
-
-        def test(test_self):
-          # add '/hardware/tb/tests/networks' to system path for module imports
-          sys.path.insert(0, os.path.join(TB_DIR, "tests", "networks"))
-          from spikehard import spikehard  # noqa: E402
-
-          spikehard.run_test(test_self, params)
-
-      runner = unittest.TextTestRunner()
-      result = runner.run(unittest.makeSuite(test))
-      if result.errors or result.failures:
-        raise Exception("tick delay not suitable")
+    # results of the tick delays tested one at a time, so that none is tested twice
+    tick_delay_results = {}
 
     def try_tick_delay(tick_delay):
+      if tick_delay in tick_delay_results:
+        return tick_delay_results[tick_delay]
       print("attempting tick delay: {} clock cycles".format(tick_delay))
       try:
-        run_test(set_spikehard_param(self.arch_params, "clock_cycles_per_tick", tick_delay))
+        passed = model_util.run_tick_delay_test(set_spikehard_param(self.arch_params, "clock_cycles_per_tick", tick_delay))
       except KeyboardInterrupt:
         cancel()
         raise
       except:
-        if tick_delay == max_tick_delay:
-          cancel()
-          raise Exception("failed to find suitable tick delay")
-        else:
-          return False
-      return True
+        passed = False
+      if not passed and tick_delay == max_tick_delay:
+        cancel()
+        raise Exception("failed to find suitable tick delay")
+      tick_delay_results[tick_delay] = passed
+      return passed
+
+    def try_tick_delays(tick_delays):
+      print("attempting tick delays: {} clock cycles".format(", ".join([str(t) for t in tick_delays])))
+      results = []
+      try:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=min(num_workers, len(tick_delays))) as pool:
+          futures = [pool.submit(model_util.run_tick_delay_test,
+                                 set_spikehard_param(self.arch_params, "clock_cycles_per_tick", t)._asdict(), True)
+                     for t in tick_delays]
+          for future in futures:
+            try:
+              results.append(future.result())
+            except concurrent.futures.process.BrokenProcessPool:
+              raise
+            except Exception:
+              results.append(False)
+      except BaseException:
+        cancel()
+        raise
+      return results
 
-    # quickly find upper bound
+    # quickly find upper bound, starting from the estimated bounds if requested
     step_size = initial_step_size
     prev_tick_delay = 0
     tick_delay = step_size
-    while not try_tick_delay(tick_delay):
-      prev_tick_delay = tick_delay
-      step_size = round(min(step_size * step_size_factor, max_step_size))
-      tick_delay = round(min(((tick_delay + step_size) - 1) | (step_size - 1) + 1, max_tick_delay))
-
-    # perform binary search
-    low = prev_tick_delay
-    high = tick_delay
-    while low < high:
-      tick_delay = round((high + low) / 2)
-      if tick_delay == high:
-        break
-
-      should_stop = (high - tick_delay) < slack * tick_delay
-      if try_tick_delay(tick_delay):
-        high = tick_delay
+    if use_estimate:
+      estimated_lower, estimated_upper = self.estimate_tick_delay(num_ticks_to_check)
+      print("estimated tick delay: between {} and {} clock cycles".format(estimated_lower, estimated_upper))
+      tick_delay = min(estimated_upper, max_tick_delay)
+      # the lower bound only becomes the floor of the search once the tick delay below it is confirmed to fail,
+      # otherwise the search starts from scratch below that tick delay
+      floor_tick_delay = min(estimated_lower, max_tick_delay) - 1
+      if floor_tick_delay > 0 and try_tick_delay(floor_tick_delay):
+        print("estimated lower bound does not hold, {} clock cycles suffice".format(floor_tick_delay))
+        tick_delay = floor_tick_delay
       else:
-        low = tick_delay
-      if should_stop:
-        break
+        prev_tick_delay = floor_tick_delay
+      step_size = max(step_size, tick_delay - prev_tick_delay)
+    if use_trace:
+      trace_tick_delay = min(2 * tick_delay if use_estimate else max_step_size, max_tick_delay)
+      print("measuring tick delay with {} clock cycles".format(trace_tick_delay))
+      with tempfile.TemporaryDirectory(prefix="spikehard_") as trace_dir:
+        tick_trace_filepath = os.path.join(trace_dir, "tick_trace.csv")
+        try:
+          passed = model_util.run_tick_delay_test(set_spikehard_param(self.arch_params, "clock_cycles_per_tick", trace_tick_delay),
+                                                  tick_trace_filepath=tick_trace_filepath)
+        except KeyboardInterrupt:
+          cancel()
+          raise
+        except:
+          passed = False
+        # a core that clears its scheduler at cycle c is idle from cycle c + 1
+        slowest = self.__slowest_tick(tick_trace_filepath) if passed else None
+      if slowest is not None:
+        print("measured tick delay: {} clock cycles by core {} during tick {}".format(slowest[2] + 2, slowest[1], slowest[0]))
+        prev_tick_delay = slowest[2] + 1
+        tick_delay = min(slowest[2] + 2, trace_tick_delay)
+        step_size = max(initial_step_size, tick_delay - prev_tick_delay)
+
+    if num_workers > 1:
+      # each round either probes num_workers geometrically spaced tick delays above low, until one of them passes, or
+      # splits the interval (low, high] into num_workers + 1 parts, where low fails and high passes
+      low = prev_tick_delay
+      high = None
+      if use_estimate:
+        candidates = np.linspace(low, tick_delay, num_workers + 1)[1:]
+      else:
+        candidates = tick_delay * step_size_factor ** np.linspace(0, 1, num_workers)
+
+      while True:
+        candidates = sorted(set([min(max(round(t), low + 1), max_tick_delay) for t in candidates]))
+        candidates = [t for t in candidates if high is None or t < high]
+        results = try_tick_delays(candidates)
+        passed = [t for t, result in zip(candidates, results) if result]
+        if len(passed):
+          high = min(passed) if high is None else min(high, min(passed))
+        low = max([t for t, result in zip(candidates, results) if not result and (high is None or t < high)], default=low)
+
+        if high is None:
+          if low >= max_tick_delay:
+            cancel()
+            raise Exception("failed to find suitable tick delay")
+          candidates = max(low, initial_step_size) * step_size_factor ** np.linspace(1 / num_workers, 1, num_workers)
+        elif (high - low) < slack * high or (high - low) <= 1:
+          break
+        else:
+          candidates = np.linspace(low, high, num_workers + 2)[1:-1]
+
+    else:
+      while not try_tick_delay(tick_delay):
+        prev_tick_delay = tick_delay
+        step_size = round(min(step_size * step_size_factor, max_step_size))
+        tick_delay = round(min(((tick_delay + step_size) - 1) | (step_size - 1) + 1, max_tick_delay))
+
+      # perform binary search
+      low = prev_tick_delay
+      high = tick_delay
+      while (high - low) > 1:
+        tick_delay = round((high + low) / 2)
+
+        should_stop = (high - tick_delay) < slack * tick_delay
+        if try_tick_delay(tick_delay):
+          high = tick_delay
+        else:
+          low = tick_delay
+        if should_stop:
+          break
 
     # add slack since it is not guaranteed to work for any input combination
     tick_delay = round(min(high + high * slack, max_tick_delay))
@@ -1292,109 +1766,117 @@ class model_util():
       dst_dir = model_util.default_model_header_dir()
     shutil.rmtree(dst_dir, ignore_errors=True)
 
-  def to_header(self, model_name, dst_dir=None):
+  # number of words formatted at once by to_header
+  HEADER_CHUNK_SIZE = 4096
+
+  @staticmethod
+  def __write_c_array(file, ctype, var, length, chunks, end="};\n"):
+    # writes a static C array from chunks of its values, without holding all of them as text
+    file.write("static {} {}[{}u] = ".format(ctype, var, length))
+    file.write("{")
+    sep = ""
+    for chunk in chunks:
+      for i in range(0, len(chunk), model_util.HEADER_CHUNK_SIZE):
+        values = np.asarray(chunk[i:i + model_util.HEADER_CHUNK_SIZE]).tolist()
+        file.write(sep + ", ".join([str(int(v)) + 'u' for v in values]))
+        sep = ", "
+    file.write(end)
+
+  def to_header(self, model_name, dst_dir=None, blob=False):
+    # writes {model_name}.h holding the model as C arrays. If blob, the words of the cores, the number of packets of
+    # each tick and the packets are instead written as little-endian arrays, each aligned to 8 bytes, to
+    # {model_name}.bin, which is embedded or loaded as described in sw/spikehard_lib/test_bench_blob.h, and
+    # {model_name}.h only holds their offsets and lengths.
     assert self.cores is not None, "model must be initialised"
     assert self.in_packets_payload_word_width == 32, "app library does not support packet width != 32"
+    assert not blob or self.core_data_payload_word_width == 64, "blob only supports core word width == 64"
 
     if dst_dir is None:
       dst_dir = model_util.default_model_header_dir()
+    pathlib.Path(dst_dir).mkdir(parents=True, exist_ok=True)
 
-    out = ""
-
-    out += "#ifndef SPIKEHARD_MODEL_{}_H_INCLUDED\n".format(model_name.upper())
-    out += "#define SPIKEHARD_MODEL_{}_H_INCLUDED\n\n".format(model_name.upper())
-
-    tc_words_vars = []
-    csram_words_vars = []
-    tc_words_lengths = []
-    csram_words_lengths = []
-
+    name = model_name.lower()
     for cd in self.cores:
       assert cd.x < self.arch_params.grid_dimension_x and cd.y < self.arch_params.grid_dimension_y, "core lies outside the grid"
       assert cd.x != self.arch_params.output_core_x_coordinate or cd.y != self.arch_params.output_core_y_coordinate, "regular core coincides with output core"
 
-      tc_words_var = "g_{}_tc_words_{}_{}_".format(model_name.lower(), cd.x, cd.y)
-      out += "static uint{}_t {}[{}u] = ".format(self.core_data_payload_word_width, tc_words_var, len(cd.tc_words))
-      out += "{"
-      out += ", ".join([str(w) + 'u' for w in cd.tc_words])
-      out += "};\n"
-      tc_words_vars.append(tc_words_var)
-      tc_words_lengths.append(str(len(cd.tc_words)))
-
-      csram_words_var = "g_{}_csram_words_{}_{}_".format(model_name.lower(), cd.x, cd.y)
-      out += "static uint{}_t {}[{}u] = ".format(self.core_data_payload_word_width,
-                                                 csram_words_var, len(cd.csram_words))
-      out += "{"
-      out += ", ".join([str(w) + 'u' for w in cd.csram_words])
-      out += "};\n\n"
-      csram_words_vars.append(csram_words_var)
-      csram_words_lengths.append(str(len(cd.csram_words)))
-
-    model_var = "g_{}_cores".format(model_name.lower())
-    out += "static core_data_t {}[{}u] = ".format(model_var, len(self.cores))
-    out += "{"
-    for i in range(len(self.cores)):
-      out += "{"
-      out += "{}u, {}u, {}, {}, {}u, {}u".format(self.cores[i].x, self.cores[i].y,
-                                                 tc_words_vars[i], csram_words_vars[i], tc_words_lengths[i], csram_words_lengths[i])
-      out += "}"
-      if i + 1 != len(self.cores):
-        out += ", "
-    out += "};\n\n"
-
-    num_inputs_words = []
-    for value in self.num_input_packets:
-      num_inputs_words.append(str(value) + 'u')
-
-    out += "static uint32_t g_{}_num_inputs[{}u] = ".format(model_name.lower(), len(num_inputs_words))
-    out += "{"
-    out += ", ".join(num_inputs_words)
-    out += "};\n\n"
-
-    num_outputs_words = []
-    for value in self.num_output_packets:
-      num_outputs_words.append(str(value) + 'u')
-
-    out += "static uint32_t g_{}_num_outputs[{}u] = ".format(model_name.lower(), len(num_outputs_words))
-    out += "{"
-    out += ", ".join(num_outputs_words)
-    out += "};\n\n"
-
-    inputs_words = []
-    for input_packet in self.input_packets:
-      inputs_words.append(str(input_packet) + 'u')
-
-    out += "static packet_t g_{}_inputs[{}u] = ".format(model_name.lower(), len(inputs_words))
-    out += "{"
-    out += ", ".join(inputs_words)
-    out += "};\n\n"
-
-    outputs_words = []
-    for output_packet in self.output_packets:
-      outputs_words.append(str(output_packet) + 'u')
-
-    out += "static packet_t g_{}_outputs[{}u] = ".format(model_name.lower(), len(outputs_words))
-    out += "{"
-    out += ", ".join(outputs_words)
-    out += "};\n\n"
-    
-    num_ticks_to_check = (len(num_outputs_words) + self.test_params.tick_latency + 2) if self.test_params.num_ticks_to_check is None else self.test_params.num_ticks_to_check
-
-    out += "static test_bench_t g_{}_test_bench = ".format(model_name.lower())
-    out += "{"
-    out += "g_{}_cores, g_{}_num_inputs, g_{}_num_outputs, g_{}_inputs, g_{}_outputs, {}u, {}u, {}u, {}u, {}u, {}u, {}u, {}u, {}".format(*([model_name.lower()] * 5), len(self.cores), len(num_inputs_words), len(
-      num_outputs_words), len(inputs_words), len(outputs_words), num_ticks_to_check, self.test_params.tick_latency, self.test_params.clock_cycles_per_tick, str(bool(self.test_params.relax_packet_ordering)).lower())
-    out += "};\n\n"
-
-    out += "#endif // SPIKEHARD_MODEL_{}_H_INCLUDED\n".format(model_name.upper())
-
-    pathlib.Path(dst_dir).mkdir(parents=True, exist_ok=True)
-    with open(os.path.join(dst_dir, "{}.h".format(model_name.lower())), "w") as f:
-      f.write(out)
-
-  def to_unit_tests(self, model_name):
+    # the packets are read twice, as their number is declared before them
+    num_inputs = np.array([len(packets) for packets in self.iter_input_packets()], dtype=np.uint32)
+    num_outputs = np.asarray(self.num_output_packets, dtype=np.uint32)
+    outputs = np.asarray(self.output_packets, dtype=np.uint32)
+    num_ticks_to_check = (len(num_outputs) + self.test_params.tick_latency + 2) if self.test_params.num_ticks_to_check is None else self.test_params.num_ticks_to_check
+    test_bench_values = "{}u, {}u, {}u, {}u, {}u, {}u, {}u, {}u, {}".format(
+      len(self.cores), len(num_inputs), len(num_outputs), int(num_inputs.sum()), len(outputs), num_ticks_to_check,
+      self.test_params.tick_latency, self.test_params.clock_cycles_per_tick,
+      str(bool(self.test_params.relax_packet_ordering)).lower())
+
+    with open(os.path.join(dst_dir, "{}.h".format(name)), "w") as f:
+      f.write("#ifndef SPIKEHARD_MODEL_{}_H_INCLUDED\n".format(model_name.upper()))
+      f.write("#define SPIKEHARD_MODEL_{}_H_INCLUDED\n\n".format(model_name.upper()))
+
+      if blob:
+        blob_filename = "{}.bin".format(name)
+        offsets = []
+        with open(os.path.join(dst_dir, blob_filename), "wb") as blob_file:
+          def write_blob(chunks, dtype):
+            offset = blob_file.tell()
+            for chunk in chunks:
+              blob_file.write(np.asarray(chunk).astype(dtype).tobytes())
+            blob_file.write(b"\0" * (-blob_file.tell() % 8))
+            offsets.append(offset)
+
+          for cd in self.cores:
+            write_blob([cd.tc_words], '<u8')
+            write_blob([cd.csram_words], '<u8')
+          write_blob([num_inputs], '<u4')
+          write_blob([num_outputs], '<u4')
+          write_blob(self.iter_input_packets(), '<u4')
+          write_blob([outputs], '<u4')
+
+        f.write("// byte offsets into {}\n".format(blob_filename))
+        f.write("static blob_core_data_t g_{}_blob_cores[{}u] = ".format(name, len(self.cores)))
+        f.write("{")
+        f.write(", ".join(["{{{}u, {}u, {}u, {}u, {}u, {}u}}".format(cd.x, cd.y, offsets[2 * i], offsets[2 * i + 1], len(cd.tc_words), len(cd.csram_words))
+                           for i, cd in enumerate(self.cores)]))
+        f.write("};\n\n")
+
+        f.write("static blob_test_bench_t g_{}_blob_test_bench = ".format(name))
+        f.write("{")
+        f.write("\"{}\", g_{}_blob_cores, {}u, {}u, {}u, {}u, {}".format(blob_filename, name, *offsets[-4:], test_bench_values))
+        f.write("};\n\n")
+      else:
+        core_values = []
+        for cd in self.cores:
+          tc_words_var = "g_{}_tc_words_{}_{}_".format(name, cd.x, cd.y)
+          model_util.__write_c_array(f, "uint{}_t".format(self.core_data_payload_word_width), tc_words_var,
+                                     len(cd.tc_words), [cd.tc_words])
+          csram_words_var = "g_{}_csram_words_{}_{}_".format(name, cd.x, cd.y)
+          model_util.__write_c_array(f, "uint{}_t".format(self.core_data_payload_word_width), csram_words_var,
+                                     len(cd.csram_words), [cd.csram_words], end="};\n\n")
+          core_values.append("{{{}u, {}u, {}, {}, {}u, {}u}}".format(cd.x, cd.y, tc_words_var, csram_words_var,
+                                                                    len(cd.tc_words), len(cd.csram_words)))
+
+        f.write("static core_data_t g_{}_cores[{}u] = ".format(name, len(self.cores)))
+        f.write("{" + ", ".join(core_values) + "};\n\n")
+
+        model_util.__write_c_array(f, "uint32_t", "g_{}_num_inputs".format(name), len(num_inputs), [num_inputs], end="};\n\n")
+        model_util.__write_c_array(f, "uint32_t", "g_{}_num_outputs".format(name), len(num_outputs), [num_outputs], end="};\n\n")
+        model_util.__write_c_array(f, "packet_t", "g_{}_inputs".format(name), int(num_inputs.sum()), self.iter_input_packets(), end="};\n\n")
+        model_util.__write_c_array(f, "packet_t", "g_{}_outputs".format(name), len(outputs), [outputs], end="};\n\n")
+
+        f.write("static test_bench_t g_{}_test_bench = ".format(name))
+        f.write("{")
+        f.write("g_{0}_cores, g_{0}_num_inputs, g_{0}_num_outputs, g_{0}_inputs, g_{0}_outputs, ".format(name) + test_bench_values)
+        f.write("};\n\n")
+
+      f.write("#endif // SPIKEHARD_MODEL_{}_H_INCLUDED\n".format(model_name.upper()))
+
+  def to_unit_tests(self, model_name, simulate_outputs=False, write_container=False):
+    # if write_container, the model is also written to a container next to the memory files, see to_container
     print("generating unit tests for model: {}".format(model_name))
     assert self.cores is not None, "model must be initialised"
+    if simulate_outputs:
+      self.simulate_output_packets()
 
     altered_tests_dir = os.path.join(HARDWARE_DIR, "tb", "tests", "networks", "altered", model_name.lower())
     os.makedirs(altered_tests_dir, exist_ok=True)
@@ -1482,6 +1964,8 @@ if __name__ == '__main__':
 
     self.test_params = self.arch_params = set_spikehard_param(
       self.arch_params, "memory_filepath", model_memory_files_dir)
+    if write_container:
+      self.to_container(basic_test_util.container_filepath(self.test_params))
     print("generated unit tests for model: {}".format(model_name))
 
   def dump_params(self, model_memory_files_dir):
@@ -0,0 +1,185 @@
+import logging
+
+import numpy as np
+
+from codec_util import codec_util
+
+
+class sim_util():
+  # Functional model of a SpikeHard network that executes one tick at a time, where every step matches the RTL:
+  #   - the scheduler of each core holds num_ticks axon buffers, a packet with tick offset t sent while processing tick
+  #     T is delivered to the buffer read at tick T + 1 + t, whereas input packets sent after T ticks are delivered to
+  #     the buffer read at tick T + t
+  #   - each neuron integrates the weight selected by the TC entry of every axon with a spike and a synapse, then adds
+  #     its leak and is thresholded and reset as in ThresholdResetUnit.v, all in potential_width-bit arithmetic
+  #   - a spiking neuron sends a packet to axon dst_axon of core (x + dx, y + dy), packets sent to the output core are
+  #     output packets holding dst_axon, and are reported in the tick after the one in which they were sent
+  # This assumes clock_cycles_per_tick is large enough for every packet to be delivered within a tick.
+  # A batch of independent samples is executed together, each with its own input packets, potentials and scheduler
+  # buffers, so that a single multiplication with the synaptic weights of each core integrates the whole batch.
+
+  def __init__(self, mu, params=None, inputs=None):
+    # inputs is a list of (input_packets, num_input_packets) pairs, one per sample, where the input packets are in the
+    # same format as mu.input_packets, by default the batch consists of mu's own input packets
+    p = mu.arch_params if params is None else params
+    self.params = p
+    self.mu = mu
+
+    num_cores = len(mu.cores)
+    self.num_cores = num_cores
+    self.output_axon_offset = num_cores * p.num_axons
+    axon_index = mu.axon_index(p)
+
+    def field(name):
+      return np.stack([cd.neurons[name] for cd in mu.cores]) if num_cores else np.zeros((0, p.num_neurons), dtype=np.int64)
+
+    self.initial_potentials = field("current_potential")
+    self.reset_potentials = field("reset_potential")
+    self.leaks = field("leak")
+    self.positive_thresholds = field("positive_threshold")
+    self.negative_thresholds = field("negative_threshold")
+    self.reset_modes = field("reset_mode")
+    self.tick_offsets = field("tick")
+
+    # global index of the axon each neuron sends to, or -1 if it does not exist
+    self.dst_axons = np.full((num_cores, p.num_neurons), -1, dtype=np.int64)
+    for c, cd in enumerate(mu.cores):
+      dst_x, dst_y = cd.dst_cores
+      self.dst_axons[c] = axon_index(dst_x, dst_y, cd.neurons["dst_axon"])
+
+    # synaptic weight of every (axon, neuron) pair, exact as float64 since |weight| * num_axons < 2 ** 53
+    self.synaptic_weights = np.zeros((num_cores, p.num_axons, p.num_neurons), dtype=np.float64)
+    for c, cd in enumerate(mu.cores):
+      synapses = cd.connectivity.T.astype(bool)
+      weights = cd.neurons["weights"][:, cd.tc].T
+      self.synaptic_weights[c] = np.where(synapses, weights, 0)
+
+    if inputs is None:
+      inputs = [(mu.input_packets, mu.num_input_packets)]
+    self.batch_size = len(inputs)
+
+    # input packets of all samples, ordered by the number of ticks after which they are sent
+    input_samples = []
+    input_ticks = []
+    input_packets = []
+    self.num_input_ticks = np.zeros(self.batch_size, dtype=np.int64)
+    for b, (packets, num_packets) in enumerate(inputs):
+      num_packets = np.asarray(num_packets, dtype=np.int64)
+      assert num_packets.sum() == len(packets), (num_packets.sum(), len(packets))
+      input_samples.append(np.full(len(packets), b, dtype=np.int64))
+      input_ticks.append(np.repeat(np.arange(len(num_packets)), num_packets))
+      input_packets.append(np.asarray(packets, dtype=np.int64))
+      self.num_input_ticks[b] = len(num_packets)
+
+    input_ticks = np.concatenate(input_ticks)
+    order = np.argsort(input_ticks, kind='stable')
+    self.input_samples = np.concatenate(input_samples)[order]
+    input_x, input_y, input_axons, input_tick_offsets = mu.decode_packets(np.concatenate(input_packets)[order], p)
+    self.input_dst_axons = axon_index(input_x, input_y, input_axons)
+    self.input_tick_offsets = input_tick_offsets
+    self.input_offsets = np.searchsorted(input_ticks[order], np.arange(self.num_input_ticks.max(initial=0) + 1))
+
+    self.reset()
+
+  def reset(self):
+    self.tick = 0
+    self.potentials = np.repeat(self.initial_potentials[None], self.batch_size, axis=0)
+    self.axon_buffers = np.zeros((self.batch_size, self.params.num_ticks, self.output_axon_offset), dtype=bool)
+    self.output_packets = [{} for _ in range(self.batch_size)]
+    # samples whose state no longer changes, which stop recording output packets
+    self.settled = np.zeros(self.batch_size, dtype=bool)
+
+  def __wrap(self, values):
+    return codec_util.to_signed(values, self.params.potential_width)
+
+  def __send(self, samples, dst_axons, slots, tick_idx):
+    # delivers packets to the scheduler buffers, or to the output if they are sent to the output core
+    sent = dst_axons >= 0
+    to_output = sent & (dst_axons >= self.output_axon_offset)
+    to_core = sent & ~to_output
+    self.axon_buffers[samples[to_core], slots[to_core], dst_axons[to_core]] = True
+    to_output &= ~self.settled[samples]
+    for b in np.unique(samples[to_output]).tolist():
+      packets = dst_axons[to_output & (samples == b)] - self.output_axon_offset
+      self.output_packets[b].setdefault(tick_idx, []).extend(packets.tolist())
+
+  def inject(self):
+    # input packets sent after self.tick ticks
+    if self.tick + 1 >= len(self.input_offsets):
+      return
+    packet_idxs = np.arange(self.input_offsets[self.tick], self.input_offsets[self.tick + 1])
+    slots = (self.tick + self.input_tick_offsets[packet_idxs]) % self.params.num_ticks
+    self.__send(self.input_samples[packet_idxs], self.input_dst_axons[packet_idxs], slots, self.tick)
+
+  def step(self):
+    # processes tick self.tick and returns the (batch_size, num_cores, num_neurons) mask of neurons that spiked
+    p = self.params
+    slot = self.tick % p.num_ticks
+    axon_spikes = self.axon_buffers[:, slot].reshape(self.batch_size, self.num_cores, p.num_axons)
+
+    # (num_cores, batch_size, num_axons) x (num_cores, num_axons, num_neurons)
+    integrated = np.matmul(axon_spikes.transpose(1, 0, 2).astype(np.float64), self.synaptic_weights)
+    integrated = integrated.transpose(1, 0, 2).astype(np.int64)
+    potentials = self.__wrap(self.__wrap(self.potentials + integrated) + self.leaks)
+
+    spikes = potentials >= self.positive_thresholds
+    below_negative_threshold = potentials < self.negative_thresholds
+    positive_reset = np.select([self.reset_modes == 0, self.reset_modes == 1],
+                               [self.reset_potentials, potentials - self.positive_thresholds], 0)
+    negative_reset = np.select([self.reset_modes == 0, self.reset_modes == 1],
+                               [-self.reset_potentials, potentials - self.negative_thresholds], 0)
+    self.potentials = self.__wrap(np.where(spikes, positive_reset, np.where(below_negative_threshold, negative_reset, potentials)))
+
+    samples, cores, neurons = np.nonzero(spikes)
+    self.__send(samples, self.dst_axons[cores, neurons], (self.tick + 1 + self.tick_offsets[cores, neurons]) % p.num_ticks,
+                self.tick + 1)
+    self.axon_buffers[:, slot] = False
+    self.tick += 1
+    return spikes
+
+  def state(self):
+    # potentials and scheduled axon spikes of each sample relative to the current tick
+    return self.potentials.copy(), np.roll(self.axon_buffers, -(self.tick % self.params.num_ticks), axis=1)
+
+  def run(self, num_ticks=None, max_ticks=2 ** 16):
+    # runs for num_ticks ticks, or until every sample has been sent all of its input packets and its state no longer
+    # changes, after which it would send the same packets every tick, returns the expected outputs of each sample
+    while self.tick < (max_ticks if num_ticks is None else num_ticks):
+      self.inject()
+      if num_ticks is None:
+        prev_potentials, prev_axon_buffers = self.state()
+        self.step()
+        potentials, axon_buffers = self.state()
+        unchanged = np.all(prev_potentials == potentials, axis=(1, 2)) & np.all(prev_axon_buffers == axon_buffers, axis=(1, 2))
+        self.settled |= unchanged & (self.num_input_ticks < self.tick)
+        if np.all(self.settled):
+          break
+      else:
+        self.step()
+    else:
+      if num_ticks is None:
+        logging.warning("network has not settled after {} ticks".format(max_ticks))
+    return [self.expected_outputs(sample_idx=b) for b in range(self.batch_size)]
+
+  def expected_outputs(self, tick_latency=None, sample_idx=0):
+    # returns the number of output packets of every tick after tick_latency and the sorted packets of each tick,
+    # as stored in tb_num_outputs.txt and tb_correct.txt
+    tick_latency = self.mu.test_params.tick_latency if tick_latency is None else tick_latency
+    sample_output_packets = self.output_packets[sample_idx]
+    ticks = [tick_idx for tick_idx in sample_output_packets if tick_idx > tick_latency]
+    num_output_packets = []
+    output_packets = []
+    for tick_idx in range(tick_latency + 1, max(ticks, default=tick_latency) + 1):
+      packets = sorted(sample_output_packets.get(tick_idx, []))
+      num_output_packets.append(len(packets))
+      output_packets += packets
+    return num_output_packets, output_packets
+
+  def write_expected_outputs(self, num_outputs_filepath, correct_filepath, tick_latency=None, sample_idx=0):
+    num_output_packets, output_packets = self.expected_outputs(tick_latency, sample_idx)
+    width = self.mu.output_packet_width(self.params)
+    with open(correct_filepath, 'w') as file:
+      file.write("\n".join([bin(x)[2:].zfill(width) for x in output_packets]))
+
+    with open(num_outputs_filepath, 'w') as file:
+      file.write("\n".join([str(x) for x in num_output_packets]))
@@ -1,10 +1,15 @@
 import os
+import re
+import glob
+import hashlib
 import itertools
 import subprocess
 import shutil
 import json
+import tempfile
 
-from myhdl import Cosimulation, Signal, intbv
+import numpy as np
+from myhdl import Cosimulation, Signal, intbv, delay, now
 import pytest
 
 from common_util import ROOT_DIR, IMPL_DIR, TB_DIR, spikehard_named_params
@@ -58,6 +63,10 @@ class basic_test_util():
   def num_outputs_filepath(test_params):
     return os.path.join(test_params.memory_filepath, 'tb_num_outputs.txt')
 
+  @staticmethod
+  def container_filepath(test_params):
+    return os.path.join(test_params.memory_filepath, 'tb_model.bin')
+
   @staticmethod
   def spikehard_test_params_filepath(memory_filepath):
     return os.path.join(memory_filepath, 'tb_spikehard_params.json')
@@ -92,41 +101,166 @@ class basic_test_util():
 
 
 class myhdl_util():
+  # compiled simulations are cached by the hash of their sources and macros, keeping the most recently used ones
+  SIM_CACHE_DIR = os.environ.get("SPIKEHARD_SIM_CACHE_DIR",
+                                 os.path.join(os.path.expanduser("~"), ".cache", "spikehard", "sim"))
+  SIM_CACHE_SIZE = int(os.environ.get("SPIKEHARD_SIM_CACHE_SIZE", 32))
+  # simulator used by gen_cosimulation, either "iverilog" or "verilator"
+  SIM_BACKEND = os.environ.get("SPIKEHARD_SIM_BACKEND", "iverilog")
+  SIM_EXTENSIONS = {"iverilog": ".vvp", "verilator": ".verilator"}
+  # default period of clk in simulation time steps, that of a clock toggled every 10 time steps, which turns timeouts
+  # in clock cycles into a single delayed event
+  CLOCK_PERIOD = 20
+
   @staticmethod
-  def gen_cosimulation(dut, work_dir, params, *ports, src_dirs=None):
+  def sim_cache_key(cmd, src_paths):
+    # the compile command holds the macros and the paths of the sources, whose contents are hashed as well
+    sha = hashlib.sha256(cmd.encode())
+    for path in src_paths:
+      with open(path, 'rb') as file:
+        sha.update(hashlib.sha256(file.read()).digest())
+    return sha.hexdigest()
+
+  @staticmethod
+  def evict_sim_cache(cache_dir=None, cache_size=None):
+    # removes the least recently used simulations beyond the cache size
+    cache_dir = myhdl_util.SIM_CACHE_DIR if cache_dir is None else cache_dir
+    cache_size = myhdl_util.SIM_CACHE_SIZE if cache_size is None else cache_size
+    entries = [path for ext in myhdl_util.SIM_EXTENSIONS.values() for path in glob.glob(os.path.join(cache_dir, "*" + ext))]
+    entries.sort(key=os.path.getmtime, reverse=True)
+    for path in entries[cache_size:]:
+      try:
+        os.remove(path)
+      except FileNotFoundError:
+        pass
+
+  @staticmethod
+  def module_parameters(filepath):
+    # names of the parameters declared in a Verilog source
+    with open(filepath, 'r') as file:
+      return set(re.findall(r"\bparameter\s+(?:integer\s+)?(\w+)", file.read()))
+
+  @staticmethod
+  def gen_cosimulation(dut, work_dir, params, *ports, src_dirs=None, build_dir=None, defines=None, use_cache=True,
+                       backend=None):
+    # defines holds additional macros to define besides params. If use_cache, the compiled simulation is reused from,
+    # or added to, SIM_CACHE_DIR, otherwise it is compiled into build_dir, by default the current working directory,
+    # which must not be shared by concurrent simulations.
+    # With the iverilog backend, dut is a testbench in work_dir that connects its signals to MyHDL with $from_myhdl and
+    # $to_myhdl. With the verilator backend, dut is the module under test itself, params matching its parameters
+    # override them, and work_dir holds {dut}_verilator.cpp, which exposes its ports to MyHDL through
+    # tb/verilator/myhdl_verilator.h.
     if src_dirs is None:
       src_dirs = [IMPL_DIR]
+    backend = myhdl_util.SIM_BACKEND if backend is None else backend
+    if backend not in myhdl_util.SIM_EXTENSIONS:
+      raise ValueError("unknown simulation backend: {}".format(backend))
 
-    cmd = "iverilog -o {}.o".format(dut)
+    macros = [(field.upper(), getattr(params, field)) for field in params._fields]
+    if defines is not None:
+      macros += list(defines.items())
 
-    for d in src_dirs:
-      cmd += " -I {}".format(d)
+    src_paths = [path for d in src_dirs for path in sorted(glob.glob(os.path.join(d, "*.v")))]
 
-    for field in params._fields:
-      value = getattr(params, field)
-      try:
-        v = int(value)
-      except:
-        if isinstance(value, str):
-          cmd += " -D{}=\\\"{}\\\"".format(field.upper(), value)
-        continue
-      cmd += " -D{}={}".format(field.upper(), value)
+    # the arguments of the compiler, apart from the output path
+    cmd = ""
 
-    cmd += " -s {}".format(dut)
+    if backend == "iverilog":
+      for d in src_dirs:
+        cmd += " -I {}".format(d)
 
-    for d in src_dirs:
-      cmd += " {}/*.v".format(d)
-    cmd += " {}/{}.v".format(work_dir, dut)
+      for name, value in macros:
+        try:
+          v = int(value)
+        except:
+          if isinstance(value, str):
+            cmd += " -D{}=\\\"{}\\\"".format(name, value)
+          continue
+        cmd += " -D{}={}".format(name, value)
 
-    cmd += " -g2005-sv"
+      cmd += " -s {}".format(dut)
 
-    subprocess.run(cmd, check=True, shell=True)
+      for d in src_dirs:
+        cmd += " {}/*.v".format(d)
+      cmd += " {}/{}.v".format(work_dir, dut)
+
+      cmd += " -g2005-sv"
+      src_paths.append(os.path.join(work_dir, "{}.v".format(dut)))
+
+      def compile_sim(sim_path):
+        subprocess.run("iverilog -o {}{}".format(sim_path, cmd), check=True, shell=True)
+    else:
+      dut_paths = [path for path in src_paths if os.path.basename(path) == "{}.v".format(dut)]
+      if not dut_paths:
+        raise ValueError("{}.v not found in {}".format(dut, src_dirs))
+      dut_parameters = myhdl_util.module_parameters(dut_paths[0])
+      driver_path = os.path.join(work_dir, "{}_verilator.cpp".format(dut))
+      header_dir = os.path.join(TB_DIR, "verilator")
+
+      # fifo_buffer updates its status counter with blocking assignments and then reads it back through empty and
+      # full, which verilator reorders when it splits always blocks, dropping reads from the buffers
+      cmd += " --cc --exe --build -O3 -fno-split -Wno-fatal --top-module {}".format(dut)
+      cmd += " -CFLAGS -I{}".format(header_dir)
+      for d in src_dirs:
+        cmd += " -I{}".format(d)
+
+      for name, value in macros:
+        if value is None:
+          # unset params are left undefined
+          continue
+        if isinstance(value, (bool, int, np.integer)):
+          # integer macros configure the driver, and the top level parameters of the same name
+          cmd += " -CFLAGS -D{}={}".format(name, int(value))
+          if name in dut_parameters:
+            cmd += " -G{}={}".format(name, int(value))
+        elif isinstance(value, str):
+          cmd += " -D{}=\\\"{}\\\"".format(name, value)
+        else:
+          raise ValueError("unsupported value for macro {}: {!r}".format(name, value))
+
+      for d in src_dirs:
+        cmd += " {}/*.v".format(d)
+      cmd += " {}".format(driver_path)
+      src_paths += [driver_path, os.path.join(header_dir, "myhdl_verilator.h")]
+
+      def compile_sim(sim_path):
+        # verilator writes the generated model and its objects next to the executable unless told otherwise
+        obj_dir = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(sim_path)), suffix=".obj_dir")
+        try:
+          subprocess.run("verilator --Mdir {} -o {}{}".format(obj_dir, os.path.abspath(sim_path), cmd), check=True,
+                         shell=True)
+        finally:
+          shutil.rmtree(obj_dir, ignore_errors=True)
+
+    ext = myhdl_util.SIM_EXTENSIONS[backend]
+    if use_cache:
+      os.makedirs(myhdl_util.SIM_CACHE_DIR, exist_ok=True)
+      sim_path = os.path.join(myhdl_util.SIM_CACHE_DIR, "{}_{}{}".format(dut, myhdl_util.sim_cache_key(cmd, src_paths), ext))
+      if os.path.exists(sim_path):
+        os.utime(sim_path)
+      else:
+        # compile next to the cache entry and move it into place, so that concurrent simulations never see a partial
+        # entry
+        fd, tmp_path = tempfile.mkstemp(dir=myhdl_util.SIM_CACHE_DIR, suffix=".tmp")
+        os.close(fd)
+        try:
+          compile_sim(tmp_path)
+          os.replace(tmp_path, sim_path)
+        finally:
+          if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        myhdl_util.evict_sim_cache()
+    else:
+      sim_path = os.path.join("." if build_dir is None else build_dir, "{}.o".format(dut) if backend == "iverilog" else dut + ext)
+      compile_sim(sim_path)
 
     ports_dict = {}
     for ps in ports:
       ports_dict.update(ps._asdict())
 
-    return Cosimulation("vvp -m {}/iverilog/myhdl.vpi {}.o".format(TB_DIR, dut), **ports_dict)
+    if backend == "iverilog":
+      return Cosimulation("vvp -m {}/iverilog/myhdl.vpi {}".format(TB_DIR, sim_path), **ports_dict)
+    return Cosimulation(os.path.abspath(sim_path), **ports_dict)
 
   @staticmethod
   def gen_signal(num_bits, num_signals=1):
@@ -141,9 +275,9 @@ class myhdl_util():
   @staticmethod
   def to_int(signal) -> int:
     if hasattr(signal, 'val'):
-      return int(bin(signal.val), 2)
+      return int(signal.val)
     else:
-      return int(bin(signal), 2)
+      return int(signal)
 
   @staticmethod
   def to_intbv(value, num_bits):
@@ -152,17 +286,49 @@ class myhdl_util():
     return v
 
   @staticmethod
-  def wait_for(clk, signal, value=1, timeout=100000):
-    if timeout is None:
-      while myhdl_util.to_int(signal) != value:
-        yield clk.posedge
-      return
-    else:
-      for _ in range(timeout):
-        if myhdl_util.to_int(signal) == value:
-          return
-        yield clk.posedge
-      raise TimeoutError("timed out whilst waiting for signal")
+  def __deadline(timeout, clock_period):
+    return None if timeout is None else now() + timeout * clock_period
+
+  @staticmethod
+  def __wait_until(clk, deadline, *triggers):
+    # sleeps until one of the triggers fires and then until the next rising edge of clk, at which the signals are
+    # sampled as the DUT sees them, rather than waking on every clock cycle in between
+    if deadline is not None:
+      if now() >= deadline:
+        raise TimeoutError("timed out whilst waiting for signal")
+      triggers += (delay(deadline - now()),)
+    yield triggers
+    yield clk.posedge
+
+  @staticmethod
+  def mixed_triggers(gen):
+    # MyHDL infers how to resume a generator from its own yield statements, so a generator that only yields clock
+    # edges itself, but delegates to the waits below, has to be run through this one, which yields nothing directly
+    yield from gen
+
+  @staticmethod
+  def wait_for(clk, signal, value=1, timeout=100000, clock_period=CLOCK_PERIOD):
+    # waits until signal holds value at a rising edge of clk, raising TimeoutError after timeout clock cycles
+    deadline = myhdl_util.__deadline(timeout, clock_period)
+    while myhdl_util.to_int(signal) != value:
+      yield from myhdl_util.__wait_until(clk, deadline, signal)
+
+  @staticmethod
+  def wait_for_any(clk, *signals, timeout=100000, clock_period=CLOCK_PERIOD):
+    # waits until any of the 1-bit signals is high at a rising edge of clk, raising TimeoutError after timeout clock
+    # cycles
+    deadline = myhdl_util.__deadline(timeout, clock_period)
+    while not any(signal.val for signal in signals):
+      yield from myhdl_util.__wait_until(clk, deadline, *[signal.posedge for signal in signals])
+
+  @staticmethod
+  def wait_cycles(clk, num_cycles, clock_period=CLOCK_PERIOD):
+    # waits for num_cycles rising edges of clk with a single delay, landing between two edges before the last one
+    if num_cycles > 1:
+      yield delay(((2 * num_cycles - 1) * clock_period) // 2)
+      yield clk.posedge
+    elif num_cycles == 1:
+      yield clk.posedge
 
   @staticmethod
   def initialise_accelerator(testcase, input_ports, output_ports, tx_size=2 ** 31, rx_size=2 ** 31):
@@ -200,6 +366,164 @@ class myhdl_util():
   def __dma_word_size(word_width) -> int:
     return {8: 0, 16: 1, 32: 2, 64: 3}[word_width]
 
+  @staticmethod
+  def pack_dma_beats(words, dma_bus_width, word_width, num_beats=None) -> list:
+    # packs words of word_width bits into beats of dma_bus_width bits, least significant first, zero padding or
+    # truncating to num_beats beats
+    words = np.asarray(words, dtype=np.uint64).reshape(-1)
+    if dma_bus_width >= word_width:
+      words_per_beat = dma_bus_width // word_width
+      if num_beats is None:
+        num_beats = -(-len(words) // words_per_beat)
+      padded = np.zeros(num_beats * words_per_beat, dtype=np.uint64)
+      padded[:min(len(words), len(padded))] = words[:len(padded)]
+      padded = padded.reshape(num_beats, words_per_beat)
+      if dma_bus_width <= 64:
+        shifts = (np.arange(words_per_beat) * word_width).astype(np.uint64)
+        return np.bitwise_or.reduce(padded << shifts, axis=1).tolist()
+      return [sum(int(word) << (i * word_width) for i, word in enumerate(beat)) for beat in padded]
+    else:
+      beats_per_word = word_width // dma_bus_width
+      shifts = (np.arange(beats_per_word) * dma_bus_width).astype(np.uint64)
+      beats = ((words[:, None] >> shifts) & np.uint64((2 ** dma_bus_width) - 1)).reshape(-1)
+      if num_beats is not None:
+        beats = np.concatenate([beats[:num_beats], np.zeros(max(num_beats - len(beats), 0), dtype=np.uint64)])
+      return beats.tolist()
+
+  @staticmethod
+  def unpack_dma_beats(beats, dma_bus_width, word_width) -> np.ndarray:
+    # inverse of pack_dma_beats, dropping the last word if it is incomplete
+    if dma_bus_width >= word_width:
+      words_per_beat = dma_bus_width // word_width
+      if dma_bus_width <= 64:
+        shifts = (np.arange(words_per_beat) * word_width).astype(np.uint64)
+        word_mask = np.uint64((2 ** word_width) - 1)
+        return ((np.asarray(beats, dtype=np.uint64)[:, None] >> shifts) & word_mask).reshape(-1)
+      word_mask = (2 ** word_width) - 1
+      return np.array([(beat >> (i * word_width)) & word_mask for beat in beats for i in range(words_per_beat)],
+                      dtype=np.uint64)
+    else:
+      beats_per_word = word_width // dma_bus_width
+      num_words = len(beats) // beats_per_word
+      shifts = (np.arange(beats_per_word) * dma_bus_width).astype(np.uint64)
+      beats = np.asarray(beats[:num_words * beats_per_word], dtype=np.uint64).reshape(num_words, beats_per_word)
+      return np.bitwise_or.reduce(beats << shifts, axis=1)
+
+  @staticmethod
+  def __accept_dma_request(testcase, clk, ctrl_ready, ctrl_valid, ctrl_index, ctrl_length, ctrl_size,
+                           offset, length, word_width, noc_delay, timeout, clock_period):
+    for _ in range(noc_delay()):
+      yield clk.posedge
+
+    # Wait for (ctrl_valid && have ctrl_ready).
+    ctrl_ready.next = 1
+    yield clk.posedge
+    yield from myhdl_util.wait_for(clk, ctrl_valid, timeout=timeout, clock_period=clock_period)
+    ctrl_ready.next = 0
+
+    # Check that length, word size, etc are as expected.
+    testcase.assertEqual(myhdl_util.to_int(ctrl_index), offset)
+    testcase.assertEqual(myhdl_util.to_int(ctrl_length), length)
+    testcase.assertEqual(myhdl_util.to_int(ctrl_size), myhdl_util.__dma_word_size(word_width))
+
+  @staticmethod
+  def dma_read(testcase,
+               input_ports,
+               output_ports,
+               read_offset,
+               beats,
+               word_width,
+               noc_delay=None,
+               timeout=100000,
+               clock_period=CLOCK_PERIOD):
+    # Serves a DMA read request of len(beats) beats, as packed by pack_dma_beats, streaming a beat on every clock
+    # cycle in which the DUT is ready unless noc_delay inserts idle cycles between beats. The handshake is the same as
+    # for a beat at a time, but valid is held high and the next beat driven straight away while the DUT stays ready.
+    if noc_delay is None:
+      noc_delay = myhdl_util.__no_delay
+
+    clk = input_ports.clk
+    chnl_valid = input_ports.dma_read_chnl_valid
+    chnl_data = input_ports.dma_read_chnl_data
+    chnl_ready = output_ports.dma_read_chnl_ready
+
+    yield from myhdl_util.__accept_dma_request(testcase, clk, input_ports.dma_read_ctrl_ready,
+                                               output_ports.dma_read_ctrl_valid, output_ports.dma_read_ctrl_data_index,
+                                               output_ports.dma_read_ctrl_data_length,
+                                               output_ports.dma_read_ctrl_data_size,
+                                               read_offset, len(beats), word_width, noc_delay, timeout,
+                                               clock_period)
+
+    # Start sending data immediately afterwards, a beat is transferred on every rising edge at which it is valid and
+    # dma_read_chnl_ready is high, so it is only waited for when the DUT is not ready.
+    chnl_valid.next = 1
+    for beat in beats:
+      delay = noc_delay()
+      if delay > 0:
+        chnl_valid.next = 0
+        for _ in range(delay):
+          yield clk.posedge
+        chnl_valid.next = 1
+
+      chnl_data.next = beat
+      yield clk.posedge
+      if not chnl_ready.val:
+        yield from myhdl_util.wait_for(clk, chnl_ready, timeout=timeout, clock_period=clock_period)
+
+    chnl_valid.next = 0
+
+  @staticmethod
+  def dma_write(testcase,
+                input_ports,
+                output_ports,
+                write_offset,
+                write_length,
+                word_width,
+                noc_delay=None,
+                timeout=100000,
+                clock_period=CLOCK_PERIOD):
+    # Serves a DMA write request of write_length beats, accepting a beat on every clock cycle unless noc_delay inserts
+    # idle cycles between beats, and returns the beats written by the DUT, which unpack_dma_beats turns into words.
+    if noc_delay is None:
+      noc_delay = myhdl_util.__no_delay
+
+    clk = input_ports.clk
+    chnl_ready = input_ports.dma_write_chnl_ready
+    chnl_valid = output_ports.dma_write_chnl_valid
+    chnl_data = output_ports.dma_write_chnl_data
+
+    yield from myhdl_util.__accept_dma_request(testcase, clk, input_ports.dma_write_ctrl_ready,
+                                               output_ports.dma_write_ctrl_valid,
+                                               output_ports.dma_write_ctrl_data_index,
+                                               output_ports.dma_write_ctrl_data_length,
+                                               output_ports.dma_write_ctrl_data_size,
+                                               write_offset, write_length, word_width, noc_delay, timeout,
+                                               clock_period)
+
+    # Start reading data immediately afterwards, a beat is transferred on every rising edge at which it is valid and
+    # dma_write_chnl_ready is high, so it is only waited for when the DUT has no valid beat.
+    beats = []
+    chnl_ready.next = 1
+    for _ in range(write_length):
+      delay = noc_delay()
+      if delay > 0:
+        chnl_ready.next = 0
+        for _ in range(delay):
+          yield clk.posedge
+        chnl_ready.next = 1
+
+      yield clk.posedge
+      if not chnl_valid.val:
+        yield from myhdl_util.wait_for(clk, chnl_valid, timeout=timeout, clock_period=clock_period)
+      beats.append(int(chnl_data.val))
+
+    chnl_ready.next = 0
+    return beats
+
+  @staticmethod
+  def __no_delay() -> int:
+    return 0
+
   @staticmethod
   def service_read_request(testcase,
                            input_ports,
@@ -210,57 +534,16 @@ class myhdl_util():
                            word_width,
                            make_read_word,
                            noc_delay=None,
-                           timeout=100000):
-    if noc_delay is None:
-      def zero() -> int:
-        return 0
-
-      noc_delay = zero
-
-    dma_bus_mask = (2 ** dma_bus_width) - 1
-    wait_for = lambda *args: myhdl_util.wait_for(input_ports.clk, *args, timeout=timeout)
-
-    def make_read_data(beat_idx):
-      if dma_bus_width >= word_width:
-        v = 0
-        words_per_beat = dma_bus_width // word_width
-        for i in range(words_per_beat):
-          v |= make_read_word(beat_idx * words_per_beat + i) << (i * word_width)
-      else:
-        beats_per_word = word_width // dma_bus_width
-        v = (make_read_word(beat_idx // beats_per_word) >> ((beat_idx % beats_per_word) * dma_bus_width)) & dma_bus_mask
-
-      return myhdl_util.to_intbv(v, dma_bus_width)
-
-    for _ in range(noc_delay()):
-      yield input_ports.clk.posedge
-
-    # Wait for (dma_read_ctrl_valid && have dma_read_ctrl_ready).
-    input_ports.dma_read_ctrl_ready.next = 1
-    yield input_ports.clk.posedge
-    yield from wait_for(output_ports.dma_read_ctrl_valid)
-    input_ports.dma_read_ctrl_ready.next = 0
-
-    # Check that length, word size, etc are as expected.
-    testcase.assertEqual(myhdl_util.to_int(output_ports.dma_read_ctrl_data_index), read_offset)
-    testcase.assertEqual(myhdl_util.to_int(output_ports.dma_read_ctrl_data_length), read_length)
-    testcase.assertEqual(myhdl_util.to_int(output_ports.dma_read_ctrl_data_size),
-                         myhdl_util.__dma_word_size(word_width))
-
-    # Start sending data immediately afterwards with random delay between packets.
-    for beat_idx in range(read_length):
-      # Wait a predetermined or random number of clock ticks before sending data.
-      for _ in range(noc_delay()):
-        yield input_ports.clk.posedge
-
-      # Send next beat of data
-      input_ports.dma_read_chnl_data.next = make_read_data(beat_idx)
-      input_ports.dma_read_chnl_valid.next = 1
-      yield input_ports.clk.posedge
-
-      # Wait for (dma_read_chnl_valid && have dma_read_chnl_ready).
-      yield from wait_for(output_ports.dma_read_chnl_ready)
-      input_ports.dma_read_chnl_valid.next = 0
+                           timeout=100000,
+                           clock_period=CLOCK_PERIOD):
+    if dma_bus_width >= word_width:
+      num_words = read_length * (dma_bus_width // word_width)
+    else:
+      num_words = -(-read_length // (word_width // dma_bus_width))
+    words = [make_read_word(word_idx) for word_idx in range(num_words)]
+    beats = myhdl_util.pack_dma_beats(words, dma_bus_width, word_width, read_length)
+    yield from myhdl_util.dma_read(testcase, input_ports, output_ports, read_offset, beats, word_width,
+                                   noc_delay=noc_delay, timeout=timeout, clock_period=clock_period)
 
   @staticmethod
   def service_write_request(testcase,
@@ -272,62 +555,10 @@ class myhdl_util():
                             word_width,
                             check_write_word,
                             noc_delay=None,
-                            timeout=100000):
-    if noc_delay is None:
-      def zero() -> int:
-        return 0
-
-      noc_delay = zero
-
-    word_mask = (2 ** word_width) - 1
-    wait_for = lambda *args: myhdl_util.wait_for(input_ports.clk, *args, timeout=timeout)
-
-    write_word = 0
-
-    def check_write_data(beat_idx, value):
-      nonlocal write_word
-
-      value = myhdl_util.to_int(value)
-      if dma_bus_width >= word_width:
-        words_per_beat = dma_bus_width // word_width
-        for i in range(words_per_beat):
-          word_idx = beat_idx * words_per_beat + i
-          word_value = (value >> (i * word_width)) & word_mask
-          check_write_word(word_idx, word_value)
-      else:
-        beats_per_word = word_width // dma_bus_width
-        if (beat_idx % beats_per_word) == 0:
-          write_word = 0
-        write_word |= (value << (dma_bus_width * (beat_idx % beats_per_word)))
-        if ((beat_idx + 1) % beats_per_word) == 0:
-          check_write_word(beat_idx // beats_per_word, write_word)
-
-    for _ in range(noc_delay()):
-      yield input_ports.clk.posedge
-
-    # Wait for (dma_write_ctrl_valid && have dma_write_ctrl_ready).
-    input_ports.dma_write_ctrl_ready.next = 1
-    yield input_ports.clk.posedge
-    yield from wait_for(output_ports.dma_write_ctrl_valid)
-    input_ports.dma_write_ctrl_ready.next = 0
-
-    # Check that length, word size, etc are as expected.
-    testcase.assertEqual(myhdl_util.to_int(output_ports.dma_write_ctrl_data_index), write_offset)
-    testcase.assertEqual(myhdl_util.to_int(output_ports.dma_write_ctrl_data_length), write_length)
-    testcase.assertEqual(myhdl_util.to_int(output_ports.dma_write_ctrl_data_size),
-                         myhdl_util.__dma_word_size(word_width))
-
-    # Start reading data immediately afterwards with random delay between when ready.
-    for beat_idx in range(write_length):
-      # Wait a predetermined or random number of clock ticks before ready to receive data.
-      for _ in range(noc_delay()):
-        yield input_ports.clk.posedge
-      input_ports.dma_write_chnl_ready.next = 1
-      yield input_ports.clk.posedge
-
-      # Wait for (dma_write_chnl_ready && have dma_write_chnl_valid).
-      yield from wait_for(output_ports.dma_write_chnl_valid)
-      input_ports.dma_write_chnl_ready.next = 0
-
-      # Validate.
-      check_write_data(beat_idx, output_ports.dma_write_chnl_data)
+                            timeout=100000,
+                            clock_period=CLOCK_PERIOD):
+    beats = yield from myhdl_util.dma_write(testcase, input_ports, output_ports, write_offset, write_length,
+                                            word_width, noc_delay=noc_delay, timeout=timeout,
+                                            clock_period=clock_period)
+    for word_idx, value in enumerate(myhdl_util.unpack_dma_beats(beats, dma_bus_width, word_width).tolist()):
+      check_write_word(word_idx, value)
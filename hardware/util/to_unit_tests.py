@@ -6,7 +6,10 @@ from model_util import model_util
 from test_util import basic_test_util
 
 
-def change_arch(old_params, new_num_axons, new_num_neurons, new_model_name=None):
+def change_arch(old_params, new_num_axons, new_num_neurons, new_model_name=None, simulate_outputs=False, num_workers=None,
+                write_container=False, num_ticks_to_cross_check=None):
+  # if num_ticks_to_cross_check is given, the expected outputs are generated by the functional simulator and their
+  # first num_ticks_to_cross_check ticks are checked against the RTL
   if new_model_name is None:
     new_model_name = os.path.basename(os.path.dirname(old_params.memory_filepath))
 
@@ -20,18 +23,23 @@ def change_arch(old_params, new_num_axons, new_num_neurons, new_model_name=None)
   new_params = set_spikehard_param(new_params, "num_axons", new_num_axons)
   new_params = set_spikehard_param(new_params, "num_neurons", new_num_neurons)
 
-  mu, results = model_util.compress_model(old_params, new_params)
-  results += mu.minimise_tick_delay()
-  mu.to_unit_tests(model_name=new_model_name)
+  # the unit tests are regenerated from scratch, rather than from a model compressed by an older version
+  mu, results = model_util.compress_model(old_params, new_params, use_cache=False)
+  results += mu.minimise_tick_delay(num_workers=num_workers)
+  mu.to_unit_tests(model_name=new_model_name, simulate_outputs=(simulate_outputs or num_ticks_to_cross_check is not None),
+                   write_container=write_container)
+  if num_ticks_to_cross_check is not None:
+    if not model_util.run_tick_delay_test(mu.test_params, generate=True, num_ticks_to_cross_check=num_ticks_to_cross_check):
+      raise Exception("expected outputs do not match the RTL")
   print("all results:", results)
   return results
 
 
-def optimise_tick_delay(old_params, num_ticks_to_check=30):
+def optimise_tick_delay(old_params, num_ticks_to_check=30, num_workers=None):
   new_params = set_spikehard_param(old_params, "num_ticks_to_check", num_ticks_to_check)
   mu = model_util(new_params, new_params)
   mu.init()
-  results = mu.minimise_tick_delay()
+  results = mu.minimise_tick_delay(num_workers=num_workers)
   new_params = set_spikehard_param(old_params, "clock_cycles_per_tick", mu.test_params.clock_cycles_per_tick)
   mu.arch_params = mu.test_params = new_params
   mu.dump_params(new_params.memory_filepath)
@@ -47,10 +55,10 @@ def main():
   old_params = basic_test_util.gen_test_params(model_name, old_altered, old_num_axons, old_num_neurons)
   del old_altered, old_num_axons, old_num_neurons
   if len(sys.argv) == 5:
-    optimise_tick_delay(old_params)
+    optimise_tick_delay(old_params, num_workers=os.cpu_count())
   else:
     new_num_axons, new_num_neurons = [int(arg) for arg in sys.argv[5:]]
-    results = change_arch(old_params, new_num_axons, new_num_neurons)
+    results = change_arch(old_params, new_num_axons, new_num_neurons, num_workers=os.cpu_count())
     with open(f"results_{model_name}.py", 'a') as f:
       f.write(str(results) + ",\n")
 